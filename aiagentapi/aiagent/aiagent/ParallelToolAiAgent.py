@@ -0,0 +1,172 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from aiagent.aiagent.StandardAiAgent import StandardAiAgent
+from aiagent.aiagent.base import STREAM_OBSERVATION_MAX_CHARS
+from aiagent.prompts.registry import load_template_text
+from aiagent.aiagent.scratchpad import with_compacted_scratchpad
+from app.core.config import settings
+
+
+# ツール呼び出しエージェントで使用するシステムプロンプト
+TOOL_CALLING_PROMPT_NAME = settings.TOOL_CALLING_PROMPT_NAME
+TOOL_CALLING_PROMPT_VERSION = settings.TOOL_CALLING_PROMPT_VERSION
+
+# ツールごとの同時実行数の上限。外部APIへの負荷が大きいツール・副作用のあるツールは絞る
+DEFAULT_TOOL_CONCURRENCY = settings.TOOL_DEFAULT_CONCURRENCY
+DEFAULT_TOOL_CONCURRENCY_LIMITS = {
+    "google_search_tool": 3,
+    "getMarkdown_tool": 5,
+    "send_email_tool": 1,
+    "send_email_to_fixed_address": 1,
+    "tts_and_upload_to_google_drive": 1,
+    "generate_podcast_mp3_and_upload_tool": 1,
+    "generate_melmaga_and_send_email_from_urls_tool": 1,
+}
+
+
+def _parse_limits(value: str) -> dict:
+    """'tool_a=1,tool_b=3' 形式の文字列をツール名→上限の辞書に変換する"""
+    limits = {}
+    for item in value.split(","):
+        name, sep, limit = item.partition("=")
+        if sep and name.strip() and limit.strip().isdigit():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+class ToolConcurrencyLimiter:
+    """
+    ツール名ごとに同時実行数を制限するクラス。
+
+    ジョブのワーカースレッドごとに別のイベントループで実行されることがあるため、
+    asyncio.Semaphore ではなくスレッドセーフなセマフォを非ブロッキングで取得する。
+    """
+
+    def __init__(self, limits: dict, default_limit: int, poll_interval: float = 0.05):
+        """
+        Args:
+            limits (dict): ツール名→同時実行数の上限。
+            default_limit (int): limits に無いツールの上限。
+            poll_interval (float): 上限に達しているときに再試行するまでの待ち時間（秒）。
+        """
+        self.limits = limits
+        self.default_limit = default_limit
+        self.poll_interval = poll_interval
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, tool_name: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(tool_name)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(max(1, self.limits.get(tool_name, self.default_limit)))
+                self._semaphores[tool_name] = semaphore
+            return semaphore
+
+    @asynccontextmanager
+    async def limit(self, tool_name: str):
+        """上限に空きができるまでイベントループを塞がずに待ち、実行枠を確保する"""
+        semaphore = self._semaphore(tool_name)
+        while not semaphore.acquire(blocking=False):
+            await asyncio.sleep(self.poll_interval)
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+# アプリケーション全体で共有するツールの同時実行数リミッタ
+tool_limiter = ToolConcurrencyLimiter(
+    {**DEFAULT_TOOL_CONCURRENCY_LIMITS, **_parse_limits(settings.TOOL_CONCURRENCY_LIMITS)},
+    DEFAULT_TOOL_CONCURRENCY
+)
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """
+    1ステップで返された複数のツール呼び出しを並行実行する AgentExecutor。
+
+    非同期実行（ainvoke / astream）では、同じステップのツール呼び出しは asyncio.gather で
+    並行に実行され、すべての結果がまとめて次のLLM呼び出しに渡される。
+    ここではツールごとの同時実行数の上限を適用する。
+    """
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        async with tool_limiter.limit(agent_action.tool):
+            return await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+
+class ParallelToolAiAgent(StandardAiAgent):
+    """
+    LLMのツール呼び出し（function calling）機能を使い、1回のLLM呼び出しで返された
+    互いに独立な複数のツール呼び出しを並行実行するエージェント。
+
+    ReAct（StandardAiAgent）では 1ツール＝1往復 となるが、本エージェントでは
+    「複数URLの取得」のような独立した処理を1ステップにまとめられるため、
+    LLMの呼び出し回数とツールの待ち時間の合計を削減できる。
+    並行実行は非同期で行うため、同期の invoke / stream も内部で非同期版を実行する。
+    """
+
+    # ツール呼び出しエージェントの最終回答にはマーカーが無いため、すべてのトークンを送出する
+    final_answer_marker = ""
+
+    def createAgentExecutor(self) -> AgentExecutor:
+        """ツール呼び出しエージェントと ParallelAgentExecutor を生成して返します。"""
+        try:
+            system_prompt = load_template_text(TOOL_CALLING_PROMPT_NAME, TOOL_CALLING_PROMPT_VERSION)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load prompt '{TOOL_CALLING_PROMPT_NAME}' ({TOOL_CALLING_PROMPT_VERSION}): {e}")
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad"),
+        ])
+
+        try:
+            agent = with_compacted_scratchpad(create_tool_calling_agent(self.model, self.tools, prompt))
+        except Exception as e:
+            raise RuntimeError(f"Failed to create tool calling agent: {e}")
+
+        try:
+            return ParallelAgentExecutor(
+                agent=agent,
+                tools=self.tools,
+                verbose=self.verbose,
+                handle_parsing_errors=True,
+                max_iterations=self.max_iterations,
+                return_intermediate_steps=self.return_intermediate_steps
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to create AgentExecutor: {e}")
+
+    def invoke(self, user_input, thoughtProcessFlg=True):
+        """ainvoke を専用のイベントループで実行する（イベントループ外からの呼び出し用）"""
+        return asyncio.run(self.ainvoke(user_input, thoughtProcessFlg))
+
+    def stream(self, user_input, thoughtProcessFlg=True, observation_max_chars=STREAM_OBSERVATION_MAX_CHARS):
+        """
+        astream を専用のイベントループで実行し、イベントを同期的に返すジェネレータ。
+
+        StandardAiAgent.stream と同じく token イベントは送出しない。
+        ジェネレータを途中で閉じると、その時点でエージェントの実行も停止する。
+        """
+        loop = asyncio.new_event_loop()
+        events = self.astream(user_input, thoughtProcessFlg, observation_max_chars)
+        try:
+            # run_until_complete はステップごとに現在のコンテキストを複製したタスクで実行するため、
+            # 処理時間・トークン使用量の記録先はこのスレッドのコンテキストに設定しておく
+            with self._run_scope():
+                while True:
+                    try:
+                        event = loop.run_until_complete(events.__anext__())
+                    except StopAsyncIteration:
+                        return
+                    if event["event"] != "token":
+                        yield event
+        finally:
+            loop.run_until_complete(events.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
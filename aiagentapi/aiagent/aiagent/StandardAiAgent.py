@@ -1,46 +1,31 @@
-from langchain import hub
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_react_agent
-from aiagent.tool.google_search_by_gemini import google_search_tool
-from aiagent.tool.tts_and_upload_drive import TextToSpeechAndUploadTool
-from aiagent.googleapis import gmail_search_search_tool, SendEmailTool, send_email_tool
 import os
 from aiagent.aiagent.base import AiAgentBase
-from aiagent.aiagent.common import isChatGPTImageAPI, isGemini
-from aiagent.tool.url2markdown import getMarkdown_tool
-from aiagent.tool.generate_podcast_script import generate_podcast_mp3_and_upload_tool, generate_podcast_script_tool
-from aiagent.tool.generate_melmaga_script import generate_melmaga_script_tool
-from aiagent.specializedtool.generate_melmaga_script import generate_melmaga_and_send_email_from_urls_tool
-
-tts_upload_tool = TextToSpeechAndUploadTool()
-# send_email_tool = SendEmailTool()
+from aiagent.aiagent.common import isChatGptAPI, isChatGPT_o, isGemini
+from aiagent.tool.registry import LazyTools, DEFAULT_TOOL_NAMES
+from aiagent.prompts.registry import get_prompt, REACT_PROMPT_NAME, REACT_PROMPT_VERSION
+from aiagent.aiagent.scratchpad import with_compacted_scratchpad
+from aiagent.utils.rate_limit import llm_rate_limiter
+from aiagent.utils.hedging import hedger
+from aiagent.aiagent.hedged_chat_model import HedgedChatModel
+from aiagent.aiagent.model_registry import TASK_AGENT
 
 
 class StandardAiAgent(AiAgentBase):
     # デフォルト値をクラス変数として定義
     DEFAULT_MODEL = "gemini-1.5-pro"
     DEFAULT_MAX_ITERATIONS = 5
-    DEFAULT_MAX_TOOLS = [
-            google_search_tool,
-            #send_email_tool,
-            send_email_tool,
-            gmail_search_search_tool,
-            tts_upload_tool,
-            getMarkdown_tool,
-            generate_podcast_mp3_and_upload_tool,
-            generate_podcast_script_tool,
-            generate_melmaga_script_tool,
-            generate_melmaga_and_send_email_from_urls_tool
-    ]
+    # ツールのモジュールは参照された時点でインポートする（aiagent.tool.registry）
+    DEFAULT_MAX_TOOLS = LazyTools(DEFAULT_TOOL_NAMES)
 
     def __init__(
         self,
         model_name: str = DEFAULT_MODEL,
         max_iterations: int = DEFAULT_MAX_ITERATIONS,
         verbose: bool = False,
-        tools: list = DEFAULT_MAX_TOOLS,
-        return_intermediate_steps: bool = True
+        tools: list | None = None,
+        return_intermediate_steps: bool = True,
+        agent_executor: AgentExecutor | None = None
     ):
         """
         agenttype2 のコンストラクタ。
@@ -50,54 +35,73 @@ class StandardAiAgent(AiAgentBase):
             max_iterations (int): AgentExecutorの最大反復回数。
             verbose (bool): 詳細ログ出力を行うか。
             return_intermediate_steps (bool): 中間ステップを返すか。
+            agent_executor (AgentExecutor | None): 構築済みの AgentExecutor。
+                指定時はLLMクライアントとAgentExecutorの生成を省略する。
         """
         # インスタンス変数を設定
         self.model_name = model_name if model_name is not None else self.DEFAULT_MODEL
         self.max_iterations = max_iterations if max_iterations is not None else self.DEFAULT_MAX_ITERATIONS
         self.verbose = verbose
         self.return_intermediate_steps = return_intermediate_steps
-        self.tools = tools
-        self.model = self.__createllm()
+        self.tools = tools if tools is not None else self.DEFAULT_MAX_TOOLS
+        # 構築済みの AgentExecutor が渡された場合はLLMクライアントを生成しない
+        self.model = self.__createllm() if agent_executor is None else None
 
-        super().__init__()
+        super().__init__(agent_executor)
 
     def __createllm(self):
-        if isChatGPTImageAPI(self.model_name):
+        model = self.__create_chat_model(self.model_name)
+        # ヘッジが有効な場合は、応答が遅いときに別プロバイダの同等のモデルにも問い合わせる
+        backup_name = hedger.backup_model(self.model_name, TASK_AGENT)
+        if backup_name is None:
+            return model
+        return HedgedChatModel(model, self.__create_chat_model(backup_name), self.model_name, backup_name,
+                               TASK_AGENT, hedger)
+
+    def __create_chat_model(self, model_name: str):
+        if isChatGptAPI(model_name) or isChatGPT_o(model_name):
             # APIキーの存在チェック (環境変数から取得)
             if not os.environ.get("OPENAI_API_KEY"):
                 raise ValueError("Environment variable 'OPENAI_API_KEY' is not set.")
+            # プロバイダのSDKは使用する側だけを読み込む
+            from langchain_openai import ChatOpenAI
             try:
-                return ChatOpenAI(model=self.model_name)
+                return ChatOpenAI(model=model_name, rate_limiter=llm_rate_limiter.for_langchain(model_name))
             except Exception as e:
-                raise RuntimeError(f"Failed to initialize ChatOpenAI with model '{self.model_name}': {e}")
-        elif isGemini(self.model_name):
+                raise RuntimeError(f"Failed to initialize ChatOpenAI with model '{model_name}': {e}")
+        elif isGemini(model_name):
             # APIキーの存在チェック (環境変数から取得)
             self.api_key = os.environ.get("GEMINI_API_KEY")
             if not self.api_key:
                 raise ValueError("Environment variable 'GEMINI_API_KEY' is not set.")
+            from langchain_google_genai import ChatGoogleGenerativeAI
             try:
                 # gemini-1.5-pro
                 # gemini-2.5-pro-exp-03-25
 
                 return ChatGoogleGenerativeAI(
-                    model=self.model_name,
-                    google_api_key=self.api_key
+                    model=model_name,
+                    google_api_key=self.api_key,
+                    rate_limiter=llm_rate_limiter.for_langchain(model_name)
                 )
             except Exception as e:
-                raise RuntimeError(f"Failed to initialize ChatGoogleGenerativeAI with model '{self.model_name}': {e}")
+                raise RuntimeError(f"Failed to initialize ChatGoogleGenerativeAI with model '{model_name}': {e}")
+        else:
+            raise ValueError(f"Model '{model_name}' is not supported.")
 
     def createAgentExecutor(self) -> AgentExecutor:
         """AgentExecutor を生成して返します。"""
         # print(f"Creating AgentExecutor with model={self.model_name}, max_iter={self.max_iterations}") # デバッグ用
-        # HubからReact用プロンプトを取得
+        # 同梱のプロンプトレジストリからReact用プロンプトを取得（ネットワークアクセスなし）
         try:
-            prompt = hub.pull("hwchase17/react")
+            prompt = get_prompt(REACT_PROMPT_NAME, REACT_PROMPT_VERSION)
         except Exception as e:
-            raise RuntimeError(f"Failed to pull prompt from hub: {e}")
+            raise RuntimeError(f"Failed to load prompt '{REACT_PROMPT_NAME}' ({REACT_PROMPT_VERSION}): {e}")
 
         # エージェントの作成
         try:
-            agent = create_react_agent(self.model, self.tools, prompt)
+            # 反復のたびに全 Observation を再送しないよう、過去のステップは圧縮して渡す
+            agent = with_compacted_scratchpad(create_react_agent(self.model, self.tools, prompt))
         except Exception as e:
             raise RuntimeError(f"Failed to create react agent: {e}")
 
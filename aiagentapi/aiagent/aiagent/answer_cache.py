@@ -0,0 +1,193 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from app.core.config import settings
+
+
+# キャッシュの有効期間（秒。0 の場合はキャッシュしない）
+ANSWER_CACHE_TTL_SECONDS = settings.ANSWER_CACHE_TTL_SECONDS
+# メモリ上に保持する最大件数（超えた場合は最も長く使われていないものから破棄する）
+ANSWER_CACHE_MAX_ENTRIES = settings.ANSWER_CACHE_MAX_ENTRIES
+# 同じ回答を使い回す時間の区切り（秒）。日付とこの区切りが異なる質問は別のキーになる
+ANSWER_CACHE_TIME_BUCKET_SECONDS = settings.ANSWER_CACHE_TIME_BUCKET_SECONDS
+# 指定した場合は SQLite にも保存し、再起動後・複数ワーカー間でも再利用する
+ANSWER_CACHE_DB_PATH = settings.ANSWER_CACHE_DB_PATH
+
+# 副作用（メール送信・Google Drive へのアップロード等）のあるツール。
+# これらを呼び出した実行の結果はキャッシュしない
+SIDE_EFFECT_TOOLS = frozenset({
+    "send_email_tool",
+    "send_email_to_fixed_address",
+    "tts_and_upload_to_google_drive",
+    "getMarkdown_tool",  # 取得したマークダウンを Google Drive にアップロードする
+    "generate_podcast_mp3_and_upload_tool",
+    "generate_melmaga_and_send_email_from_urls_tool",
+})
+
+
+def normalize_input(text: str) -> str:
+    """全角・半角、大文字・小文字、空白の違いを吸収したユーザー入力を返す"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def time_bucket(now: datetime | None = None, bucket_seconds: int = ANSWER_CACHE_TIME_BUCKET_SECONDS) -> str:
+    """現在時刻の区切り（例: '2025-05-01#13'）。日付をまたいだ場合は必ず別の区切りになる"""
+    now = now or datetime.now()
+    seconds = now.hour * 3600 + now.minute * 60 + now.second
+    return f"{now.date().isoformat()}#{seconds // max(1, bucket_seconds)}"
+
+
+class AnswerCache:
+    """
+    エージェントの最終回答をキャッシュするクラス。
+
+    キーはユーザー入力（正規化済み）・エージェント種別・モデル・ツール構成・時間の区切りから生成する。
+    メモリ上では有効期間（TTL）と最大件数（LRU）で管理し、db_path を指定した場合は
+    SQLite にも保存する（メモリに無い場合は SQLite を参照する）。
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, db_path: str = ""):
+        """
+        Args:
+            ttl_seconds (int): 有効期間（秒）。0 以下の場合はキャッシュしない。
+            max_entries (int): メモリ上に保持する最大件数。
+            db_path (str): SQLite ファイルのパス。空の場合はメモリのみ。
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        if self.enabled and db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS answers (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_expires_at ON answers (expires_at)")
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @contextmanager
+    def _connect(self):
+        """接続を開き、正常終了時にコミットして閉じる"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(user_input: str, **scope) -> str:
+        """
+        キャッシュのキーを生成する。
+
+        Args:
+            user_input (str): ユーザーの入力（メタ情報を付ける前のもの）。
+            **scope: 回答に影響するその他の条件（エージェント種別・モデル・ツール構成等）。
+        """
+        payload = json.dumps(
+            {"input": normalize_input(user_input), "bucket": time_bucket(), **scope},
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        """有効期間内の値を返す。無い場合は None。"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+
+        value = None
+        if self.db_path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM answers WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+
+        with self._lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return value
+
+    def set(self, key: str, value: dict):
+        """値を保存する。"""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False, default=str), expires_at)
+                )
+                # 期限切れの行はここでまとめて削除する
+                conn.execute("DELETE FROM answers WHERE expires_at <= ?", (time.time(),))
+
+    def _remember(self, key: str, value: dict, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """保存しているキャッシュをすべて削除する。"""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path and self.enabled:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM answers")
+
+    def stats(self) -> dict:
+        """ヒット/ミス数と保持件数を返す。"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": bool(self.db_path),
+            }
+
+
+# アプリケーション全体で共有する回答キャッシュ
+answer_cache = AnswerCache(ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_DB_PATH)
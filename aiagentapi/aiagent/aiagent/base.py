@@ -1,93 +1,526 @@
+import asyncio
+import json
+import logging
 import uuid
 from abc import ABC, abstractmethod
-from langchain.agents import AgentExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from aiagent.utils.timing import new_timing_callback, activate_timing
+from aiagent.utils.metrics import get_metrics_callback
+from aiagent.utils.usage import UsageTracker, activate_usage, get_usage_callback, DEFAULT_TOKEN_BUDGET
+from aiagent.aiagent.answer_cache import answer_cache, SIDE_EFFECT_TOOLS
+from aiagent.aiagent.model_registry import activate_model_overrides
+from aiagent.utils.deadline import (Deadline, DeadlineExceeded, activate_deadline, get_deadline_callback,
+                                    DEFAULT_TIMEOUT_SECONDS, DEADLINE_TIMEOUT, DEADLINE_CANCELLED)
+from app.core.config import settings
+from app.core.logger import getlogger
+
+if TYPE_CHECKING:
+    # langchain.agents は読み込みが重いため、型注釈でのみ参照する
+    from langchain.agents import AgentExecutor
+
+
+# ストリーミング時に送出するツール実行結果（Observation）の最大文字数
+STREAM_OBSERVATION_MAX_CHARS = settings.STREAM_OBSERVATION_MAX_CHARS
+# ReActの出力で最終回答の開始を示すマーカー
+FINAL_ANSWER_MARKER = "Final Answer:"
+# 実行を途中で打ち切った理由
+STOPPED_TOKEN_BUDGET = "token_budget"
+STOPPED_TIMEOUT = DEADLINE_TIMEOUT
+STOPPED_CANCELLED = DEADLINE_CANCELLED
+
+
+def _chunk_text(chunk) -> str:
+    """LLMのストリーミングチャンクからテキストを取り出す"""
+    if chunk is None:
+        return ""
+    content = getattr(chunk, "content", None)
+    if content is None:
+        content = getattr(chunk, "text", "")
+    if isinstance(content, list):
+        # Gemini などはパートのリストで返すことがある
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or ""
 
 
 class AiAgentBase(ABC):
-    def __init__(self):
+    # astream で最終回答のトークン送出を開始するマーカー（空文字の場合は全トークンを送出する）
+    final_answer_marker = FINAL_ANSWER_MARKER
+
+    def __init__(self, agent_executor: "AgentExecutor | None" = None):
+        """
+        Args:
+            agent_executor (AgentExecutor | None): プール等で構築済みの AgentExecutor。
+                指定時は再構築せずにそのまま利用する（リクエスト単位の状態のみ新規作成）。
+        """
+        # リクエスト単位の状態
         self.exeid = uuid.uuid4()
-        self.myaiagent = self.createAgentExecutor()
         self.chat_history = []
+        self.final_answer = None
+        # LLM・ツール呼び出しごとの処理時間を記録する（実行時に callbacks として渡す）
+        self.timing = new_timing_callback()
+        # トークン使用量とコストを集計する（上限を超えたらステップの区切りで打ち切る）
+        self.usage = UsageTracker(DEFAULT_TOKEN_BUDGET)
+        # 実行の期限（クライアント切断時の中断要求も扱う）。None の場合は無制限
+        self.deadline = Deadline(DEFAULT_TIMEOUT_SECONDS) if DEFAULT_TIMEOUT_SECONDS > 0 else None
+        # 実行を途中で打ち切った場合の理由 (例: "token_budget", "timeout")
+        self.stopped_reason = None
+        # ツール内部のLLM呼び出しに使うモデルの指定（処理の種類 -> モデル名）
+        self.model_overrides = None
+        # 回答キャッシュのキーに使うユーザー入力（None の場合はキャッシュを使わない）
+        self.cache_input = None
+        # 回答をキャッシュから返したか
+        self.cache_hit = False
+        # 実行中に呼び出したツール名
+        self.used_tools = []
+        # 共有可能な重いオブジェクト
+        self.myaiagent = agent_executor if agent_executor is not None else self.createAgentExecutor()
         return
 
     @abstractmethod
-    def createAgentExecutor(self) -> AgentExecutor:
+    def createAgentExecutor(self) -> "AgentExecutor":
         """サブクラスで AgentExecutor を生成して返す"""
         pass
 
+    def set_token_budget(self, max_tokens: int | None):
+        """この実行で使用できるトークン数の上限を設定する（None の場合は既定値）"""
+        if max_tokens:
+            self.usage.max_tokens = max_tokens
+
+    def set_deadline(self, timeout_seconds: float | None):
+        """この実行の制限時間（秒）を設定する（None の場合は既定値）"""
+        if timeout_seconds:
+            self.deadline = Deadline(timeout_seconds)
+
+    def cancel(self):
+        """実行中のエージェントに中断を要求する（次のLLM・ツール呼び出しの前、またはステップの区切りで停止する）"""
+        if self.deadline is None:
+            self.deadline = Deadline(None)
+        self.deadline.cancel()
+
+    def set_model_overrides(self, overrides: dict | None):
+        """ツール内部のLLM呼び出し（台本・件名生成等）に使うモデルを処理の種類ごとに指定する"""
+        self.model_overrides = overrides or None
+
+    def use_answer_cache(self, user_input: str):
+        """
+        同じ質問への回答をキャッシュから返すようにする。
+
+        エージェントへの入力には時刻などのメタ情報が含まれるため、キーには
+        メタ情報を付ける前のユーザー入力を使う。会話の文脈に依存する入力には使わないこと。
+        """
+        self.cache_input = user_input
+
+    def _answer_cache_key(self, thoughtProcessFlg) -> str | None:
+        if self.cache_input is None or not answer_cache.enabled:
+            return None
+        return answer_cache.make_key(
+            self.cache_input,
+            agent=type(self).__name__,
+            model=getattr(self, "model_name", None),
+            max_iterations=getattr(self, "max_iterations", None),
+            tools=sorted(t.name for t in self.myaiagent.tools),
+            thought_process=thoughtProcessFlg,
+            model_overrides=self.model_overrides
+        )
+
+    def _cached_result(self, user_input, key):
+        """キャッシュに回答があれば chat_history に追加して返す"""
+        if key is None:
+            return None
+        cached = answer_cache.get(key)
+        if cached is None:
+            return None
+        getlogger().debug("Answer cache hit (ID: %s)", self.exeid)
+        self.cache_hit = True
+        self.final_answer = cached["final_answer"]
+        self.chat_history.append({"role": "user", "content": user_input})
+        self.chat_history.append({"role": "assistant", "content": cached["content"]})
+        return self.chat_history
+
+    def _store_result(self, key, result):
+        """副作用のあるツールを使わずに最後まで実行できた場合のみ、回答をキャッシュに保存する"""
+        if key is None or not isinstance(result, list) or self.stopped_reason is not None:
+            return
+        side_effects = SIDE_EFFECT_TOOLS.intersection(self.used_tools)
+        if side_effects:
+            getlogger().debug("Answer not cached (ID: %s): side-effecting tools %s", self.exeid, sorted(side_effects))
+            return
+        answer_cache.set(key, {"final_answer": self.final_answer, "content": result[-1]["content"]})
+
+    def _needs_step_control(self) -> bool:
+        """トークン上限・期限がある場合は、ステップごとに打ち切りを判定できる stream で実行する"""
+        return bool(self.usage.max_tokens) or self.deadline is not None
+
     def invoke(self, user_input, thoughtProcessFlg=True):
-        """エージェントを実行し、最終的な出力を返す"""
+        """エージェントを実行し、最終的な出力を返す（use_answer_cache の指定時はキャッシュを利用する）"""
+        if not self.myaiagent:
+            raise RuntimeError("AgentExecutor has not been initialized.")
+        key = self._answer_cache_key(thoughtProcessFlg)
+        cached = self._cached_result(user_input, key)
+        if cached is not None:
+            return cached
+        result = self._invoke(user_input, thoughtProcessFlg)
+        self._store_result(key, result)
+        return result
+
+    async def ainvoke(self, user_input, thoughtProcessFlg=True):
+        """invoke の非同期版。LLM呼び出しとツール実行をイベントループ上で待ち受ける。"""
         if not self.myaiagent:
             raise RuntimeError("AgentExecutor has not been initialized.")
+        key = self._answer_cache_key(thoughtProcessFlg)
+        cached = self._cached_result(user_input, key)
+        if cached is not None:
+            return cached
+        result = await self._ainvoke(user_input, thoughtProcessFlg)
+        self._store_result(key, result)
+        return result
+
+    def _invoke(self, user_input, thoughtProcessFlg=True):
+        if self._needs_step_control():
+            # トークン上限・期限がある場合は途中結果を返せるよう stream で実行する
+            return self._collect_result(self.stream(user_input, thoughtProcessFlg))
         try:
             # AgentExecutorのinvokeメソッドは辞書を返すことが多い
             self.chat_history.append({"role": "user", "content": user_input})
-            result = self.myaiagent.invoke({"input": user_input})
-            # final_answer = result.get("output", result)
-            final_answer = result.get("output", str(result) if isinstance(result, dict) else result)
-            intermediate_steps = result.get("intermediate_steps", [])
-            
-            print("--------------------------")
-            print("--- Intermediate Steps ---")
-            print("--------------------------")
-            for action, observation in intermediate_steps:
-                # action は AgentAction オブジェクト
-                print(f"Action Tool: {action.tool}")
-                print(f"Action Input: {action.tool_input}")
-                # action.log には Action に至る思考プロセスが含まれることが多い
-                #print(f"Action Log: \n{action.log}")
-                #print(f"Observation: {observation}\n") # ツールの実行結果
-            print("--------------------------") 
-            print("--------------------------")
-
-            # 中間ステップを整形
-            formatted_steps = self.format_intermediate_steps(intermediate_steps)
-            
-            # 最終回答と中間出力（思考プロセス）を結合
-            if thoughtProcessFlg:
-                full_output = f"Final Answer:\n{final_answer}\n\n---\nThought Process:\n{formatted_steps}"
-            else:
-                full_output = final_answer
-            self.chat_history.append({"role": "assistant", "content": full_output})
-            return self.chat_history
+            with self._run_scope():
+                result = self.myaiagent.invoke({"input": user_input}, config=self._run_config())
+            return self._append_result(result, thoughtProcessFlg)
         except Exception as e:
             print(f"Error during agent invocation (ID: {self.exeid}): {e}")
             # エラー時の挙動を決める (エラーメッセージを返す、例外を再raiseするなど)
             return f"An error occurred during execution: {e}"
 
-    def format_intermediate_steps(self, intermediate_steps):
-        log = ""
-        for step_index, (action, tool_result) in enumerate(intermediate_steps):  # enumerate を使うとデバッグしやすい
-            log += f"\n--- Step {step_index + 1} ---"
-            log += f"\nAction: {action.log.strip()}"  # actionも整形する場合
-
-            # tool_result の型を確認して処理を分岐
-            observation_str = ""
-            if isinstance(tool_result, str):
-                # tool_resultが文字列の場合
-                observation_str = tool_result.strip()
-            elif isinstance(tool_result, dict):
-                # tool_resultが辞書の場合 (想定していた元の処理に近い)
-                # getのデフォルト値は空文字列ではなくNoneの方が区別しやすいかも
-                result_value = tool_result.get("result")
-                if isinstance(result_value, str):
-                    observation_str = result_value.strip()
-                elif result_value is not None:
-                    # resultキーの値が文字列でない場合の処理 (例: オブジェクトを文字列化)
-                    observation_str = str(result_value)
-                else:
-                    # resultキーが存在しない場合の処理 (辞書全体を文字列化など)
-                    observation_str = str(tool_result) # もしくは "" や エラーメッセージ
-            elif isinstance(tool_result, list):
-                # ★★★ tool_resultがリストの場合の処理 ★★★
-                # リストの各要素を文字列にして結合する例
-                observation_str = ", ".join(str(item) for item in tool_result)
-                # もしくは他の適切な表現方法で文字列化する
-                # observation_str = f"List results: {tool_result}"
+    async def _ainvoke(self, user_input, thoughtProcessFlg=True):
+        if self._needs_step_control():
+            return await self._acollect_result(self.astream(user_input, thoughtProcessFlg))
+        try:
+            self.chat_history.append({"role": "user", "content": user_input})
+            with self._run_scope():
+                result = await self.myaiagent.ainvoke({"input": user_input}, config=self._run_config())
+            return self._append_result(result, thoughtProcessFlg)
+        except Exception as e:
+            print(f"Error during agent invocation (ID: {self.exeid}): {e}")
+            return f"An error occurred during execution: {e}"
+
+    def stream(self, user_input, thoughtProcessFlg=True, observation_max_chars=STREAM_OBSERVATION_MAX_CHARS):
+        """
+        エージェントを実行し、ステップ単位の進捗を逐次返すジェネレータ（同期）。
+
+        ジェネレータを途中で閉じると、その時点でエージェントの実行も停止する。
+
+        Yields:
+            dict: {"event": イベント名, "data": 内容}
+                - action / step / final / error (astream と同じ形式。token は送出しない)
+        """
+        if not self.myaiagent:
+            raise RuntimeError("AgentExecutor has not been initialized.")
+
+        self.chat_history.append({"role": "user", "content": user_input})
+        intermediate_steps = []
+        final_answer = None
+        try:
+            try:
+                with self._run_scope():
+                    for chunk in self.myaiagent.stream({"input": user_input}, config=self._run_config()):
+                        for action in chunk.get("actions", []):
+                            yield {"event": "action", "data": {"tool": action.tool, "tool_input": action.tool_input}}
+                        for step in chunk.get("steps", []):
+                            intermediate_steps.append((step.action, step.observation))
+                            yield {"event": "step", "data": self._step_event_data(len(intermediate_steps), step, observation_max_chars)}
+                        if "output" in chunk:
+                            final_answer = chunk["output"]
+                        elif self._should_stop():
+                            final_answer = self._stopped_answer()
+                            break
+            except DeadlineExceeded as e:
+                # 期限切れ・キャンセル時は途中までのステップを結果として返す
+                self.stopped_reason = e.reason
+                final_answer = self._stopped_answer()
+
+            result = {"output": final_answer if final_answer is not None else "", "intermediate_steps": intermediate_steps}
+            yield {"event": "final", "data": {"result": self._append_result(result, thoughtProcessFlg)}}
+        except Exception as e:
+            getlogger().exception("Error during agent streaming (ID: %s)", self.exeid)
+            yield {"event": "error", "data": {"message": f"An error occurred during execution: {e}"}}
+
+    def cached_stream(self, user_input, thoughtProcessFlg=True):
+        """
+        stream と同じイベントを返すジェネレータ（use_answer_cache の指定時はキャッシュを利用する）。
+
+        キャッシュに回答があれば final イベントだけを返し、無ければ stream で実行して、
+        最後まで実行できた結果をキャッシュに保存する。
+        """
+        key = self._answer_cache_key(thoughtProcessFlg)
+        cached = self._cached_result(user_input, key)
+        if cached is not None:
+            yield {"event": "final", "data": {"result": cached}}
+            return
+        events = self.stream(user_input, thoughtProcessFlg)
+        try:
+            for event in events:
+                if event["event"] == "final":
+                    self._store_result(key, event["data"]["result"])
+                yield event
+        finally:
+            events.close()
+
+    def _step_event_data(self, step_no, step, observation_max_chars):
+        """step イベントの内容を組み立てる（Observation は切り詰める）"""
+        observation = self.observation_to_str(step.observation)
+        if len(observation) > observation_max_chars:
+            observation = observation[:observation_max_chars] + "..."
+        return {
+            "step": step_no,
+            "tool": step.action.tool,
+            "tool_input": step.action.tool_input,
+            "observation": observation
+        }
+
+    async def astream(self, user_input, thoughtProcessFlg=True, observation_max_chars=STREAM_OBSERVATION_MAX_CHARS):
+        """
+        エージェントを実行し、進捗をイベントとして逐次返す非同期ジェネレータ。
+
+        Args:
+            user_input (str): エージェントへの入力。
+            thoughtProcessFlg (bool): 最終結果に思考プロセスを含めるか。
+            observation_max_chars (int): step イベントに含める Observation の最大文字数。
+
+        Yields:
+            dict: {"event": イベント名, "data": 内容}
+                - action: ツール呼び出しの決定 (tool, tool_input)
+                - step: ツールの実行結果 (tool, tool_input, observation)
+                - token: 最終回答のトークン
+                - final: 最終結果 (result: chat_history)
+                - error: エラーメッセージ
+        """
+        if not self.myaiagent:
+            raise RuntimeError("AgentExecutor has not been initialized.")
+
+        self.chat_history.append({"role": "user", "content": user_input})
+        intermediate_steps = []
+        final_answer = None
+        buffers = {}            # run_id -> 最終回答マーカー検出前のテキスト
+        answer_runs = set()     # 最終回答のトークンを送出中の run_id
+        pending_lstrip = set()  # 最終回答の先頭の空白を除去する必要がある run_id
+        try:
+            try:
+                with self._run_scope():
+                    events = self.myaiagent.astream_events({"input": user_input}, config=self._run_config(), version="v2")
+                    try:
+                        async for event in self._with_deadline(events):
+                            kind = event["event"]
+                            run_id = event.get("run_id")
+
+                            if kind in ("on_chat_model_stream", "on_llm_stream"):
+                                token = _chunk_text(event["data"].get("chunk"))
+                                if run_id not in answer_runs:
+                                    # "Final Answer:" が現れるまではバッファし、以降をトークンとして送出する
+                                    buffered = buffers.get(run_id, "") + token
+                                    idx = buffered.find(self.final_answer_marker)
+                                    if idx < 0:
+                                        buffers[run_id] = buffered
+                                        continue
+                                    buffers.pop(run_id, None)
+                                    answer_runs.add(run_id)
+                                    pending_lstrip.add(run_id)
+                                    token = buffered[idx + len(self.final_answer_marker):]
+                                if run_id in pending_lstrip:
+                                    token = token.lstrip()
+                                    if token:
+                                        pending_lstrip.discard(run_id)
+                                if token:
+                                    yield {"event": "token", "data": {"text": token}}
+
+                            elif kind in ("on_chat_model_end", "on_llm_end"):
+                                buffers.pop(run_id, None)
+
+                            elif kind == "on_chain_stream" and not event.get("parent_ids"):
+                                # AgentExecutor 自身のストリーム出力（アクション・ステップ・最終出力）
+                                chunk = event["data"].get("chunk") or {}
+                                for action in chunk.get("actions", []):
+                                    yield {"event": "action", "data": {"tool": action.tool, "tool_input": action.tool_input}}
+                                for step in chunk.get("steps", []):
+                                    intermediate_steps.append((step.action, step.observation))
+                                    yield {"event": "step", "data": self._step_event_data(len(intermediate_steps), step, observation_max_chars)}
+                                if "output" in chunk:
+                                    final_answer = chunk["output"]
+                                elif self._should_stop():
+                                    final_answer = self._stopped_answer()
+                                    break
+                    finally:
+                        # 打ち切った場合も含め、エージェントの実行を確実に停止する
+                        await events.aclose()
+            except DeadlineExceeded as e:
+                # 期限切れ・キャンセル時は途中までのステップを結果として返す
+                self.stopped_reason = e.reason
+                final_answer = self._stopped_answer()
+
+            result = {"output": final_answer if final_answer is not None else "", "intermediate_steps": intermediate_steps}
+            yield {"event": "final", "data": {"result": self._append_result(result, thoughtProcessFlg)}}
+        except Exception as e:
+            getlogger().exception("Error during agent streaming (ID: %s)", self.exeid)
+            yield {"event": "error", "data": {"message": f"An error occurred during execution: {e}"}}
+
+    @contextmanager
+    def _run_scope(self):
+        """実行中のツール内部の処理時間・トークン使用量の記録先をこのエージェントに設定する"""
+        with activate_timing(self.timing), activate_usage(self.usage), activate_deadline(self.deadline), \
+                activate_model_overrides(self.model_overrides):
+            yield
+
+    def _run_config(self) -> dict:
+        """AgentExecutor の実行時に渡す config（処理時間・トークン使用量の記録、メトリクス収集用のコールバック）"""
+        return {
+            "callbacks": [self.timing, get_metrics_callback(), get_usage_callback(), get_deadline_callback()],
+            "metadata": {"agent": type(self).__name__, "model": getattr(self, "model_name", None) or "unknown"}
+        }
+
+    async def _with_deadline(self, events):
+        """期限までの残り時間を超えて次のイベントを待たないようにする（待機中のLLM・ツール呼び出しは中断される）"""
+        if self.deadline is None:
+            async for event in events:
+                yield event
+            return
+        while True:
+            self.deadline.check()
+            try:
+                event = await asyncio.wait_for(events.__anext__(), timeout=self.deadline.remaining())
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(STOPPED_TIMEOUT)
+            yield event
+
+    def _should_stop(self) -> bool:
+        """ステップの区切りで、トークン上限・期限により打ち切るべきかを判定し、理由を記録する"""
+        if self.usage.exceeded():
+            self.stopped_reason = STOPPED_TOKEN_BUDGET
+            getlogger().warning("Token budget exceeded (ID: %s): %d / %d tokens",
+                                 self.exeid, self.usage.total_tokens, self.usage.max_tokens)
+            return True
+        if self.deadline is not None:
+            try:
+                self.deadline.check()
+            except DeadlineExceeded as e:
+                self.stopped_reason = e.reason
+                return True
+        return False
+
+    def _stopped_answer(self) -> str:
+        """途中で打ち切った場合に最終回答の代わりに返すメッセージ"""
+        getlogger().warning("Agent execution stopped (ID: %s): %s", self.exeid, self.stopped_reason)
+        if self.stopped_reason == STOPPED_TOKEN_BUDGET:
+            reason = f"トークン使用量が上限（{self.usage.max_tokens} tokens）に達したため"
+        elif self.stopped_reason == STOPPED_TIMEOUT:
+            reason = f"制限時間（{self.deadline.timeout_seconds:g}秒）を超えたため"
+        else:
+            reason = "キャンセルされたため"
+        return f"{reason}、実行を中断しました。途中までの結果は思考プロセスを参照してください。"
+
+    @staticmethod
+    def _result_from_event(event, result):
+        """stream / astream のイベントから invoke の戻り値を取り出す"""
+        if event["event"] == "final":
+            return event["data"]["result"]
+        if event["event"] == "error":
+            return event["data"]["message"]
+        return result
+
+    def _collect_result(self, events):
+        """stream を最後まで実行し、invoke と同じ形式の結果を返す"""
+        result = None
+        for event in events:
+            result = self._result_from_event(event, result)
+        return result
+
+    async def _acollect_result(self, events):
+        """_collect_result の非同期版"""
+        result = None
+        async for event in events:
+            result = self._result_from_event(event, result)
+        return result
+
+    def usage_summary(self) -> dict:
+        """トークン使用量とコストの集計（モデル別・ツール別の内訳を含む）を返す"""
+        return self.usage.summary()
+
+    def timing_summary(self) -> dict:
+        """LLM・ツール呼び出しごとの処理時間とトークン数の集計を返す"""
+        return self.timing.summary()
+
+    def _append_result(self, result, thoughtProcessFlg):
+        """AgentExecutor の実行結果を整形して chat_history に追加する"""
+        # final_answer = result.get("output", result)
+        final_answer = result.get("output", str(result) if isinstance(result, dict) else result)
+        intermediate_steps = result.get("intermediate_steps", [])
+        self.final_answer = final_answer
+        self.used_tools = [action.tool for action, _ in intermediate_steps]
+
+        # 中間ステップ・処理時間・使用量は LOG_LEVEL=DEBUG の場合のみログに出力する
+        if getlogger().isEnabledFor(logging.DEBUG):
+            self._log_run_summary(intermediate_steps)
+
+        # 中間ステップを整形
+        formatted_steps = self.format_intermediate_steps(intermediate_steps)
+
+        # 最終回答と中間出力（思考プロセス）を結合
+        if thoughtProcessFlg:
+            full_output = f"Final Answer:\n{final_answer}\n\n---\nThought Process:\n{formatted_steps}"
+        else:
+            full_output = final_answer
+        self.chat_history.append({"role": "assistant", "content": full_output})
+        return self.chat_history
+
+    def _log_run_summary(self, intermediate_steps):
+        """中間ステップ（ツール名・入力）と、処理時間の内訳（明細は除く）・使用量をデバッグログに出力する"""
+        _logger = getlogger()
+        for action, _ in intermediate_steps:
+            _logger.debug("Intermediate step (ID: %s): tool=%s input=%s", self.exeid, action.tool, action.tool_input)
+        _timing = self.timing_summary()
+        _timing.pop("events")
+        _logger.debug("Timing (ID: %s): %s", self.exeid, json.dumps(_timing, ensure_ascii=False))
+        _usage = self.usage_summary()
+        _logger.debug("Usage (ID: %s): %s tokens, $%s by_model=%s", self.exeid, _usage["total_tokens"],
+                      _usage["cost_usd"], json.dumps(_usage["by_model"], ensure_ascii=False))
+
+    @staticmethod
+    def observation_to_str(tool_result) -> str:
+        """ツールの実行結果を文字列化する"""
+        # tool_result の型を確認して処理を分岐
+        observation_str = ""
+        if isinstance(tool_result, str):
+            # tool_resultが文字列の場合
+            observation_str = tool_result.strip()
+        elif isinstance(tool_result, dict):
+            # tool_resultが辞書の場合 (想定していた元の処理に近い)
+            # getのデフォルト値は空文字列ではなくNoneの方が区別しやすいかも
+            result_value = tool_result.get("result")
+            if isinstance(result_value, str):
+                observation_str = result_value.strip()
+            elif result_value is not None:
+                # resultキーの値が文字列でない場合の処理 (例: オブジェクトを文字列化)
+                observation_str = str(result_value)
             else:
-                # その他の型の場合 (None など)
-                observation_str = str(tool_result)  # とりあえず文字列化
+                # resultキーが存在しない場合の処理 (辞書全体を文字列化など)
+                observation_str = str(tool_result) # もしくは "" や エラーメッセージ
+        elif isinstance(tool_result, list):
+            # ★★★ tool_resultがリストの場合の処理 ★★★
+            # リストの各要素を文字列にして結合する例
+            observation_str = ", ".join(str(item) for item in tool_result)
+            # もしくは他の適切な表現方法で文字列化する
+            # observation_str = f"List results: {tool_result}"
+        else:
+            # その他の型の場合 (None など)
+            observation_str = str(tool_result)  # とりあえず文字列化
+        return observation_str
 
-            log += f"\nObservation: {observation_str}"
+    def format_intermediate_steps(self, intermediate_steps):
+        # ステップごとの断片をリストに溜めて最後に1回だけ結合する（文字列の += による再コピーを避ける）
+        parts = []
+        for step_index, (action, tool_result) in enumerate(intermediate_steps):  # enumerate を使うとデバッグしやすい
+            parts.append(f"--- Step {step_index + 1} ---")
+            parts.append(f"Action: {action.log.strip()}")  # actionも整形する場合
+            parts.append(f"Observation: {self.observation_to_str(tool_result)}")
 
-        return log.strip()  # 最終的なログの前後空白を削除
\ No newline at end of file
+        return "\n".join(parts).strip()  # 最終的なログの前後空白を削除
@@ -1,16 +1,21 @@
+from aiagent.aiagent.model_registry import is_openai, is_gemini, is_reasoning, supports_vision
+
+
+# モデル名による API の判定（判定内容は model_registry のモデル定義に従う）
+def isChatGptAPI(_selected_model):
+    """OpenAI の Chat Completions で system ロールを使えるモデルか"""
+    return is_openai(_selected_model) and not is_reasoning(_selected_model)
+
+
+def isChatGPT_o(_selected_model):
+    """OpenAI の推論モデル（o1 / o3 / o4 系）か"""
+    return is_openai(_selected_model) and is_reasoning(_selected_model)
+
+
 def isChatGPTImageAPI(_selected_model):
-    if "gpt-4o" in _selected_model:
-        return True
-    elif "o1" in _selected_model:
-        return True
-    elif "o3" in _selected_model:
-        return True
-    else:
-        return False
+    """OpenAI の画像入力に対応したモデルか"""
+    return is_openai(_selected_model) and supports_vision(_selected_model)
 
 
 def isGemini(_selected_model):
-    if "gemini" in _selected_model:
-        return True
-    else:
-        return False
\ No newline at end of file
+    return is_gemini(_selected_model)
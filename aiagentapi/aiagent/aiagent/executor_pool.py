@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, asynccontextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # langchain.agents は読み込みが重いため、型注釈でのみ参照する
+    from langchain.agents import AgentExecutor
+
+
+class AgentExecutorPool:
+    """
+    AgentExecutor をキー単位でプールし、リクエスト間で再利用するクラス。
+
+    LLMクライアント・プロンプト・AgentExecutor の生成は重いため、一度構築したものを
+    (エージェントクラス, model_name, max_iterations, ツール構成) をキーとして保持し、
+    リクエストごとに貸し出す（lease）。貸し出し中の AgentExecutor は他のリクエストと
+    共有しないため、コールバック等の実行時状態が混ざることはない。
+    chat_history や exeid などのリクエスト単位の状態は、貸し出し時に生成する
+    軽量なエージェントインスタンス側に持たせる。
+    """
+
+    def __init__(self, max_idle_per_key: int = 8):
+        """
+        Args:
+            max_idle_per_key (int): キーごとに保持する待機中 AgentExecutor の最大数。
+        """
+        self.max_idle_per_key = max_idle_per_key
+        self._idle = defaultdict(list)
+        self._in_use = defaultdict(int)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._builds = 0
+        self._build_time_total = 0.0
+        self._build_time_max = 0.0
+
+    @staticmethod
+    def make_key(agent_cls, model_name: str, max_iterations: int, tools: list) -> tuple:
+        """プールのキーを生成する。ツールは名前の組で識別する。"""
+        return (agent_cls.__name__, model_name, max_iterations, tuple(sorted(t.name for t in tools)))
+
+    def _acquire(self, key: tuple, build) -> "AgentExecutor":
+        with self._lock:
+            idle = self._idle[key]
+            if idle:
+                self._hits += 1
+                self._in_use[key] += 1
+                return idle.pop()
+            self._misses += 1
+            self._in_use[key] += 1
+
+        # 構築はロック外で行い、他キーの貸し出しを妨げない
+        start = time.perf_counter()
+        try:
+            executor = build()
+        except Exception:
+            with self._lock:
+                self._in_use[key] -= 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._builds += 1
+            self._build_time_total += elapsed
+            self._build_time_max = max(self._build_time_max, elapsed)
+        return executor
+
+    def _release(self, key: tuple, executor: "AgentExecutor"):
+        with self._lock:
+            self._in_use[key] -= 1
+            # 上限を超える分は破棄する（バースト時に増えた分を抱え続けない）
+            if len(self._idle[key]) < self.max_idle_per_key:
+                self._idle[key].append(executor)
+
+    def _prepare(self, agent_cls, model_name, max_iterations, tools, verbose):
+        """デフォルト値を解決し、プールのキーと構築関数・エージェント生成関数を返す"""
+        model_name = model_name if model_name is not None else agent_cls.DEFAULT_MODEL
+        max_iterations = max_iterations if max_iterations is not None else agent_cls.DEFAULT_MAX_ITERATIONS
+        tools = tools if tools is not None else agent_cls.DEFAULT_MAX_TOOLS
+        key = self.make_key(agent_cls, model_name, max_iterations, tools)
+
+        def build():
+            return agent_cls(
+                model_name=model_name,
+                max_iterations=max_iterations,
+                verbose=verbose,
+                tools=tools
+            ).myaiagent
+
+        def wrap(executor):
+            return agent_cls(
+                model_name=model_name,
+                max_iterations=max_iterations,
+                verbose=verbose,
+                tools=tools,
+                agent_executor=executor
+            )
+
+        return key, build, wrap
+
+    @contextmanager
+    def lease(self, agent_cls, model_name: str | None = None, max_iterations: int | None = None,
+              tools: list | None = None, verbose: bool = False):
+        """
+        AgentExecutor を貸し出し、それを使うリクエスト単位のエージェントを返す。
+
+        Args:
+            agent_cls: AiAgentBase を継承したエージェントクラス (例: StandardAiAgent)。
+            model_name (str | None): 使用するLLMモデル名。None の場合はクラスのデフォルト。
+            max_iterations (int | None): 最大反復回数。None の場合はクラスのデフォルト。
+            tools (list | None): 使用するツールのリスト。None の場合はクラスのデフォルト。
+            verbose (bool): 詳細ログ出力を行うか。
+
+        Yields:
+            AiAgentBase: 貸し出した AgentExecutor を保持するエージェントインスタンス。
+        """
+        key, build, wrap = self._prepare(agent_cls, model_name, max_iterations, tools, verbose)
+        executor = self._acquire(key, build)
+        try:
+            yield wrap(executor)
+        finally:
+            self._release(key, executor)
+
+    @asynccontextmanager
+    async def alease(self, agent_cls, model_name: str | None = None, max_iterations: int | None = None,
+                     tools: list | None = None, verbose: bool = False):
+        """lease の非同期版。プールミス時の構築はワーカースレッドで行いイベントループを塞がない。"""
+        key, build, wrap = self._prepare(agent_cls, model_name, max_iterations, tools, verbose)
+        executor = await asyncio.to_thread(self._acquire, key, build)
+        try:
+            yield wrap(executor)
+        finally:
+            self._release(key, executor)
+
+    def stats(self) -> dict:
+        """ヒット/ミス数と構築時間の統計を返す。"""
+        with self._lock:
+            builds = self._builds
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "builds": builds,
+                "hit_rate": self._hits / total if total else 0.0,
+                "build_time_total_sec": self._build_time_total,
+                "build_time_avg_sec": self._build_time_total / builds if builds else 0.0,
+                "build_time_max_sec": self._build_time_max,
+                "in_use": sum(self._in_use.values()),
+                "idle": sum(len(v) for v in self._idle.values()),
+                "keys": len(self._idle),
+            }
+
+    def clear(self):
+        """待機中の AgentExecutor をすべて破棄する。"""
+        with self._lock:
+            self._idle.clear()
+
+
+# アプリケーション全体で共有するプール
+executor_pool = AgentExecutorPool()
@@ -0,0 +1,118 @@
+from contextlib import aclosing
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.messages import convert_to_messages, message_chunk_to_message
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, LLMResult
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig, ensure_config
+from langchain_core.runnables.config import get_async_callback_manager_for_config, get_callback_manager_for_config
+from aiagent.utils.hedging import Hedger
+
+
+class HedgedChatModel(Runnable):
+    """
+    LangChain のチャットモデルをヘッジするラッパー。
+
+    invoke / ainvoke は応答全体、astream は最初のチャンクまでの時間でヘッジする。
+    bind_tools は両方のモデルに適用する。bind で指定した引数（stop 等）は invoke / astream の
+    キーワード引数として受け取り、両方のモデルにそのまま渡す。
+
+    ヘッジした各リクエストはコールバックを外して実行し、勝った側の応答だけを1回のチャットモデルの実行として
+    呼び出し元の config のコールバックに通知する（負けた側の使用量・所要時間・トークンは記録されない）。
+    """
+
+    def __init__(self, primary, backup, primary_name: str, backup_name: str, task: str, hedger: Hedger):
+        self.primary = primary
+        self.backup = backup
+        self.primary_name = primary_name
+        self.backup_name = backup_name
+        self.task = task
+        self.hedger = hedger
+
+    def _model(self, model_name: str):
+        return self.primary if model_name == self.primary_name else self.backup
+
+    @staticmethod
+    def _attempt_config(config: RunnableConfig) -> RunnableConfig:
+        # None ではコンテキストの親の config のコールバックを引き継ぐため、空のリストで明示的に外す
+        return {**config, "callbacks": [], "run_id": None}
+
+    def _start_params(self, input, config: RunnableConfig, kwargs: dict) -> dict:
+        """on_chat_model_start に渡す引数（モデル名は勝った側が決まってから on_llm_end で通知する）"""
+        messages = input.to_messages() if isinstance(input, PromptValue) else convert_to_messages(
+            [("human", input)] if isinstance(input, str) else input)
+        return {
+            "serialized": {"name": self.get_name()},
+            "messages": [messages],
+            "invocation_params": dict(kwargs),
+            "name": config.get("run_name"),
+            "run_id": config.pop("run_id", None),
+        }
+
+    @staticmethod
+    def _result(model_name: str, message) -> LLMResult:
+        return LLMResult(generations=[[ChatGeneration(message=message)]], llm_output={"model_name": model_name})
+
+    def invoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        run_manager: CallbackManagerForLLMRun = get_callback_manager_for_config(config).on_chat_model_start(
+            **self._start_params(input, config, kwargs))[0]
+        attempt_config = self._attempt_config(config)
+        try:
+            model_name, message = self.hedger.call(
+                self.primary_name, self.backup_name, self.task,
+                lambda m: (m, self._model(m).invoke(input, attempt_config, **kwargs)))
+        except BaseException as e:
+            run_manager.on_llm_error(e)
+            raise
+        run_manager.on_llm_end(self._result(model_name, message))
+        return message
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        run_manager: AsyncCallbackManagerForLLMRun = (
+            await get_async_callback_manager_for_config(config).on_chat_model_start(
+                **self._start_params(input, config, kwargs)))[0]
+        attempt_config = self._attempt_config(config)
+
+        async def call(m):
+            return m, await self._model(m).ainvoke(input, attempt_config, **kwargs)
+        try:
+            model_name, message = await self.hedger.acall(self.primary_name, self.backup_name, self.task, call)
+        except BaseException as e:
+            await run_manager.on_llm_error(e)
+            raise
+        await run_manager.on_llm_end(self._result(model_name, message))
+        return message
+
+    async def astream(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        run_manager: AsyncCallbackManagerForLLMRun = (
+            await get_async_callback_manager_for_config(config).on_chat_model_start(
+                **self._start_params(input, config, kwargs)))[0]
+        attempt_config = self._attempt_config(config)
+
+        async def open_stream(m):
+            async with aclosing(self._model(m).astream(input, attempt_config, **kwargs)) as stream:
+                async for chunk in stream:
+                    yield m, chunk
+
+        model_name, aggregated = self.primary_name, None
+        try:
+            async for model_name, chunk in self.hedger.astream(self.primary_name, self.backup_name, self.task,
+                                                               open_stream):
+                aggregated = chunk if aggregated is None else aggregated + chunk
+                # 勝った側のトークンだけを通知する（astream_events の on_chat_model_stream になる）
+                await run_manager.on_llm_new_token(chunk.content if isinstance(chunk.content, str) else "",
+                                                   chunk=ChatGenerationChunk(message=chunk))
+                yield chunk
+        except BaseException as e:
+            await run_manager.on_llm_error(e)
+            raise
+        if aggregated is not None:
+            await run_manager.on_llm_end(self._result(model_name, message_chunk_to_message(aggregated)))
+        else:
+            await run_manager.on_llm_end(LLMResult(generations=[[]], llm_output={"model_name": model_name}))
+
+    def bind_tools(self, tools, **kwargs) -> "HedgedChatModel":
+        return HedgedChatModel(self.primary.bind_tools(tools, **kwargs), self.backup.bind_tools(tools, **kwargs),
+                               self.primary_name, self.backup_name, self.task, self.hedger)
@@ -0,0 +1,228 @@
+import contextvars
+import os
+from contextlib import contextmanager, suppress
+from pydantic import BaseModel, ConfigDict
+from aiagent.utils.usage import estimate_cost, normalize_model_name
+from app.core.config import settings
+from app.core.logger import getlogger
+
+
+# 機能
+CAP_TOOLS = "tools"                        # ツール呼び出し（エージェントで使用）
+CAP_VISION = "vision"                      # 画像入力
+CAP_SEARCH_GROUNDING = "search_grounding"  # Google検索によるグラウンディング
+CAP_REASONING = "reasoning"                # 推論モデル（system ロールや画像入力の扱いが異なる）
+
+
+class ModelSpec(BaseModel):
+    """モデルの性能・機能の定義"""
+    model_config = ConfigDict(frozen=True)
+
+    name: str
+    provider: str                     # "openai" / "gemini"
+    context_window: int               # 入力+出力の最大トークン数
+    max_output_tokens: int
+    typical_latency_sec: float        # 1000トークン程度を生成する場合の目安
+    quality: int                      # 1: 軽量 / 2: 標準 / 3: 高性能
+    capabilities: frozenset[str] = frozenset()
+
+
+# 利用可能なモデル。料金は usage.MODEL_PRICES を参照する
+MODEL_REGISTRY = {spec.name: spec for spec in [
+    ModelSpec(name="gpt-4o-mini", provider="openai", context_window=128_000, max_output_tokens=16_384,
+              typical_latency_sec=4, quality=1, capabilities=frozenset({CAP_TOOLS, CAP_VISION})),
+    ModelSpec(name="gpt-4o", provider="openai", context_window=128_000, max_output_tokens=16_384,
+              typical_latency_sec=6, quality=2, capabilities=frozenset({CAP_TOOLS, CAP_VISION})),
+    ModelSpec(name="gpt-4.1-mini", provider="openai", context_window=1_047_576, max_output_tokens=32_768,
+              typical_latency_sec=4, quality=1, capabilities=frozenset({CAP_TOOLS, CAP_VISION})),
+    ModelSpec(name="gpt-4.1", provider="openai", context_window=1_047_576, max_output_tokens=32_768,
+              typical_latency_sec=7, quality=2, capabilities=frozenset({CAP_TOOLS, CAP_VISION})),
+    ModelSpec(name="o3-mini", provider="openai", context_window=200_000, max_output_tokens=100_000,
+              typical_latency_sec=15, quality=3, capabilities=frozenset({CAP_TOOLS, CAP_REASONING})),
+    ModelSpec(name="o4-mini", provider="openai", context_window=200_000, max_output_tokens=100_000,
+              typical_latency_sec=12, quality=3, capabilities=frozenset({CAP_TOOLS, CAP_VISION, CAP_REASONING})),
+    ModelSpec(name="o1", provider="openai", context_window=200_000, max_output_tokens=100_000,
+              typical_latency_sec=30, quality=3, capabilities=frozenset({CAP_VISION, CAP_REASONING})),
+    ModelSpec(name="gemini-1.5-flash", provider="gemini", context_window=1_048_576, max_output_tokens=8_192,
+              typical_latency_sec=3, quality=1, capabilities=frozenset({CAP_TOOLS, CAP_VISION, CAP_SEARCH_GROUNDING})),
+    ModelSpec(name="gemini-1.5-pro", provider="gemini", context_window=2_097_152, max_output_tokens=8_192,
+              typical_latency_sec=8, quality=2, capabilities=frozenset({CAP_TOOLS, CAP_VISION, CAP_SEARCH_GROUNDING})),
+    ModelSpec(name="gemini-2.0-flash", provider="gemini", context_window=1_048_576, max_output_tokens=8_192,
+              typical_latency_sec=3, quality=1, capabilities=frozenset({CAP_TOOLS, CAP_VISION})),
+    ModelSpec(name="gemini-2.5-flash", provider="gemini", context_window=1_048_576, max_output_tokens=65_536,
+              typical_latency_sec=5, quality=2, capabilities=frozenset({CAP_TOOLS, CAP_VISION})),
+    ModelSpec(name="gemini-2.5-pro", provider="gemini", context_window=1_048_576, max_output_tokens=65_536,
+              typical_latency_sec=15, quality=3, capabilities=frozenset({CAP_TOOLS, CAP_VISION, CAP_REASONING})),
+]}
+
+# 処理の種類ごとの要件: 必要な機能、最低限の品質、想定する出力トークン数、入力（本文）のトークン数の上限
+TASK_GENERAL = "general"
+TASK_AGENT = "agent"
+TASK_SUBJECT = "subject"
+TASK_SCRIPT = "script"
+TASK_SEARCH = "search"
+TASK_SUMMARY = "summary"
+TASK_PROFILES = {
+    TASK_GENERAL: {"capabilities": frozenset(), "min_quality": 1, "output_tokens": 2_000, "max_input_tokens": 32_000},
+    TASK_AGENT: {"capabilities": frozenset({CAP_TOOLS}), "min_quality": 2, "output_tokens": 2_000, "max_input_tokens": 32_000},
+    TASK_SUBJECT: {"capabilities": frozenset(), "min_quality": 1, "output_tokens": 100, "max_input_tokens": 4_000},
+    TASK_SCRIPT: {"capabilities": frozenset(), "min_quality": 1, "output_tokens": 8_000, "max_input_tokens": 24_000},
+    TASK_SEARCH: {"capabilities": frozenset({CAP_SEARCH_GROUNDING}), "min_quality": 2, "output_tokens": 2_000, "max_input_tokens": 8_000},
+    TASK_SUMMARY: {"capabilities": frozenset(), "min_quality": 1, "output_tokens": 1_000, "max_input_tokens": 8_000},
+}
+
+# 候補とするモデルを限定する（例: "gpt-4o-mini,gemini-1.5-pro"。空の場合は登録済みの全モデル）
+MODEL_ROUTER_CANDIDATES = [m.strip() for m in settings.MODEL_ROUTER_CANDIDATES.split(",") if m.strip()]
+# モデルの指定が無い処理で select_model による自動選択を使うか（false の場合は TASK_DEFAULT_MODELS を使う）
+MODEL_ROUTER_ENABLED = settings.MODEL_ROUTER_ENABLED
+# 処理の種類ごとに使用するモデル（MODEL_ROUTE_<TASK>。空の場合は既定のモデル・自動選択）
+MODEL_ROUTES = {task: getattr(settings, f"MODEL_ROUTE_{task.upper()}") for task in TASK_PROFILES}
+# 自動選択を使わない場合の、処理の種類ごとの既定のモデル
+TASK_DEFAULT_MODELS = {
+    TASK_GENERAL: "gpt-4o-mini",
+    TASK_AGENT: "gemini-1.5-pro",
+    TASK_SUBJECT: "gemini-1.5-flash",
+    TASK_SCRIPT: "gpt-4o-mini",
+    TASK_SEARCH: "gemini-1.5-pro",
+    TASK_SUMMARY: "gpt-4o-mini",
+}
+
+# リクエスト単位のモデル指定（処理の種類 -> モデル名）
+_model_overrides = contextvars.ContextVar("model_overrides", default=None)
+
+
+def get_model_spec(model_name: str) -> ModelSpec:
+    """
+    モデル名から定義を返す。登録されていないモデルは名前から推定する。
+
+    'gpt-4o-2024-08-06' のような日付付きの名前は、前方一致で最も長く一致した定義を使う。
+    """
+    model_name = normalize_model_name(model_name)
+    spec = MODEL_REGISTRY.get(model_name)
+    if spec is not None:
+        return spec
+    matches = [key for key in MODEL_REGISTRY if model_name.startswith(key)]
+    if matches:
+        return MODEL_REGISTRY[max(matches, key=len)].model_copy(update={"name": model_name})
+    return _infer_spec(model_name)
+
+
+def _infer_spec(model_name: str) -> ModelSpec:
+    """未登録のモデルの定義を名前から推定する（性能値は控えめに見積もる）"""
+    if "gemini" in model_name:
+        return ModelSpec(name=model_name, provider="gemini", context_window=1_048_576, max_output_tokens=8_192,
+                         typical_latency_sec=10, quality=2, capabilities=frozenset({CAP_TOOLS}))
+    if model_name.startswith(("o1", "o3", "o4")):
+        return ModelSpec(name=model_name, provider="openai", context_window=128_000, max_output_tokens=32_768,
+                         typical_latency_sec=30, quality=3, capabilities=frozenset({CAP_REASONING}))
+    if "gpt" in model_name:
+        return ModelSpec(name=model_name, provider="openai", context_window=128_000, max_output_tokens=4_096,
+                         typical_latency_sec=10, quality=2, capabilities=frozenset({CAP_TOOLS}))
+    return ModelSpec(name=model_name, provider="unknown", context_window=0, max_output_tokens=0,
+                     typical_latency_sec=0, quality=0)
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算。ASCIIは4文字で1トークン、それ以外（日本語等）は1文字1トークンとみなす。"""
+    text = text or ""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def _available_providers() -> set:
+    """APIキーが設定されているプロバイダ（どちらも未設定の場合は制限しない）"""
+    providers = set()
+    if os.getenv("OPENAI_API_KEY"):
+        providers.add("openai")
+    if os.getenv("GEMINI_API_KEY"):
+        providers.add("gemini")
+    return providers or {"openai", "gemini"}
+
+
+def select_model(task: str = TASK_GENERAL, input_tokens: int = 0, providers: set | None = None) -> str:
+    """
+    処理の種類と入力サイズから、要件を満たすモデルのうち最も速いものを選ぶ。
+
+    速さが同じ場合は推定コストの低いものを選ぶ。
+
+    Args:
+        task (str): 処理の種類（TASK_PROFILES のキー）。
+        input_tokens (int): 入力トークン数の概算。
+        providers (set | None): 使用するプロバイダを限定する場合に指定する。
+
+    Returns:
+        str: モデル名。
+
+    Raises:
+        ValueError: 要件を満たすモデルが無い場合。
+    """
+    profile = TASK_PROFILES.get(task, TASK_PROFILES[TASK_GENERAL])
+    output_tokens = profile["output_tokens"]
+    providers = (providers or _available_providers()) & _available_providers()
+    candidates = [
+        spec for name, spec in MODEL_REGISTRY.items()
+        if (not MODEL_ROUTER_CANDIDATES or name in MODEL_ROUTER_CANDIDATES)
+        and spec.provider in providers
+        and profile["capabilities"] <= spec.capabilities
+        and spec.quality >= profile["min_quality"]
+        and spec.context_window >= input_tokens + output_tokens
+        and spec.max_output_tokens >= output_tokens
+    ]
+    if not candidates:
+        raise ValueError(f"No model satisfies task '{task}' with {input_tokens} input tokens.")
+    best = min(candidates, key=lambda s: (s.typical_latency_sec, estimate_cost(s.name, input_tokens, output_tokens)))
+    return best.name
+
+
+def route_model(task: str = TASK_GENERAL, input_text: str = "", model_name: str | None = None,
+                providers: set | None = None) -> str:
+    """
+    処理に使用するモデル名を決める。
+
+    優先順位は、リクエスト単位の指定（activate_model_overrides）、呼び出し元の指定（model_name）、
+    環境変数 MODEL_ROUTE_<TASK>（例: MODEL_ROUTE_SCRIPT=gpt-4o）の順。いずれも無い場合は TASK_DEFAULT_MODELS の
+    モデルを使い、MODEL_ROUTER_ENABLED=true の場合のみ select_model で自動選択する。
+
+    Args:
+        task (str): 処理の種類（TASK_PROFILES のキー）。
+        input_text (str): 入力テキスト（トークン数の概算に使用）。
+        model_name (str | None): 呼び出し元が指定したモデル名。
+        providers (set | None): 自動選択時に使用するプロバイダを限定する場合に指定する。
+    """
+    overrides = _model_overrides.get() or {}
+    chosen = overrides.get(task) or model_name or MODEL_ROUTES.get(task)
+    if chosen:
+        return chosen
+    if not MODEL_ROUTER_ENABLED:
+        return TASK_DEFAULT_MODELS.get(task, TASK_DEFAULT_MODELS[TASK_GENERAL])
+    chosen = select_model(task, estimate_tokens(input_text), providers)
+    getlogger().debug("Model routed: task=%s -> %s", task, chosen)
+    return chosen
+
+
+@contextmanager
+def activate_model_overrides(overrides: dict | None):
+    """この区間（およびそこから起動したスレッド・タスク）のモデル選択を処理の種類ごとに上書きする"""
+    token = _model_overrides.set(overrides or None)
+    try:
+        yield
+    finally:
+        with suppress(ValueError):
+            _model_overrides.reset(token)
+
+
+# --- モデル名による API の判定 ---
+def is_openai(model_name: str) -> bool:
+    return get_model_spec(model_name).provider == "openai"
+
+
+def is_gemini(model_name: str) -> bool:
+    return get_model_spec(model_name).provider == "gemini"
+
+
+def is_reasoning(model_name: str) -> bool:
+    return CAP_REASONING in get_model_spec(model_name).capabilities
+
+
+def supports_vision(model_name: str) -> bool:
+    return CAP_VISION in get_model_spec(model_name).capabilities
@@ -0,0 +1,89 @@
+import re
+from typing import TYPE_CHECKING
+from aiagent.aiagent.model_registry import estimate_tokens
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+
+# 1つの Observation をLLMに渡す際のトークン数の上限（0 の場合は切り詰めない）
+SCRATCHPAD_OBSERVATION_MAX_TOKENS = settings.SCRATCHPAD_OBSERVATION_MAX_TOKENS
+# そのままLLMに渡す直近のステップ数。これより古いステップは要約する（0 の場合は要約しない）
+SCRATCHPAD_WINDOW = settings.SCRATCHPAD_WINDOW
+# 要約したステップの Observation のトークン数の上限
+SCRATCHPAD_SUMMARY_MAX_TOKENS = settings.SCRATCHPAD_SUMMARY_MAX_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    estimate_tokens の概算で max_tokens に収まるようテキストの末尾を切り詰める。
+
+    切り詰めた場合は元の文字数を末尾に付記する。
+    """
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    budget = float(max_tokens)
+    end = 0
+    for end, c in enumerate(text):
+        budget -= 0.25 if ord(c) < 128 else 1.0
+        if budget < 0:
+            break
+    return f"{text[:end]}\n...(以下省略: 全{len(text)}文字)"
+
+
+def _observation_text(observation) -> str:
+    # LangChain の scratchpad と同じく str() で文字列化する
+    return observation if isinstance(observation, str) else str(observation)
+
+
+def summarize_observation(observation, max_tokens: int = SCRATCHPAD_SUMMARY_MAX_TOKENS) -> str:
+    """
+    古いステップの Observation を短い抜粋にする。
+
+    ステップごとにLLMで要約すると1回の反復ごとに呼び出しが増えるため、
+    空白を詰めた先頭部分を抜粋として使う。
+    """
+    text = re.sub(r"\s+", " ", _observation_text(observation)).strip()
+    return "(要約) " + truncate_to_tokens(text, max_tokens)
+
+
+def compact_steps(intermediate_steps: list,
+                  window: int = SCRATCHPAD_WINDOW,
+                  max_tokens: int = SCRATCHPAD_OBSERVATION_MAX_TOKENS) -> list:
+    """
+    LLMに渡す中間ステップの Observation を圧縮する。
+
+    直近 window 個のステップは max_tokens まで、それより古いステップは要約を渡す。
+    アクションはそのまま残すため、ツール呼び出しとその結果の対応は崩れない。
+
+    Args:
+        intermediate_steps (list): (AgentAction, Observation) のリスト。
+        window (int): そのまま渡す直近のステップ数（0 の場合は要約しない）。
+        max_tokens (int): 1つの Observation のトークン数の上限。
+
+    Returns:
+        list: Observation を文字列に置き換えた (AgentAction, str) のリスト。
+    """
+    older = len(intermediate_steps) - window if window > 0 else 0
+    compacted = []
+    for i, (action, observation) in enumerate(intermediate_steps):
+        if i < older:
+            compacted.append((action, summarize_observation(observation)))
+        else:
+            compacted.append((action, truncate_to_tokens(_observation_text(observation), max_tokens)))
+    return compacted
+
+
+def _compact_agent_input(inputs: dict) -> dict:
+    return {**inputs, "intermediate_steps": compact_steps(inputs.get("intermediate_steps", []))}
+
+
+def with_compacted_scratchpad(agent: "Runnable") -> "Runnable":
+    """
+    エージェント（create_react_agent 等で生成した Runnable）の前段で中間ステップを圧縮する。
+
+    AgentExecutor が保持する中間ステップ（思考プロセスの出力・ストリーミング）は圧縮しない。
+    """
+    from langchain_core.runnables import RunnableLambda
+    return RunnableLambda(_compact_agent_input, name="compact_scratchpad") | agent
@@ -0,0 +1,127 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from app.core.config import settings
+from app.core.logger import getlogger
+
+
+# エージェントに渡すツールの最大数（0 の場合は絞り込まない。既定では絞り込まない）
+TOOL_SELECTION_TOP_K = settings.TOOL_SELECTION_TOP_K
+# 入力との関連度に関わらず常に渡すツール（情報収集の起点になるもの）
+TOOL_SELECTION_ALWAYS = [t.strip() for t in settings.TOOL_SELECTION_ALWAYS.split(",") if t.strip()]
+
+# ツールの説明文に現れにくい言い回しを補うキーワード
+TOOL_KEYWORDS = {
+    "google_search_tool": "検索 調べて 調査 最新 ニュース 情報 とは 天気 search web google",
+    "gmail_search_search_tool": "gmail 受信 受信箱 届いた メール 検索 探して inbox",
+    "send_email_tool": "メール 送信 送って 送付 通知 email mail",
+    "send_email_to_fixed_address": "メール 送信 送って 送付 通知 email mail",
+    "tts_and_upload_to_google_drive": "音声 読み上げ 音声化 mp3 tts ドライブ drive 保存 アップロード",
+    "getMarkdown_tool": "url http https ページ サイト 記事 リンク 取得 読んで markdown",
+    "generate_podcast_mp3_and_upload_tool": "ポッドキャスト podcast 音声 mp3 台本 番組 アップロード",
+    "generate_podcast_script_tool": "ポッドキャスト podcast 台本 原稿 スクリプト 番組",
+    "generate_melmaga_script_tool": "メルマガ メールマガジン ニュースレター newsletter 記事 原稿",
+    "generate_melmaga_and_send_email_from_urls_tool": "メルマガ メールマガジン ニュースレター url 送信 配信",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    英数字は単語単位、それ以外（日本語等）は2文字ずつのトークンに分割する。
+
+    形態素解析器を使わずに日本語の部分一致を拾うため、文字 bigram を使う。
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = re.findall(r"[a-z0-9]+", text)
+    for run in re.findall(r"[^\x00-\x7f\s、。「」（）・！？]+", text):
+        if len(run) == 1:
+            tokens.append(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class ToolIndex:
+    """
+    ツールの名前・説明文・キーワードから作る BM25 の索引。
+
+    入力との関連度でツールを順位付けし、エージェントに渡すツールを絞り込むために使う。
+    """
+
+    def __init__(self, tools: list, k1: float = 1.2, b: float = 0.75):
+        self.tools = list(tools)
+        self.k1 = k1
+        self.b = b
+        self._docs = [Counter(tokenize(self._document(tool))) for tool in self.tools]
+        self._lengths = [sum(doc.values()) for doc in self._docs]
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        df = Counter(term for doc in self._docs for term in doc)
+        n = len(self._docs)
+        self._idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    @staticmethod
+    def _document(tool) -> str:
+        return " ".join([tool.name.replace("_", " "), tool.description or "", TOOL_KEYWORDS.get(tool.name, "")])
+
+    def scores(self, query: str) -> list[float]:
+        """各ツールの関連度（self.tools と同じ順）"""
+        terms = set(tokenize(query))
+        result = []
+        for doc, length in zip(self._docs, self._lengths):
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term)
+                if not tf:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+                score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            result.append(score)
+        return result
+
+    def select(self, query: str, top_k: int, always: list[str] | None = None) -> list:
+        """
+        関連度の高い順に最大 top_k 個のツールを選ぶ（関連度 0 のツールは選ばない）。
+
+        always に含まれるツールは常に選び、top_k の数に含める。
+        どのツールも関連度が 0 の場合（入力から判断できない場合）は、すべてのツールを返す。
+        戻り値は元のツールの並び順を保つ（プロンプトを安定させるため）。
+        """
+        always = set(always or [])
+        scores = self.scores(query)
+        chosen = {i for i, tool in enumerate(self.tools) if tool.name in always}
+        ranked = sorted((i for i in range(len(self.tools)) if i not in chosen and scores[i] > 0),
+                        key=lambda i: scores[i], reverse=True)
+        if not ranked:
+            return list(self.tools)
+        chosen.update(ranked[:max(0, top_k - len(chosen))])
+        return [tool for i, tool in enumerate(self.tools) if i in chosen]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def select_tools(user_input: str, tools: list, top_k: int | None = None) -> list:
+    """
+    ユーザー入力に関連するツールだけを選ぶ。
+
+    Args:
+        user_input (str): ユーザーの入力（メタ情報を付ける前のもの）。
+        tools (list): 候補のツール。
+        top_k (int | None): 選ぶツールの最大数。None の場合は TOOL_SELECTION_TOP_K、0 の場合は絞り込まない。
+
+    Returns:
+        list: 選ばれたツール。
+    """
+    top_k = TOOL_SELECTION_TOP_K if top_k is None else top_k
+    if top_k <= 0 or top_k >= len(tools):
+        return list(tools)
+    key = tuple(tool.name for tool in tools)
+    with _lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ToolIndex(tools)
+    selected = index.select(user_input, top_k, TOOL_SELECTION_ALWAYS)
+    getlogger().debug("Tools selected (%d/%d): %s", len(selected), len(tools), [tool.name for tool in selected])
+    return selected
@@ -1,3 +1,4 @@
+import asyncio
 from langchain.tools import tool
 from typing import Dict
 from aiagent.googleapis.gmail.readonly import get_emails_by_keyword
@@ -6,7 +7,7 @@ import os
 from typing import Type, Optional, Union, Dict, Any
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field, ValidationError
-from aiagent.utils.generate_subject_from_text import generate_subject_from_text
+from aiagent.utils.generate_subject_from_text import generate_subject_from_text, agenerate_subject_from_text
 
 
 @tool
@@ -15,6 +16,13 @@ def gmail_search_search_tool(keywrod: str, top: int = 5) -> Dict:
     return get_emails_by_keyword(keywrod, top)
 
 
+async def _agmail_search_search_tool(keywrod: str, top: int = 5) -> Dict:
+    # Gmail API クライアントは同期のみのためワーカースレッドで実行する
+    return await asyncio.to_thread(get_emails_by_keyword, keywrod, top)
+
+gmail_search_search_tool.coroutine = _agmail_search_search_tool
+
+
 @tool
 def send_email_tool(body: str) -> str:
     """gmailサービスを利用してメール送信する
@@ -32,6 +40,13 @@ def send_email_tool(body: str) -> str:
     return send_email(os.getenv("MAIL_TO"), subject, body)
 
 
+async def _asend_email_tool(body: str) -> str:
+    subject = await agenerate_subject_from_text(body)
+    return await asyncio.to_thread(send_email, os.getenv("MAIL_TO"), subject, body)
+
+send_email_tool.coroutine = _asend_email_tool
+
+
 class SendEmailInput(BaseModel):
     """send_email_to_fixed_address ツールの入力スキーマ"""
     body: str = Field(description="必須。送信するメールの本文。")
@@ -49,12 +64,8 @@ class SendEmailTool(BaseTool):
     )
     args_schema: Type[BaseModel] = SendEmailInput
 
-    def _run(
-        self,
-        tool_input: Union[str, Dict[str, Any]], # 位置引数としてツール入力を受け取る
-        **kwargs: Any # 他の引数渡しにも対応できるようkwargsも残す
-    ) -> str:
-        """ツールの同期実行ロジック"""
+    def _parse_body(self, tool_input: Union[str, Dict[str, Any]]) -> tuple[Optional[str], Optional[str]]:
+        """ツール入力を検証して本文を取り出す。戻り値は (本文, エラーメッセージ)。"""
         print(f"[{self.name}] INFO: Received tool_input type: {type(tool_input)}")
         print(f"[{self.name}] INFO: Received tool_input: {tool_input}")
 
@@ -70,7 +81,7 @@ class SendEmailTool(BaseTool):
             input_dict = tool_input
         else:
             # 予期しない型の場合はエラーメッセージを返す
-            return f"エラー: ツール入力の型が不正です ({type(tool_input)})。辞書または文字列が必要です。"
+            return None, f"エラー: ツール入力の型が不正です ({type(tool_input)})。辞書または文字列が必要です。"
 
         # --- Pydanticモデルで検証 ---
         try:
@@ -78,18 +89,16 @@ class SendEmailTool(BaseTool):
             # これにより、必須フィールドの存在確認、型チェック、デフォルト値の適用が行われる
             parsed_input = SendEmailInput(**input_dict)
             print(parsed_input)
-            body = parsed_input.body
-            subject = generate_subject_from_text(body)
-
-            print(f"[{self.name}] INFO: Parsed arguments: subject='{subject}', body='{body[:50]}...'")
+            return parsed_input.body, None
         except ValidationError as e:
             # 検証エラーの場合、AIに分かりやすいエラーメッセージを返す
-            return f"エラー: メール送信ツールへの入力形式が無効です。詳細: {e}. 受け取った入力: {input_dict}"
+            return None, f"エラー: メール送信ツールへの入力形式が無効です。詳細: {e}. 受け取った入力: {input_dict}"
         except Exception as e:
             # その他のエラー
-            return f"エラー: ツール入力の処理中に予期せぬエラーが発生しました: {e}. 受け取った入力: {input_dict}"
+            return None, f"エラー: ツール入力の処理中に予期せぬエラーが発生しました: {e}. 受け取った入力: {input_dict}"
 
-        """ツールの同期実行ロジック"""
+    def _send(self, subject: Optional[str], body: str) -> str:
+        """生成済みの件名と本文でメールを送信する"""
         # 環境変数から送信先を取得
         to_email = os.getenv("MAIL_TO")
         if not to_email:
@@ -103,4 +112,36 @@ class SendEmailTool(BaseTool):
         # 改善された send_email 関数を呼び出し、結果メッセージを受け取る
         result_message = send_email(to_email, subject, body)
         print(f"[{self.name}] INFO: send_email function returned: {result_message}")
-        return result_message  # 結果メッセージをそのまま返す
\ No newline at end of file
+        return result_message  # 結果メッセージをそのまま返す
+
+    def _run(
+        self,
+        tool_input: Union[str, Dict[str, Any], None] = None, # 位置引数としてツール入力を受け取る
+        **kwargs: Any # 他の引数渡しにも対応できるようkwargsも残す
+    ) -> str:
+        """ツールの同期実行ロジック"""
+        body, error = self._parse_body(tool_input if tool_input is not None else kwargs)
+        if error:
+            return error
+        try:
+            subject = generate_subject_from_text(body)
+            print(f"[{self.name}] INFO: Parsed arguments: subject='{subject}', body='{body[:50]}...'")
+        except Exception as e:
+            return f"エラー: ツール入力の処理中に予期せぬエラーが発生しました: {e}. 受け取った入力: {tool_input}"
+        return self._send(subject, body)
+
+    async def _arun(
+        self,
+        tool_input: Union[str, Dict[str, Any], None] = None,
+        **kwargs: Any
+    ) -> str:
+        """ツールの非同期実行ロジック（件名生成はLLMの非同期API、送信はワーカースレッドで実行）"""
+        body, error = self._parse_body(tool_input if tool_input is not None else kwargs)
+        if error:
+            return error
+        try:
+            subject = await agenerate_subject_from_text(body)
+            print(f"[{self.name}] INFO: Parsed arguments: subject='{subject}', body='{body[:50]}...'")
+        except Exception as e:
+            return f"エラー: ツール入力の処理中に予期せぬエラーが発生しました: {e}. 受け取った入力: {tool_input}"
+        return await asyncio.to_thread(self._send, subject, body)
@@ -3,8 +3,8 @@ from aiagent.googleapis.googleapi_services import get_googleapis_service
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 import os
 import io
-import pandas as pd
 from googleapiclient.errors import HttpError
+from aiagent.utils.timing import timed
 
 
 SERVICE_NAME = "drive"
@@ -143,6 +143,7 @@ class SpreadsheetDB:
         指定されたシートまたは範囲のデータを取得します。
         シートが存在しない場合は作成します (headers_if_create でヘッダー指定可)。
         """
+        import pandas as pd  # スプレッドシート操作でのみ使うため遅延インポート
         try:
             self.ensure_sheet_exists(sheet_name, headers=headers_if_create)
         except RuntimeError as e:
@@ -280,6 +281,7 @@ class SpreadsheetDB:
         指定された列ヘッダーの値に基づいて行を検索します（完全一致）。
         シートが存在しない場合は作成します。
         """
+        import pandas as pd  # スプレッドシート操作でのみ使うため遅延インポート
         try:
             # シート作成時に検索対象のヘッダーが含まれるように指定
             self.ensure_sheet_exists(sheet_name, headers=headers_if_create)
@@ -598,6 +600,7 @@ def get_google_drive_file_links(file_id: str) -> dict | None:
         return None
 
 
+@timed("drive.upload")
 def upload_file(file_name, file_path, mime_type, folder_id=None):
     """
 	- textファイル
@@ -631,6 +634,7 @@ def upload_file(file_name, file_path, mime_type, folder_id=None):
 
 
 # Resumable Uploadを実行する関数
+@timed("drive.upload")
 def resumable_upload(save_file_name_in_drive, upload_file_path, mime_type, folder_id=None):
     service = get_googleapis_service(SERVICE_NAME)
 
@@ -2,12 +2,14 @@ from aiagent.googleapis.googleapi_services import get_googleapis_service
 from aiagent.utils.html_operation import convert_html_to_markdown
 import base64
 from email.mime.text import MIMEText
+from aiagent.utils.timing import timed
 
 
 SERVICE_NAME = "gmail"
 
 
 # 件名に指定されたキーワードが含まれるメールを検索し、本文を取得する関数
+@timed("gmail.search")
 def get_emails_by_keyword(subject_keyword, top=5):
     service = get_googleapis_service(SERVICE_NAME)
     
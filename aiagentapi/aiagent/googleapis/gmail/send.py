@@ -4,10 +4,12 @@ from email.mime.multipart import MIMEMultipart
 from googleapiclient.errors import HttpError
 from google.auth.exceptions import RefreshError
 import base64
+from aiagent.utils.timing import timed
 
 SERVICE_NAME = "gmail"
 
 
+@timed("gmail.send")
 def send_email(to_email: str, subject: str, body: str) -> str:
     """
     指定された宛先にメールを送信し、結果を示すメッセージを返します。
@@ -1,11 +1,16 @@
 import os
+import threading
 # from app.core.config import GOOGLE_APIS_TOKEN_PATH, GOOGLE_APIS_CREDENTIALS_PATH # 必要に応じてコメント解除
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
 from google.auth.exceptions import RefreshError # RefreshErrorをインポート
 from dotenv import load_dotenv
+from aiagent.utils.metrics import observe, GOOGLE_API_REQUEST_DURATION
+from aiagent.utils.deadline import check_deadline
 
 load_dotenv()
 
@@ -22,8 +27,47 @@ SCOPES = [
 TOKEN_PATH = os.getenv("GOOGLE_APIS_TOKEN_PATH")
 CREDENTIALS_PATH = os.getenv("GOOGLE_APIS_CREDENTIALS_PATH")
 
+# サービス名とAPIのバージョン
+SERVICE_VERSIONS = {
+    "gmail": "v1",
+    "drive": "v3",
+    # Sheets API v4 を使用
+    "sheets": "v4",
+}
 
-def get_googleapis_service(_serviceName):
+# 認証情報とディスカバリードキュメントはプロセス内で共有する。
+# サービスオブジェクト（内部の HTTP クライアント）はスレッドセーフではないため、呼び出しごとに生成する
+_creds = None
+_creds_lock = threading.Lock()
+_documents = {}
+_documents_lock = threading.Lock()
+
+
+class InstrumentedHttpRequest(HttpRequest):
+    """
+    API呼び出しごとの所要時間を Prometheus に記録する HttpRequest。
+    実行中のエージェントが期限切れ・キャンセル済みの場合は、呼び出し前に DeadlineExceeded を送出する。
+    """
+
+    def _labels(self) -> dict:
+        # methodId の例: "gmail.users.messages.list", "drive.files.create"
+        method_id = self.methodId or "unknown"
+        return {"service": method_id.split(".")[0], "method": method_id}
+
+    def execute(self, http=None, num_retries=0):
+        check_deadline()
+        with observe(GOOGLE_API_REQUEST_DURATION, **self._labels()):
+            return super().execute(http=http, num_retries=num_retries)
+
+    def next_chunk(self, http=None, num_retries=0):
+        # Resumable Upload はチャンク単位で記録し、チャンクの間で期限を確認する
+        check_deadline()
+        with observe(GOOGLE_API_REQUEST_DURATION, **self._labels()):
+            return super().next_chunk(http=http, num_retries=num_retries)
+
+
+def _load_credentials():
+    """トークンファイルから認証情報を読み込む。期限切れの場合はリフレッシュし、無い場合は認証フローを実行する。"""
     # パスが環境変数で設定されているか確認
     if not TOKEN_PATH:
         print("エラー: 環境変数 GOOGLE_APIS_TOKEN_PATH が設定されていません。")
@@ -105,19 +149,53 @@ def get_googleapis_service(_serviceName):
         print("エラー: 有効な認証情報を取得できませんでした。")
         return None
 
+    return creds
+
+
+def get_credentials():
+    """
+    共有の認証情報を返す。初回と期限切れ時のみ読み込み（リフレッシュ）を行う。
+
+    Returns:
+        Credentials | None: 有効な認証情報。取得できない場合は None。
+    """
+    global _creds
+    with _creds_lock:
+        if _creds is None or not _creds.valid:
+            _creds = _load_credentials()
+        return _creds
+
+
+def _discovery_document(_serviceName):
+    """
+    ライブラリ同梱のディスカバリードキュメント（JSON文字列）を返す（無い場合は None）。
+
+    build_from_document は解析結果に手を加えるため、スレッド間では解析前の文字列を共有する。
+    """
+    with _documents_lock:
+        if _serviceName not in _documents:
+            _documents[_serviceName] = get_static_doc(_serviceName, SERVICE_VERSIONS[_serviceName])
+        return _documents[_serviceName]
+
+
+def get_googleapis_service(_serviceName):
+    if _serviceName not in SERVICE_VERSIONS:
+        print(f"エラー: 不明なサービス名です: {_serviceName}")
+        return None
+
+    creds = get_credentials()
+    if not creds:
+        return None
+
     # Google APIサービスのビルド
     try:
         print(f"'{_serviceName}' サービスをビルドします...")
-        if _serviceName == "gmail":
-            service = build('gmail', 'v1', credentials=creds)
-        elif _serviceName == "drive":
-            service = build('drive', 'v3', credentials=creds)
-        elif _serviceName == "sheets":
-            # Sheets API v4 を使用
-            service = build('sheets', 'v4', credentials=creds)
+        document = _discovery_document(_serviceName)
+        if document is not None:
+            service = build_from_document(document, credentials=creds, requestBuilder=InstrumentedHttpRequest)
         else:
-            print(f"エラー: 不明なサービス名です: {_serviceName}")
-            return None
+            service = build(_serviceName, SERVICE_VERSIONS[_serviceName], credentials=creds,
+                            requestBuilder=InstrumentedHttpRequest)
         print("サービスのビルドに成功しました。")
         return service
     except Exception as e:
@@ -0,0 +1,128 @@
+import sys
+import threading
+from pathlib import Path
+from langchain_core.prompts import PromptTemplate
+from app.core.config import settings
+
+
+# 同梱テンプレートの格納先: templates/<プロンプト名>/<バージョン>.txt
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+# Hub から同期したテンプレートのキャッシュ先: <PROMPT_CACHE_DIR>/<プロンプト名>/hub.txt
+PROMPT_CACHE_DIR = Path(settings.PROMPT_CACHE_DIR)
+HUB_VERSION = "hub"
+LATEST_VERSION = "latest"
+
+# ReActエージェントで使用するプロンプト名とバージョン（環境変数で切り替え可能）
+REACT_PROMPT_NAME = settings.REACT_PROMPT_NAME
+REACT_PROMPT_VERSION = settings.REACT_PROMPT_VERSION
+
+_prompt_cache = {}
+_lock = threading.Lock()
+
+
+def _version_key(version: str):
+    """'v2' や 'v10' を数値順に並べるためのキー"""
+    digits = version.lstrip("v")
+    return (0, int(digits), version) if digits.isdigit() else (1, 0, version)
+
+
+def list_prompts() -> dict:
+    """同梱されているプロンプト名とバージョンの一覧を返す。"""
+    result = {}
+    if not TEMPLATES_DIR.is_dir():
+        return result
+    for prompt_dir in sorted(TEMPLATES_DIR.iterdir()):
+        if prompt_dir.is_dir():
+            versions = [p.stem for p in prompt_dir.glob("*.txt")]
+            result[prompt_dir.name] = sorted(versions, key=_version_key)
+    return result
+
+
+def _resolve_path(name: str, version: str) -> Path:
+    if version == HUB_VERSION:
+        cached = PROMPT_CACHE_DIR / name / f"{HUB_VERSION}.txt"
+        if cached.is_file():
+            return cached
+        print(f"WARNING: Hubから同期したプロンプト '{name}' がキャッシュにありません。同梱の最新版を使用します。")
+        version = LATEST_VERSION
+
+    if version == LATEST_VERSION:
+        versions = list_prompts().get(name)
+        if not versions:
+            raise KeyError(f"Prompt '{name}' is not bundled.")
+        version = versions[-1]
+
+    path = TEMPLATES_DIR / name / f"{version}.txt"
+    if not path.is_file():
+        raise KeyError(f"Prompt '{name}' version '{version}' is not bundled.")
+    return path
+
+
+def load_template_text(name: str, version: str = LATEST_VERSION) -> str:
+    """
+    テンプレート本文を読み込む（ネットワークアクセスなし）。
+
+    Args:
+        name (str): プロンプト名 (例: "react", "react_ja")。
+        version (str): バージョン (例: "v1")。"latest" は同梱の最新版、"hub" はHubから同期したキャッシュ。
+
+    Returns:
+        str: テンプレート本文。
+    """
+    return _resolve_path(name, version).read_text(encoding="utf-8")
+
+
+def get_prompt(name: str = REACT_PROMPT_NAME, version: str = REACT_PROMPT_VERSION) -> PromptTemplate:
+    """
+    PromptTemplate を返す。一度読み込んだテンプレートはプロセス内で再利用する。
+
+    Args:
+        name (str): プロンプト名。
+        version (str): バージョン。
+
+    Returns:
+        PromptTemplate: create_react_agent にそのまま渡せるプロンプト。
+    """
+    key = (name, version)
+    with _lock:
+        prompt = _prompt_cache.get(key)
+        if prompt is None:
+            prompt = PromptTemplate.from_template(load_template_text(name, version))
+            _prompt_cache[key] = prompt
+        return prompt
+
+
+def sync_from_hub(hub_name: str = "hwchase17/react", name: str = "react") -> Path:
+    """
+    LangChain Hub からプロンプトを取得してローカルキャッシュに保存する（初回のみ手動実行を想定）。
+
+    保存後は get_prompt(name, "hub") で参照できる。実行時の Hub アクセスは発生しない。
+
+    Args:
+        hub_name (str): Hub 上のプロンプト名。
+        name (str): ローカルで使用するプロンプト名。
+
+    Returns:
+        Path: 保存先のパス。
+    """
+    from langchain import hub  # 同期時のみ必要なため遅延インポート
+
+    prompt = hub.pull(hub_name)
+    path = PROMPT_CACHE_DIR / name / f"{HUB_VERSION}.txt"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(prompt.template, encoding="utf-8")
+    with _lock:
+        _prompt_cache.pop((name, HUB_VERSION), None)
+    print(f"Hub のプロンプト '{hub_name}' を {path} に保存しました。")
+    return path
+
+
+if __name__ == "__main__":
+    # 使い方: python -m aiagent.prompts.registry sync [hub_name] [name]
+    #         python -m aiagent.prompts.registry list
+    args = sys.argv[1:]
+    if args and args[0] == "sync":
+        sync_from_hub(*args[1:3])
+    else:
+        for _name, _versions in list_prompts().items():
+            print(f"{_name}: {', '.join(_versions)}")
@@ -1,9 +1,10 @@
+import asyncio
 from langchain.tools import tool
-from aiagent.utils.html2markdown import getMarkdown
-from aiagent.tool.generate_melmaga_script import generate_melmaga_script
+from aiagent.utils.html2markdown import getMarkdown, agetMarkdown
+from aiagent.tool.generate_melmaga_script import generate_melmaga_script, agenerate_melmaga_script
 from aiagent.googleapis.gmail.send import send_email
 import ast
-from aiagent.utils.generate_subject_from_text import generate_subject_from_text
+from aiagent.utils.generate_subject_from_text import generate_subject_from_text, agenerate_subject_from_text
 import os
 
 
@@ -60,29 +61,12 @@ def generate_melmaga_and_send_email_from_urls_tool(urls: list | str):
     print(f"generate_melmaga_script_from_urls_tool: {urls}")
 
     try:
-        if isinstance(urls, str):
-            urls = safe_string_to_list(urls)
-        if not isinstance(urls, list):
-            raise ValueError("urls must be a list or a string")
-        if not urls:
-            raise ValueError("urls must not be empty")
-        if len(urls) > 5:
-            raise ValueError("urls must not exceed 5 items")
-
-        input_info = ""
-        _cnt = 0
-        for url in urls:
-            _cnt += 1
-            print(f"URL: {url}")
-            input_info += f"#: テーマ_{str(_cnt)}\n"
-            input_info += f"## URL: {url}\n"
-            input_info += "## 内容\n"
-            input_info += f"{getMarkdown(url)}\n\n"
-            input_info += "----------------"
-        body = generate_melmaga_script(input_info)
+        urls = _validate_urls(urls)
+        markdowns = [getMarkdown(url) for url in urls]
+        body = generate_melmaga_script(_build_input_info(urls, markdowns))
         subject = generate_subject_from_text(body)
         return send_email(os.getenv("MAIL_TO"), subject, body)
-    
+
     except ValueError as e:
         print(f"ValueError: {e}")
         return f"ValueError: {e}"
@@ -92,3 +76,58 @@ def generate_melmaga_and_send_email_from_urls_tool(urls: list | str):
     except Exception as e:
         print(f"Unexpected error: {e}")
         return f"Unexpected error: {e}"
+
+
+async def _agenerate_melmaga_and_send_email_from_urls_tool(urls: list | str):
+    try:
+        urls = _validate_urls(urls)
+        # 各URLのマークダウン取得は並行して行う
+        markdowns = await asyncio.gather(*(agetMarkdown(url) for url in urls))
+        body = await agenerate_melmaga_script(_build_input_info(urls, markdowns))
+        subject = await agenerate_subject_from_text(body)
+        return await asyncio.to_thread(send_email, os.getenv("MAIL_TO"), subject, body)
+
+    except ValueError as e:
+        print(f"ValueError: {e}")
+        return f"ValueError: {e}"
+    except TypeError as e:
+        print(f"TypeError: {e}")
+        return f"TypeError: {e}"
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        return f"Unexpected error: {e}"
+
+generate_melmaga_and_send_email_from_urls_tool.coroutine = _agenerate_melmaga_and_send_email_from_urls_tool
+
+
+def _validate_urls(urls: list | str) -> list:
+    if isinstance(urls, str):
+        urls = safe_string_to_list(urls)
+    if not isinstance(urls, list):
+        raise ValueError("urls must be a list or a string")
+    if not urls:
+        raise ValueError("urls must not be empty")
+    if len(urls) > 5:
+        raise ValueError("urls must not exceed 5 items")
+    return urls
+
+
+def _build_input_info(urls: list, markdowns: list) -> str:
+    input_info = ""
+    _cnt = 0
+    for url, markdown in zip(urls, markdowns):
+        _cnt += 1
+        print(f"URL: {url}")
+        input_info += f"#: テーマ_{str(_cnt)}\n"
+        input_info += f"## URL: {url}\n"
+        input_info += "## 内容\n"
+        input_info += f"{_markdown_text(markdown)}\n\n"
+        input_info += "----------------\n"
+    return input_info
+
+
+def _markdown_text(markdown) -> str:
+    # getMarkdown は {"state", "result"} の辞書（失敗時はエラーメッセージの文字列）を返すため、本文のみを取り出す
+    if isinstance(markdown, dict):
+        return str(markdown.get("result", "")) if markdown.get("state") == "success" else f"取得失敗: {markdown.get('result', '')}"
+    return str(markdown)
@@ -1,9 +1,13 @@
 from langchain.tools import tool
 import os
-from aiagent.utils.execllm import execLlmApi
+from aiagent.utils.execllm import execLlmApi, aexecLlmApi, execLlmApi_stream, aexecLlmApi_stream
+from aiagent.aiagent.model_registry import TASK_SCRIPT
+from aiagent.utils.token_budget import route_and_budget
+from aiagent.utils.prompt_template import PromptTemplate
 
 
-PODCAST_SCRIPT_DEFAULT_MODEL = os.getenv('PODCAST_SCRIPT_DEFAULT_MODEL', "gpt-4o-mini")
+# 台本生成に使用するモデル（空の場合は model_registry.route_model で決める。既定は TASK_DEFAULT_MODELS の gpt-4o-mini）
+PODCAST_SCRIPT_DEFAULT_MODEL = os.getenv('PODCAST_SCRIPT_DEFAULT_MODEL', "") or None
 
 
 @tool
@@ -24,18 +28,49 @@ def generate_melmaga_script_tool(input_info: str):
     return generate_melmaga_script(input_info, PODCAST_SCRIPT_DEFAULT_MODEL)
 
 
-def generate_melmaga_script(input_info: str, model_name: str = "gpt-4o-mini"):
+async def _agenerate_melmaga_script_tool(input_info: str):
+    return await agenerate_melmaga_script(input_info, PODCAST_SCRIPT_DEFAULT_MODEL)
+
+generate_melmaga_script_tool.coroutine = _agenerate_melmaga_script_tool
+
+
+def generate_melmaga_script(input_info: str, model_name: str | None = None, use_cache: bool | None = None):
     """指定された情報とモデル名からメルマガを生成する"""
-    _input = f"""
+    model_name, messages = route_and_budget(TASK_SCRIPT, input_info, model_name, _build_melmaga_messages)
+    return execLlmApi(model_name, messages, task=TASK_SCRIPT, use_cache=use_cache)
+
+
+async def agenerate_melmaga_script(input_info: str, model_name: str | None = None, use_cache: bool | None = None):
+    """generate_melmaga_script の非同期版"""
+    model_name, messages = route_and_budget(TASK_SCRIPT, input_info, model_name, _build_melmaga_messages)
+    return await aexecLlmApi(model_name, messages, task=TASK_SCRIPT, use_cache=use_cache)
+
+
+def generate_melmaga_script_stream(input_info: str, model_name: str | None = None):
+    """generate_melmaga_script のストリーミング版。生成されたメルマガを差分ごとに返すジェネレータ"""
+    model_name, messages = route_and_budget(TASK_SCRIPT, input_info, model_name, _build_melmaga_messages)
+    return execLlmApi_stream(model_name, messages, task=TASK_SCRIPT)
+
+
+def agenerate_melmaga_script_stream(input_info: str, model_name: str | None = None):
+    """generate_melmaga_script_stream の非同期版（非同期イテレータを返す）"""
+    model_name, messages = route_and_budget(TASK_SCRIPT, input_info, model_name, _build_melmaga_messages)
+    return aexecLlmApi_stream(model_name, messages, task=TASK_SCRIPT)
+
+
+def _build_melmaga_messages(input_info: str) -> list:
+    return MELMAGA_SCRIPT_PROMPT.build_messages(input_info)
+
+
+# 固定の指示文を先頭に、入力情報を最後に置く（プロバイダ側のプロンプトキャッシュを効かせるため）
+MELMAGA_SCRIPT_PROMPT = PromptTemplate(
+    "melmaga_script",
+    """
     あなたは優れた編集者兼ライターです。
-    以下の情報を踏まえ、30～40代のビジネスパーソンがスキマ時間で読めるメルマガを作成してください。
+    ユーザーから渡される情報を踏まえ、30～40代のビジネスパーソンがスキマ時間で読めるメルマガを作成してください。
     1テーマ600～800文字程度で、要点を押さえながらも興味を持続させる構成を意識してください。
     見出しや箇条書きを活用し、専門的な内容でも理解しやすいように平易な言葉に言い換える工夫を加えてください。
     最終的には、読者にビジネス活用のための具体的な一歩を促すCTAを用意し、行動につなげてください。
-    以下がインプットとなる情報の概要です：
-    ===
-    {input_info}
-    ===
     出力形式は、テーマ毎のタイトル、参照URL、概要、本文、まとめ、の順にしてください。
     最後には「おわりに」として、各記事の関係性への考察を加えてください。
     文章は以下のような構成でお願いします。
@@ -56,11 +91,6 @@ def generate_melmaga_script(input_info: str, model_name: str = "gpt-4o-mini"):
     ---
     文章は日本語で書いてください。
     文章全体のトーンはビジネス視点を中心に、親しみやすさと専門性のバランスを考慮してください。
-    """
-
-    _messages = [
-        {"role": "system", "content": "あなたは優れた編集者兼ライターです"},
-        {"role": "user", "content": _input}
-    ]
-
-    return execLlmApi(model_name, _messages)
+    """,
+    input_heading="以下がインプットとなる情報の概要です："
+)
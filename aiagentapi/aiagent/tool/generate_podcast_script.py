@@ -1,35 +1,40 @@
+import asyncio
 from pydantic import BaseModel, Field
 from aiagent.tool.tts_and_upload_drive import tts_and_upload_drive
-from aiagent.utils.generate_subject_from_text import generate_subject_from_text
+from aiagent.utils.generate_subject_from_text import generate_subject_from_text, agenerate_subject_from_text
 from langchain.tools import tool
 import os
-from aiagent.utils.execllm import execLlmApi
+from aiagent.utils.execllm import execLlmApi, aexecLlmApi, execLlmApi_stream, aexecLlmApi_stream
+from aiagent.aiagent.model_registry import TASK_SCRIPT
+from aiagent.utils.token_budget import route_and_budget
+from aiagent.utils.prompt_template import PromptTemplate
 
 
-PODCAST_SCRIPT_DEFAULT_MODEL = os.getenv('PODCAST_SCRIPT_DEFAULT_MODEL', "gpt-4o-mini")
+# 台本生成に使用するモデル（空の場合は model_registry.route_model で決める。既定は TASK_DEFAULT_MODELS の gpt-4o-mini）
+PODCAST_SCRIPT_DEFAULT_MODEL = os.getenv('PODCAST_SCRIPT_DEFAULT_MODEL', "") or None
 
 
 class PodcastScriptInput(BaseModel):
     """ポッドキャスト台本生成ツールの入力"""
     topic_details: str = Field(description="ポッドキャストのトピックや含めたいキーポイントに関する詳細な指示や情報。")
-    model_name: str = Field(default=PODCAST_SCRIPT_DEFAULT_MODEL, description="台本生成に使用するOpenAIモデル名。") # ★ 要確認: デフォルトモデル名
+    model_name: str | None = Field(default=PODCAST_SCRIPT_DEFAULT_MODEL, description="台本生成に使用するモデル名。")
 
 
 class PodcastMp3Input(BaseModel):
     """ポッドキャストMP3生成・アップロードツールの入力"""
     topic_details: str = Field(description="ポッドキャストのトピックや含めたいキーポイントに関する詳細な指示や情報。")
-    model_name: str = Field(default=PODCAST_SCRIPT_DEFAULT_MODEL, description="台本生成に使用するOpenAIモデル名。") # ★ 要確認: デフォルトモデル名
+    model_name: str | None = Field(default=PODCAST_SCRIPT_DEFAULT_MODEL, description="台本生成に使用するモデル名。")
     subject_max_length: int = Field(default=25, description="生成する件名の最大文字数。")
 
 
 @tool(args_schema=PodcastScriptInput) # Pydanticモデルを入力スキーマとして指定
-def generate_podcast_script_tool(topic_details: str, model_name: str = PODCAST_SCRIPT_DEFAULT_MODEL) -> str:
+def generate_podcast_script_tool(topic_details: str, model_name: str | None = PODCAST_SCRIPT_DEFAULT_MODEL) -> str:
     """
     与えられたトピック詳細情報からポッドキャストの台本を生成します。
 
     Args:
         topic_details (str): ポッドキャストのトピック、キーポイント、構成案などの詳細情報。
-        model_name (str): 台本生成に使用するOpenAIモデル名 (デフォルト: gpt-4o)。
+        model_name (str | None): 台本生成に使用するモデル名 (省略時は既定のモデル)。
 
     Returns:
         str: 生成されたポッドキャスト台本テキスト。
@@ -42,15 +47,21 @@ def generate_podcast_script_tool(topic_details: str, model_name: str = PODCAST_S
     return script
 
 
+async def _agenerate_podcast_script_tool(topic_details: str, model_name: str | None = PODCAST_SCRIPT_DEFAULT_MODEL) -> str:
+    return await agenerate_podcast_script(model_name=model_name, input_info=topic_details)
+
+generate_podcast_script_tool.coroutine = _agenerate_podcast_script_tool
+
+
 @tool(args_schema=PodcastMp3Input)  # Pydanticモデルを入力スキーマとして指定
-def generate_podcast_mp3_and_upload_tool(topic_details: str, model_name: str = PODCAST_SCRIPT_DEFAULT_MODEL, subject_max_length: int = 25) -> str:
+def generate_podcast_mp3_and_upload_tool(topic_details: str, model_name: str | None = PODCAST_SCRIPT_DEFAULT_MODEL, subject_max_length: int = 25) -> str:
     """
     与えられたトピック詳細情報からポッドキャスト台本を生成し、
     その内容から件名を生成、テキストをMP3音声に変換してGoogle Driveにアップロードします。
 
     Args:
         topic_details (str): ポッドキャストのトピック、キーポイント、構成案などの詳細情報。
-        model_name (str): 台本生成に使用するOpenAIモデル名 (デフォルト: gpt-4o)。
+        model_name (str | None): 台本生成に使用するモデル名 (省略時は既定のモデル)。
         subject_max_length (int): 生成する件名の最大文字数 (デフォルト: 25)。
 
     Returns:
@@ -79,28 +90,68 @@ def generate_podcast_mp3_and_upload_tool(topic_details: str, model_name: str = P
         return f"エラー: 音声化またはアップロード中に問題が発生しました - {e}"
 
 
-def generate_podcast_script(input_info: str, model_name: str = "gpt-4o-mini"): # model_name を引数に追加
+async def _agenerate_podcast_mp3_and_upload_tool(topic_details: str, model_name: str | None = PODCAST_SCRIPT_DEFAULT_MODEL, subject_max_length: int = 25) -> str:
+    # 1. 台本生成
+    script = await agenerate_podcast_script(model_name=model_name, input_info=topic_details)
+
+    if not script or not isinstance(script, str) or len(script.strip()) == 0:
+        return "エラー: 台本の生成に失敗したか、内容が空です。"
+
+    # 2. 件名生成
+    subject = await agenerate_subject_from_text(script, subject_max_length)
+
+    # 3. 音声化とアップロード（同期APIのためワーカースレッドで実行）
+    try:
+        return await asyncio.to_thread(tts_and_upload_drive, subject, script)
+    except Exception as e:
+        print(f"Error during TTS/Upload: {e}") # エラーログ
+        return f"エラー: 音声化またはアップロード中に問題が発生しました - {e}"
+
+generate_podcast_mp3_and_upload_tool.coroutine = _agenerate_podcast_mp3_and_upload_tool
+
+
+def generate_podcast_script(input_info: str, model_name: str | None = None, use_cache: bool | None = None): # model_name を引数に追加
     """指定された情報とモデル名からポッドキャスト台本を生成する"""
-    _input = f"""
-    あなたは、複数の情報源からのデータを統合してポッドキャスト台本を作成するツールです。
-    以下の入力情報と指示に基づいて、指定されたトピックに関する一貫性のある台本テキストのみを出力してください。
-    なお、AIにより音声化することを想定した改行としてください。
+    model_name, messages = route_and_budget(TASK_SCRIPT, input_info, model_name, _build_podcast_messages)
+    return execLlmApi(model_name, messages, task=TASK_SCRIPT, use_cache=use_cache)
 
-    # 1. 入力情報ソース
-    {input_info}
 
-    # 2. ポッドキャストパラメータ
-    * **tone:** 深掘り討論
+async def agenerate_podcast_script(input_info: str, model_name: str | None = None, use_cache: bool | None = None):
+    """generate_podcast_script の非同期版"""
+    model_name, messages = route_and_budget(TASK_SCRIPT, input_info, model_name, _build_podcast_messages)
+    return await aexecLlmApi(model_name, messages, task=TASK_SCRIPT, use_cache=use_cache)
 
-    # 3. 出力指示
-    **台本構成:** 抽出・統合した情報に基づき、導入（トピックと情報源の概要説明）、本編（キーポイントの議論・展開）、結論（まとめ、考察）を含む一貫性のある台本を作成します。
-    
-    # 生成開始
+
+def generate_podcast_script_stream(input_info: str, model_name: str | None = None):
+    """generate_podcast_script のストリーミング版。生成された台本を差分ごとに返すジェネレータ"""
+    model_name, messages = route_and_budget(TASK_SCRIPT, input_info, model_name, _build_podcast_messages)
+    return execLlmApi_stream(model_name, messages, task=TASK_SCRIPT)
+
+
+def agenerate_podcast_script_stream(input_info: str, model_name: str | None = None):
+    """generate_podcast_script_stream の非同期版（非同期イテレータを返す）"""
+    model_name, messages = route_and_budget(TASK_SCRIPT, input_info, model_name, _build_podcast_messages)
+    return aexecLlmApi_stream(model_name, messages, task=TASK_SCRIPT)
+
+
+def _build_podcast_messages(input_info: str) -> list:
+    return PODCAST_SCRIPT_PROMPT.build_messages(input_info)
+
+
+# 固定の指示文を先頭に、入力情報を最後に置く（プロバイダ側のプロンプトキャッシュを効かせるため）
+PODCAST_SCRIPT_PROMPT = PromptTemplate(
+    "podcast_script",
     """
+    あなたは世界一のポッドキャスターです。
+    あなたは、複数の情報源からのデータを統合してポッドキャスト台本を作成するツールです。
+    ユーザーから渡される入力情報と以下の指示に基づいて、指定されたトピックに関する一貫性のある台本テキストのみを出力してください。
+    なお、AIにより音声化することを想定した改行としてください。
 
-    _messages = [
-        {"role": "system", "content": "あなたは世界一のポッドキャスターです"},
-        {"role": "user", "content": _input}
-    ]
+    # 1. ポッドキャストパラメータ
+    * **tone:** 深掘り討論
 
-    return execLlmApi(model_name, _messages)
+    # 2. 出力指示
+    **台本構成:** 抽出・統合した情報に基づき、導入（トピックと情報源の概要説明）、本編（キーポイントの議論・展開）、結論（まとめ、考察）を含む一貫性のある台本を作成します。
+    """,
+    input_heading="# 入力情報ソース"
+)
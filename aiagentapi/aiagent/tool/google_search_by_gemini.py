@@ -1,10 +1,11 @@
-import os
+import asyncio
 from typing import List
-import google.generativeai as genai
 from bs4 import BeautifulSoup
 from langchain.tools import tool
 from pydantic import BaseModel, Field
-from aiagent.utils.html2markdown import getMarkdown
+from aiagent.utils.html2markdown import getMarkdown, agetMarkdown
+from aiagent.utils.llm_client import gemini_provider
+from aiagent.aiagent.model_registry import route_model, TASK_SEARCH
 
 
 class GoogleSearchResult(BaseModel):
@@ -44,6 +45,12 @@ def google_search_tool(query: str) -> GoogleSearchResult:
     return googleSearchAgent(query)
 
 
+async def _agoogle_search_tool(query: str) -> GoogleSearchResult:
+    return await agoogleSearchAgent(query)
+
+google_search_tool.coroutine = _agoogle_search_tool
+
+
 def googleSearchAgent(_input: str) -> GoogleSearchResult:
     """Google Searchを用いて情報を取得し、結果を返す。
 
@@ -67,11 +74,56 @@ def googleSearchAgent(_input: str) -> GoogleSearchResult:
             uris=["https://ja.wikipedia.org/wiki/東京スカイツリー"]
         )
     """
-    # APIキーの取得と設定（環境変数から取得する）
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-    model = genai.GenerativeModel('models/gemini-1.5-pro')
+    response = gemini_provider.generate(
+        _search_model_name(_input),
+        _build_search_content(_input),
+        tools='google_search_retrieval'
+    )
+
+    links, uris = _extract_grounding(response)
+
+    markdowns = []
+    markdowns.append({"GoogleApiResponse":response.text})
+    for uri in uris:
+        markdowns.append(getMarkdown(uri, False))
+
+    # pydanticモデルで結果を生成
+    result_model = GoogleSearchResult(
+        result=markdowns,
+        search_entry_point=links,
+        uris=uris
+    )
+
+    return result_model
+
+
+async def agoogleSearchAgent(_input: str) -> GoogleSearchResult:
+    """googleSearchAgent の非同期版。参照URIのマークダウン取得は並行して行う。"""
+    response = await gemini_provider.agenerate(
+        _search_model_name(_input),
+        _build_search_content(_input),
+        tools='google_search_retrieval'
+    )
+
+    links, uris = _extract_grounding(response)
 
-    _content = f"""
+    markdowns = [{"GoogleApiResponse": response.text}]
+    markdowns.extend(await asyncio.gather(*(agetMarkdown(uri, False) for uri in uris)))
+
+    return GoogleSearchResult(
+        result=markdowns,
+        search_entry_point=links,
+        uris=uris
+    )
+
+
+def _search_model_name(_input: str = "") -> str:
+    # google_search_retrieval に対応した Gemini モデルから選ぶ
+    return f"models/{route_model(TASK_SEARCH, _input, providers={'gemini'})}"
+
+
+def _build_search_content(_input: str) -> str:
+    return f"""
     # 命令指示書
     - 要求に対し前提条件と制約条件を満たす最高の成果物を生成してください。
 
@@ -85,11 +137,9 @@ def googleSearchAgent(_input: str) -> GoogleSearchResult:
     {_input}
     """
 
-    response = model.generate_content(
-        contents=_content,
-        tools='google_search_retrieval'
-    )
 
+def _extract_grounding(response):
+    """レスポンスのグラウンディング情報から検索結果ページのリンクと参照URIを抽出する"""
     # BeautifulSoupを用いてレンダリングされたHTMLからリンクを抽出
     soup = BeautifulSoup(
         response._result.candidates[0].grounding_metadata.search_entry_point.rendered_content,
@@ -99,21 +149,9 @@ def googleSearchAgent(_input: str) -> GoogleSearchResult:
     links = [a['href'] for a in soup.find_all('a') if a.has_attr('href')]
 
     uris = []
-    markdowns = []
     for chunk in response._result.candidates[0].grounding_metadata.grounding_chunks:
         # chunk.web.uriが存在することを確認して追加
         if hasattr(chunk.web, 'uri'):
             uris.append(chunk.web.uri)
 
-    markdowns.append({"GoogleApiResponse":response.text})
-    for uri in uris:
-        markdowns.append(getMarkdown(uri, False))
-
-    # pydanticモデルで結果を生成
-    result_model = GoogleSearchResult(
-        result=markdowns,
-        search_entry_point=links,
-        uris=uris
-    )
-
-    return result_model
+    return links, uris
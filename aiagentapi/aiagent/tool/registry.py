@@ -0,0 +1,64 @@
+import threading
+from aiagent.utils.lazy_import import import_object
+
+
+# ツール名（tool.name）と定義場所（'モジュール:属性'）。属性がクラスの場合はインスタンスを1つ生成して使う。
+# ツールのモジュールは LLM SDK・Google API クライアント等の重い依存を読み込むため、
+# 初めて使う時点でインポートする
+TOOL_REGISTRY = {
+    "google_search_tool": "aiagent.tool.google_search_by_gemini:google_search_tool",
+    "send_email_tool": "aiagent.googleapis:send_email_tool",
+    "gmail_search_search_tool": "aiagent.googleapis:gmail_search_search_tool",
+    "tts_and_upload_to_google_drive": "aiagent.tool.tts_and_upload_drive:TextToSpeechAndUploadTool",
+    "getMarkdown_tool": "aiagent.tool.url2markdown:getMarkdown_tool",
+    "generate_podcast_mp3_and_upload_tool": "aiagent.tool.generate_podcast_script:generate_podcast_mp3_and_upload_tool",
+    "generate_podcast_script_tool": "aiagent.tool.generate_podcast_script:generate_podcast_script_tool",
+    "generate_melmaga_script_tool": "aiagent.tool.generate_melmaga_script:generate_melmaga_script_tool",
+    "generate_melmaga_and_send_email_from_urls_tool":
+        "aiagent.specializedtool.generate_melmaga_script:generate_melmaga_and_send_email_from_urls_tool",
+}
+
+# エージェントが既定で使うツール（プロンプトに並ぶ順）
+DEFAULT_TOOL_NAMES = list(TOOL_REGISTRY)
+
+_tools = {}
+_lock = threading.Lock()
+
+
+def get_tool(name: str):
+    """
+    ツール名からツールを返す。初回はモジュールをインポートし、以降は同じインスタンスを返す。
+
+    Raises:
+        ValueError: 登録されていないツール名の場合。
+    """
+    tool = _tools.get(name)
+    if tool is not None:
+        return tool
+    if name not in TOOL_REGISTRY:
+        raise ValueError(f"Unknown tool '{name}'. Available: {', '.join(TOOL_REGISTRY)}")
+    with _lock:
+        tool = _tools.get(name)
+        if tool is None:
+            obj = import_object(TOOL_REGISTRY[name])
+            tool = _tools[name] = obj() if isinstance(obj, type) else obj
+    return tool
+
+
+def get_tools(names: list[str] | None = None) -> list:
+    """ツール名のリストからツールのリストを返す。None の場合は DEFAULT_TOOL_NAMES。"""
+    return [get_tool(name) for name in (DEFAULT_TOOL_NAMES if names is None else names)]
+
+
+class LazyTools:
+    """
+    クラス属性として参照された時点でツールをインポートして返すディスクリプタ。
+
+    例: DEFAULT_MAX_TOOLS = LazyTools(DEFAULT_TOOL_NAMES)
+    """
+
+    def __init__(self, names: list[str]):
+        self.names = list(names)
+
+    def __get__(self, obj, owner=None) -> list:
+        return get_tools(self.names)
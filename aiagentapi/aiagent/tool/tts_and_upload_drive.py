@@ -1,3 +1,4 @@
+import asyncio
 from aiagent.googleapis.drive import get_file_id_and_mime_type, resumable_upload, get_google_drive_file_links, get_or_create_folder
 from aiagent.tts.tts import tts
 from aiagent.utils.file_operation import delete_file
@@ -6,7 +7,7 @@ from langchain.tools import BaseTool
 from pydantic import BaseModel, Field, ValidationError
 from typing import Type, Optional, Union, Dict, Any
 from pathlib import Path
-from aiagent.utils.generate_subject_from_text import generate_subject_from_text
+from aiagent.utils.generate_subject_from_text import generate_subject_from_text, agenerate_subject_from_text
 from aiagent.googleapis.drive import SpreadsheetDB
 import os
 import datetime
@@ -52,13 +53,8 @@ class TextToSpeechAndUploadTool(BaseTool):
     # 定義したPydanticモデルを入力スキーマとして指定
     args_schema: Type[BaseModel] = TTSUploadInput
 
-    # --- 同期実行メソッド ---
-    def _run(
-        self,
-        tool_input: Union[str, Dict[str, Any]],  # 位置引数としてツール入力を受け取る
-        **kwargs: Any  # 将来のため、または他の引数渡しに対応するためkwargsも残す
-    ) -> str:
-        """ツールの本体ロジック（同期）"""
+    def _parse_input(self, tool_input: Union[str, Dict[str, Any]]) -> tuple[Optional[TTSUploadInput], Optional[str]]:
+        """ツール入力を検証する。戻り値は (検証済み入力, エラーメッセージ)。"""
         print(f"[{self.name}] INFO: Received tool_input type: {type(tool_input)}")
         print(f"[{self.name}] INFO: Received tool_input: {tool_input}")
         # print(f"[{self.name}] INFO: Received kwargs: {kwargs}") # 必要ならkwargsも確認
@@ -80,21 +76,56 @@ class TextToSpeechAndUploadTool(BaseTool):
             input_dict = tool_input
         else:
             # 予期しない型の場合
-            return f"エラー: ツール入力の型が不正です ({type(tool_input)})。辞書または文字列が必要です。"
+            return None, f"エラー: ツール入力の型が不正です ({type(tool_input)})。辞書または文字列が必要です。"
 
         # --- Pydanticモデルで検証 ---
         try:
-            parsed_input = TTSUploadInput(**input_dict)
-            input_message = parsed_input.input_message
-            file_name = generate_subject_from_text(input_message)
-            target_folder_name = parsed_input.target_folder_name
-            print(f"[{self.name}] INFO: Parsed arguments: input_message='{input_message[:30]}...', file_name='{file_name}', target_folder_name='{target_folder_name}'")
+            return TTSUploadInput(**input_dict), None
         except ValidationError as e:
-            return f"エラー: ツールへの入力形式が無効です。詳細: {e}. 受け取った入力: {input_dict}"
+            return None, f"エラー: ツールへの入力形式が無効です。詳細: {e}. 受け取った入力: {input_dict}"
         except Exception as e:
-            return f"エラー: ツール入力の処理中に予期せぬエラーが発生しました: {e}. 受け取った入力: {input_dict}"
+            return None, f"エラー: ツール入力の処理中に予期せぬエラーが発生しました: {e}. 受け取った入力: {input_dict}"
 
+    # --- 同期実行メソッド ---
+    def _run(
+        self,
+        tool_input: Union[str, Dict[str, Any], None] = None,  # 位置引数としてツール入力を受け取る
+        **kwargs: Any  # 将来のため、または他の引数渡しに対応するためkwargsも残す
+    ) -> str:
         """ツールの本体ロジック（同期）"""
+        parsed_input, error = self._parse_input(tool_input if tool_input is not None else kwargs)
+        if error:
+            return error
+        try:
+            file_name = generate_subject_from_text(parsed_input.input_message)
+        except Exception as e:
+            return f"エラー: ツール入力の処理中に予期せぬエラーが発生しました: {e}. 受け取った入力: {tool_input}"
+        return self._process(parsed_input.input_message, file_name, parsed_input.target_folder_name)
+
+    # --- 非同期実行メソッド ---
+    async def _arun(
+        self,
+        tool_input: Union[str, Dict[str, Any], None] = None,
+        **kwargs: Any
+    ) -> str:
+        """ツールの本体ロジック（非同期）
+
+        ファイル名の生成（LLMを使う設定の場合）は非同期APIで待ち受け、TTSとGoogle Drive操作
+        （同期APIのみ提供）はワーカースレッドで実行してイベントループを塞がない。
+        """
+        parsed_input, error = self._parse_input(tool_input if tool_input is not None else kwargs)
+        if error:
+            return error
+        try:
+            file_name = await agenerate_subject_from_text(parsed_input.input_message)
+        except Exception as e:
+            return f"エラー: ツール入力の処理中に予期せぬエラーが発生しました: {e}. 受け取った入力: {tool_input}"
+        return await asyncio.to_thread(self._process, parsed_input.input_message, file_name, parsed_input.target_folder_name)
+
+    def _process(self, input_message: str, file_name: Optional[str], target_folder_name: Optional[str]) -> str:
+        """TTS と Google Drive へのアップロード（同期）"""
+        print(f"[{self.name}] INFO: Parsed arguments: input_message='{input_message[:30]}...', file_name='{file_name}', target_folder_name='{target_folder_name}'")
+
         temp_dir = Path("./temp")
         speech_file_path: Optional[Path] = None  # finally スコープで参照するため
 
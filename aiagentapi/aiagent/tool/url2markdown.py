@@ -1,5 +1,5 @@
 from langchain.tools import tool
-from aiagent.utils.html2markdown import getMarkdown
+from aiagent.utils.html2markdown import getMarkdown, agetMarkdown
 from typing import Dict
 
 
@@ -7,3 +7,9 @@ from typing import Dict
 def getMarkdown_tool(url: str) -> Dict:
     """指定したURLからhtmlを取得しmarkdownに変換して返します。"""
     return getMarkdown(url)
+
+
+async def _agetMarkdown_tool(url: str) -> Dict:
+    return await agetMarkdown(url)
+
+getMarkdown_tool.coroutine = _agetMarkdown_tool
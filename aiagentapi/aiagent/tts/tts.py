@@ -1,12 +1,19 @@
-from openai import OpenAI
+from aiagent.utils.timing import timed
+from aiagent.utils.deadline import timeout_for
+from aiagent.utils.llm_client import get_openai_client, with_retry
 
 
+@timed("tts")
 def tts(speech_file_path, _input):
-    client = OpenAI()
-    with client.audio.speech.with_streaming_response.create(
-        model="gpt-4o-mini-tts",
-        voice="coral",
-        input=_input,
-        instructions="Speak in a cheerful and positive tone.",
-    ) as response:
-        response.stream_to_file(speech_file_path)
\ No newline at end of file
+    # 共有クライアント（接続プール）を使い、一時的なエラーはファイルを書き直して再試行する
+    def call():
+        with get_openai_client().audio.speech.with_streaming_response.create(
+            model="gpt-4o-mini-tts",
+            voice="coral",
+            input=_input,
+            instructions="Speak in a cheerful and positive tone.",
+            timeout=timeout_for(None),
+        ) as response:
+            response.stream_to_file(speech_file_path)
+
+    with_retry("openai", call)
\ No newline at end of file
@@ -0,0 +1,141 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager, suppress
+from aiagent.utils.lazy_import import langchain_callback_handler
+from app.core.config import settings
+
+
+# 1リクエストの制限時間の既定値（秒。0 の場合は無制限）
+DEFAULT_TIMEOUT_SECONDS = settings.AGENT_DEFAULT_TIMEOUT_SECONDS
+
+# LLM API 呼び出し1回あたりのタイムアウト（秒）。期限がある場合は残り時間と短い方を使う
+LLM_API_TIMEOUT_SECONDS = settings.LLM_API_TIMEOUT_SECONDS
+
+# 打ち切りの理由
+DEADLINE_TIMEOUT = "timeout"
+DEADLINE_CANCELLED = "cancelled"
+
+# 実行中のエージェントの期限
+_current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """期限切れ、またはキャンセルにより処理を中断したことを示す例外"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Agent execution stopped: {reason}")
+
+
+class Deadline:
+    """
+    エージェント実行1回分の期限。
+
+    期限はプロセス内の単調時計で管理し、cancel() による中断要求（クライアント切断等）も扱う。
+    実行中は contextvar 経由でツールやLLM呼び出しから参照され、残り時間を各呼び出しの
+    タイムアウトに反映する。
+    """
+
+    def __init__(self, timeout_seconds: float | None):
+        """
+        Args:
+            timeout_seconds (float | None): 現在からの制限時間（秒）。None の場合は時間制限なし（キャンセルのみ）。
+        """
+        self.timeout_seconds = timeout_seconds
+        self.expires_at = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """中断を要求する。以降の check() は DeadlineExceeded を送出する。"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> float | None:
+        """残り時間（秒）。期限切れの場合は 0、時間制限が無い場合は None。"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """期限切れ・キャンセル済みなら DeadlineExceeded を送出する"""
+        if self.cancelled:
+            raise DeadlineExceeded(DEADLINE_CANCELLED)
+        if self.expires_at is not None and self.remaining() <= 0:
+            raise DeadlineExceeded(DEADLINE_TIMEOUT)
+
+
+def current_deadline() -> Deadline | None:
+    return _current_deadline.get()
+
+
+def check_deadline():
+    """実行中のエージェントの期限を確認する（エージェント外では何もしない）"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def timeout_for(default: float | None) -> float | None:
+    """
+    外部呼び出しに指定するタイムアウトを、既定値と期限までの残り時間の短い方で返す。
+
+    Args:
+        default (float | None): 既定のタイムアウト（秒）。None は無制限。
+
+    Returns:
+        float | None: 使用するタイムアウト（秒）。
+
+    Raises:
+        DeadlineExceeded: すでに期限切れ・キャンセル済みの場合。
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    deadline.check()
+    remaining = deadline.remaining()
+    if remaining is None:
+        return default
+    return remaining if default is None else min(default, remaining)
+
+
+@contextmanager
+def activate_deadline(deadline: Deadline | None):
+    """この区間（およびそこから起動したスレッド・タスク）の期限を設定する"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        with suppress(ValueError):
+            _current_deadline.reset(token)
+
+
+class DeadlineCallbackHandler:
+    """
+    LLM呼び出し・ツール呼び出しの開始前に期限を確認し、期限切れなら DeadlineExceeded で
+    エージェントの実行を中断するコールバックハンドラ。全リクエストで共有する（get_deadline_callback() で取得する）。
+    """
+
+    # 例外をエージェントまで伝播させる
+    raise_error = True
+    # contextvar の期限を参照するため、その場で実行する
+    run_inline = True
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        check_deadline()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        check_deadline()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        check_deadline()
+
+
+@functools.cache
+def get_deadline_callback():
+    """アプリケーション全体で共有するハンドラを返す"""
+    return langchain_callback_handler(DeadlineCallbackHandler)()
@@ -1,48 +1,13 @@
-from openai import OpenAI
-import google.generativeai as genai
-import os
-
-
-chatgptapi_client = OpenAI(
-  api_key=os.environ.get("OPENAI_API_KEY")
-)
-
-
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-
-
-def isChatGptAPI(_selected_model):
-    if "gpt" in _selected_model:
-        return True
-    else:
-        return False
-
-
-def isChatGPT_o(_selected_model):
-    if "o1" in _selected_model:
-        return True
-    elif "o3" in _selected_model:
-        return True
-    else:
-        return False
-
-
-def isChatGPTImageAPI(_selected_model):
-    if "gpt-4o" in _selected_model:
-        return True
-    elif "o1" in _selected_model:
-        return True
-    elif "o3" in _selected_model:
-        return True
-    else:
-        return False
-
-
-def isGemini(_selected_model):
-    if "gemini" in _selected_model:
-        return True
-    else:
-        return False
+import asyncio
+import sqlite3
+from aiagent.utils.timing import timed, timing_span
+from aiagent.utils.metrics import observe_llm_api, observe, llm_provider, LLM_REQUEST_DURATION
+from aiagent.utils.llm_client import gemini_provider, get_provider
+from aiagent.utils.llm_cache import llm_cache
+from aiagent.utils.hedging import hedger
+from aiagent.aiagent.common import isChatGptAPI, isChatGPTImageAPI
+from aiagent.aiagent.model_registry import route_model, TASK_GENERAL, CAP_VISION
+from app.core.logger import getlogger
 
 
 def buildInpurtMessages(_messages, encoded_file):
@@ -81,72 +46,165 @@ def buildInpurtMessages(_messages, encoded_file):
 
 
 def buildInpurtMessagesForGemini(_messages):
-    system_instruction = None
-    contents_for_api = []
-
-    for msg in _messages:
-        role = msg.get("role")
-        content = msg.get("content")
-        if not role or not content:
-            continue
-
-        if role == "system":
-            system_instruction = content
-        elif role == "user":
-            # 正しい形式: 'parts' キーの中に {'text': ...} のリストを入れる
-            contents_for_api.append({'role': 'user', 'parts': [{'text': content}]})
-        elif role == "assistant" or role == "model":
-            # 正しい形式: 'parts' キーの中に {'text': ...} のリストを入れる
-            contents_for_api.append({'role': 'model', 'parts': [{'text': content}]})
-
-    return contents_for_api, system_instruction
-
-
-def execLlmApi(_selected_model, _messages, encoded_file=""):
-    if isChatGptAPI(_selected_model):
-        if isChatGPTImageAPI(_selected_model) and len(encoded_file) > 0:
-            _inpurt_messages = []
-            _inpurt_messages.append(_messages[0])
-            _inpurt_messages.append(
-                {"role": "user", "content": [
-                    {"type": "text", "text": _messages[1]["content"]},
-                    {"type": "image_url", "image_url": {
-                        "url": f"data:image/jpeg;base64,{encoded_file}"}}
-                ]}
-            )
-            response = chatgptapi_client.chat.completions.create(
-                model=_selected_model,
-                messages=_inpurt_messages
-            )
-        else:
-            response = chatgptapi_client.chat.completions.create(
-                model=_selected_model,
-                messages=_messages
-            )
-        return response.choices[0].message.content
-
-    elif isChatGPT_o(_selected_model):
-        # ToDo
-        #_inpurt_messages, _systemrole = buildInpurtMessages(_messages, encoded_file)
-        response = chatgptapi_client.chat.completions.create(
-            model=_selected_model,
-            messages=_messages
+    """Gemini の generate_content に渡す contents とシステムプロンプトを返す"""
+    return gemini_provider.split_messages(_messages)
+
+
+def buildInpurtMessagesForChatGPT(_selected_model, _messages, encoded_file=""):
+    """ChatGPT API に渡すメッセージを組み立てる（画像付きの場合は image_url を追加）"""
+    if isChatGPTImageAPI(_selected_model) and len(encoded_file) > 0:
+        _inpurt_messages = []
+        _inpurt_messages.append(_messages[0])
+        _inpurt_messages.append(
+            {"role": "user", "content": [
+                {"type": "text", "text": _messages[1]["content"]},
+                {"type": "image_url", "image_url": {
+                    "url": f"data:image/jpeg;base64,{encoded_file}"}}
+            ]}
         )
+        return _inpurt_messages
+    return _messages
 
-        return response.choices[0].message.content
-
-    elif isGemini(_selected_model):
-        _inpurt_messages, _systemrole = buildInpurtMessagesForGemini(_messages)
 
-        # モデル名を有効なものにすること！ (例: "gemini-1.5-flash-latest")
-        model = genai.GenerativeModel(
-            model_name=_selected_model,  # ★★★ モデル名を有効なものに！ ★★★
-            system_instruction=_systemrole,
-        )
-        response = model.generate_content(_inpurt_messages)
-        print("@@@@@@@@@@@")
-        print(response.text)
-        return response.text
-
-    else:
-        return {}
+def _input_messages(_selected_model, _messages, encoded_file=""):
+    """プロバイダに渡すメッセージ（画像入力に対応した OpenAI のモデルでは画像を付ける）"""
+    if isChatGptAPI(_selected_model):
+        return buildInpurtMessagesForChatGPT(_selected_model, _messages, encoded_file)
+    return _messages
+
+
+def _messages_text(_messages) -> str:
+    """モデル選択時の入力サイズの概算に使うテキスト"""
+    return "".join(str(m.get("content", "")) for m in _messages)
+
+
+def _cached_response(use_cache, model_name, _messages, encoded_file):
+    """
+    キャッシュ済みの応答と、応答を保存する際のキーを返す。
+
+    キャッシュを使わない場合のキーは None。キャッシュの読み書きに失敗しても LLM の呼び出しは続ける。
+    """
+    if not llm_cache.enabled:
+        return None, None
+    if use_cache is False:
+        llm_cache.bypass(model_name)
+        return None, None
+    try:
+        key = llm_cache.make_key(model_name, _messages, encoded_file)
+        return llm_cache.get(key, model_name), key
+    except sqlite3.Error as e:
+        getlogger().warning("LLM cache lookup failed: %s", e)
+        return None, None
+
+
+def _store_response(key, model_name, response):
+    if key is None or not isinstance(response, str) or not response:
+        return
+    try:
+        llm_cache.set(key, model_name, response)
+    except sqlite3.Error as e:
+        getlogger().warning("LLM cache store failed: %s", e)
+
+
+def _backup_model(model_name, task, encoded_file):
+    """ヘッジ・フェイルオーバーに使う予備のモデル（画像付きの場合は画像入力に対応したもの）"""
+    return hedger.backup_model(model_name, task, frozenset({CAP_VISION}) if encoded_file else frozenset())
+
+
+def execLlmApi(_selected_model, _messages, encoded_file="", task=TASK_GENERAL, use_cache=None):
+    """
+    LLM API を呼び出し、応答テキストを返す。
+
+    LLM_CACHE_DB_PATH を設定している場合は、同じモデル・メッセージ・画像に対する応答をキャッシュから返す。
+
+    Args:
+        _selected_model (str | None): モデル名。None の場合は task に応じて route_model で決める。
+        _messages (list): {"role", "content"} のリスト。
+        encoded_file (str): base64 エンコードした画像（画像入力に対応したモデルのみ）。
+        task (str): 処理の種類（model_registry.TASK_PROFILES のキー）。
+        use_cache (bool | None): False の場合はキャッシュを参照・保存せずに必ず API を呼び出す。
+
+    Raises:
+        ValueError: 対応していないモデルの場合。
+    """
+    model_name = route_model(task, _messages_text(_messages), _selected_model)
+    cached, key = _cached_response(use_cache, model_name, _messages, encoded_file)
+    if cached is not None:
+        return cached
+    # ヘッジが有効な場合は、応答が遅いときに別プロバイダの同等のモデルにも問い合わせる
+    response = hedger.call(model_name, _backup_model(model_name, task, encoded_file), task,
+                           lambda m: _execLlmApi(m, _messages, encoded_file))
+    _store_response(key, model_name, response)
+    return response
+
+
+async def aexecLlmApi(_selected_model, _messages, encoded_file="", task=TASK_GENERAL, use_cache=None):
+    """execLlmApi の非同期版。イベントループをブロックせずにLLMの応答を待つ。"""
+    model_name = route_model(task, _messages_text(_messages), _selected_model)
+    cached, key = await asyncio.to_thread(_cached_response, use_cache, model_name, _messages, encoded_file)
+    if cached is not None:
+        return cached
+    response = await hedger.acall(model_name, _backup_model(model_name, task, encoded_file), task,
+                                  lambda m: _aexecLlmApi(m, _messages, encoded_file))
+    await asyncio.to_thread(_store_response, key, model_name, response)
+    return response
+
+
+def execLlmApi_stream(_selected_model, _messages, encoded_file="", task=TASK_GENERAL):
+    """
+    execLlmApi のストリーミング版。生成されたテキストを差分（delta）ごとに返すジェネレータ。
+
+    全文の生成を待たずに後続の処理（SSE での送出等）を始めるために使う。全文が必要な場合は
+    "".join(execLlmApi_stream(...)) で連結する。
+
+    Args:
+        _selected_model (str | None): モデル名。None の場合は task に応じて route_model で決める。
+        _messages (list): {"role", "content"} のリスト。
+        encoded_file (str): base64 エンコードした画像（画像入力に対応したモデルのみ）。
+        task (str): 処理の種類（model_registry.TASK_PROFILES のキー）。
+
+    Yields:
+        str: 生成されたテキストの差分。
+
+    Raises:
+        ValueError: 対応していないモデルの場合。
+    """
+    model_name = route_model(task, _messages_text(_messages), _selected_model)
+    with observe(LLM_REQUEST_DURATION, provider=llm_provider(model_name), model=model_name), \
+            timing_span("llm_api", model=model_name, stream=True):
+        yield from get_provider(model_name).stream(model_name, _input_messages(model_name, _messages, encoded_file))
+
+
+async def aexecLlmApi_stream(_selected_model, _messages, encoded_file="", task=TASK_GENERAL):
+    """
+    execLlmApi_stream の非同期版。生成されたテキストを差分ごとに返す非同期イテレータ。
+
+    ヘッジが有効な場合は、最初の差分が遅いときに別プロバイダの同等のモデルにも問い合わせる。
+    """
+    model_name = route_model(task, _messages_text(_messages), _selected_model)
+    with observe(LLM_REQUEST_DURATION, provider=llm_provider(model_name), model=model_name), \
+            timing_span("llm_api", model=model_name, stream=True):
+        stream = hedger.astream(model_name, _backup_model(model_name, task, encoded_file), task,
+                                lambda m: _aopen_stream(m, _messages, encoded_file))
+        async for delta in stream:
+            yield delta
+
+
+def _aopen_stream(model_name, _messages, encoded_file=""):
+    """モデルに応じたプロバイダのストリーム（非同期イテレータ）を返す"""
+    return get_provider(model_name).astream(model_name, _input_messages(model_name, _messages, encoded_file))
+
+
+@observe_llm_api
+@timed("llm_api", detail=lambda _selected_model, *args, **kwargs: {"model": _selected_model})
+def _execLlmApi(_selected_model, _messages, encoded_file=""):
+    # 接続プール・再試行・タイムアウト・使用量の記録は llm_client のプロバイダで行う
+    return get_provider(_selected_model).complete(
+        _selected_model, _input_messages(_selected_model, _messages, encoded_file))
+
+
+@observe_llm_api
+@timed("llm_api", detail=lambda _selected_model, *args, **kwargs: {"model": _selected_model})
+async def _aexecLlmApi(_selected_model, _messages, encoded_file=""):
+    return await get_provider(_selected_model).acomplete(
+        _selected_model, _input_messages(_selected_model, _messages, encoded_file))
@@ -0,0 +1,155 @@
+import math
+import re
+
+
+# 件名に使わない汎用的な見出し（メルマガ・台本の定型の章立て等）
+_GENERIC_HEADINGS = {
+    "はじめに", "概要", "本文", "まとめ", "おわりに", "結論", "導入", "目次", "内容", "参照url", "参考", "参考文献",
+    "各記事の関係性への考察", "考察", "生成開始", "入力情報ソース", "出力指示",
+}
+# 件名に使わない見出しのパターン（"テーマ_1"、"URL: https://..." 等）
+_SKIP_HEADING_RE = re.compile(r"^(テーマ_?\d+|url\s*[:：]|https?://)", re.IGNORECASE)
+_HEADING_RE = re.compile(r"^\s{0,3}(#{1,6})[:\s]\s*(.*?)\s*#*\s*$")
+
+# キーフレーズの候補: ひらがな・記号を区切りとした、漢字・カタカナ・英数字の連続（複合語）
+_TERM_RE = re.compile(r"[一-龥々〆ヵヶァ-ヴーA-Za-zＡ-Ｚａ-ｚ0-9０-９][一-龥々〆ヵヶァ-ヴーA-Za-zＡ-Ｚａ-ｚ0-9０-９.+#\-]*")
+# どの文章にも現れ、件名の手がかりにならない語
+_STOPWORDS = {
+    "今回", "以下", "以上", "場合", "必要", "可能", "内容", "情報", "方法", "利用", "記事", "本文", "皆", "皆様",
+    "今日", "本日", "私", "私達", "我々", "一", "二", "具体的", "重要", "問題", "部分", "自分", "時間", "結果",
+    "理由", "今後", "最近", "非常", "本当", "全体", "対応", "関係", "意味", "紹介", "説明", "考察", "概要", "テーマ",
+    "タイトル", "ポイント", "エピソード", "リスナー", "番組", "ポッドキャスト", "メルマガ", "読者", "様", "方", "毎日",
+    "確認", "共有", "検討", "実施", "予定", "事前", "前日", "来週", "今週", "先週", "今月", "来月",
+    "URL", "http", "https", "www", "com", "html", "jp", "CTA",
+}
+# マークダウンの装飾・リンク・URL 等、件名の材料にならない部分
+_LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_URL_RE = re.compile(r"https?://\S+")
+_CODE_RE = re.compile(r"```.*?```", re.DOTALL)
+_MARKUP_RE = re.compile(r"<[^>]+>|[*_`>|~]")
+# ファイル名（Google Drive）・メールの件名に使えない文字
+_UNSAFE_CHARS_RE = re.compile(r'[\\/:*?"<>|\r\n\t]')
+
+# 件名に含めるキーフレーズの最大数と区切り
+SUBJECT_MAX_TERMS = 3
+SUBJECT_TERM_SEPARATOR = "・"
+
+
+def _clean(text: str) -> str:
+    """リンク・URL・コード・装飾を除いた本文"""
+    text = _CODE_RE.sub(" ", text)
+    text = _LINK_RE.sub(r"\1", text)
+    text = _URL_RE.sub(" ", text)
+    return _MARKUP_RE.sub(" ", text)
+
+
+def _sanitize(subject: str) -> str:
+    return re.sub(r"\s+", " ", _UNSAFE_CHARS_RE.sub(" ", subject)).strip(" ・、。")
+
+
+def _truncate(subject: str, max_length: int) -> str:
+    return subject if len(subject) <= max_length else subject[:max_length - 1] + "…"
+
+
+def _headings(text: str) -> list[tuple[int, str]]:
+    """件名に使える見出しの (レベル, 見出し) のリスト"""
+    headings = []
+    for line in text.splitlines():
+        match = _HEADING_RE.match(line)
+        if not match:
+            continue
+        # 装飾・URL を除く前の見出しで判定する（"_" や URL は除かれるため）
+        if _SKIP_HEADING_RE.match(match.group(2)):
+            continue
+        title = _sanitize(_clean(match.group(2)))
+        if not title or title.lower() in _GENERIC_HEADINGS:
+            continue
+        headings.append((len(match.group(1)), title))
+    return headings
+
+
+def _subject_from_headings(text: str, max_length: int) -> str | None:
+    """最上位の見出しを件名にする。同じレベルの見出しが他にもある場合は「ほか」を付ける。"""
+    headings = _headings(text)
+    if not headings:
+        return None
+    top_level = min(level for level, _ in headings)
+    titles = [title for level, title in headings if level == top_level]
+    subject = titles[0]
+    if len(titles) > 1 and len(subject) + 2 <= max_length:
+        subject += " ほか"
+    return _truncate(subject, max_length)
+
+
+def extract_keyphrases(text: str, top: int = 10) -> list[tuple[str, float]]:
+    """
+    本文からキーフレーズを抽出し、(キーフレーズ, スコア) をスコアの高い順に返す。
+
+    形態素解析を使わず、ひらがな・記号で区切った漢字・カタカナ・英数字の連続を複合語の候補とする。
+    スコアは出現回数、語の長さ（長い複合語ほど具体的）、初出の位置（冒頭に近いほど主題に近い）、
+    見出しへの出現から求める。
+
+    Args:
+        text (str): 本文（マークダウン可）。
+        top (int): 返す数。
+    """
+    heading_text = " ".join(title for _, title in _headings(text))
+    body = _clean(text)
+    length = max(1, len(body))
+    stats = {}
+    for match in _TERM_RE.finditer(body):
+        term = match.group(0).strip(".+#-")
+        if len(term) < 2 or term in _STOPWORDS or term.isdigit():
+            continue
+        count, first = stats.get(term, (0, match.start()))
+        stats[term] = (count + 1, first)
+
+    scored = []
+    for term, (count, first) in stats.items():
+        score = count * math.log2(1 + min(len(term), 10)) * (2.0 - first / length)
+        if term in heading_text:
+            score *= 2.0
+        scored.append((term, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+
+    # 上位の語に含まれる（または上位の語を含む）語は重複として除く
+    selected = []
+    for term, score in scored:
+        if any(term in chosen or chosen in term for chosen, _ in selected):
+            continue
+        selected.append((term, score))
+        if len(selected) >= top:
+            break
+    return selected
+
+
+def _subject_from_keyphrases(text: str, max_length: int) -> str | None:
+    subject = ""
+    for term, _ in extract_keyphrases(text, top=SUBJECT_MAX_TERMS * 3):
+        candidate = f"{subject}{SUBJECT_TERM_SEPARATOR}{term}" if subject else term
+        if len(candidate) > max_length:
+            continue
+        subject = candidate
+        if subject.count(SUBJECT_TERM_SEPARATOR) + 1 >= SUBJECT_MAX_TERMS:
+            break
+    return subject or None
+
+
+def extract_subject(text_body: str, max_length: int = 20) -> str:
+    """
+    LLMを使わずに、本文から件名（メールの件名・ファイル名）を抽出する。
+
+    見出しがあれば最上位の見出しを、無ければ本文のキーフレーズを「・」でつないだものを返す。
+    どちらも得られない場合は本文の冒頭を返す。ファイル名に使えない文字は含めない。
+
+    Args:
+        text_body (str): 件名を生成したいテキスト本文。
+        max_length (int): 件名の最大文字数。
+
+    Returns:
+        str: 件名。
+    """
+    subject = _subject_from_headings(text_body, max_length) or _subject_from_keyphrases(text_body, max_length)
+    if not subject:
+        subject = _truncate(_sanitize(_clean(text_body)), max_length)
+    return subject or "無題"
@@ -1,44 +1,28 @@
-import google.generativeai as genai
 import os
+from aiagent.utils.llm_client import gemini_provider
+from aiagent.aiagent.model_registry import route_model, TASK_SUBJECT
+from aiagent.utils.token_budget import budget_input, count_tokens
+from aiagent.utils.extractive_subject import extract_subject
+from app.core.config import settings
 
 
-def getmodel():
-    # --- 1. APIクライアントの準備 ---
-    try:
-        # 環境変数などからAPIキーを取得
-        GOOGLE_API_KEY = os.getenv('GEMINI_API_KEY')
-        if not GOOGLE_API_KEY:
-            raise ValueError("環境変数 'GEMINI_API_KEY' が設定されていません。")
-
-        genai.configure(api_key=GOOGLE_API_KEY)
-
-        # 使用するモデルを選択 (例: gemini-1.5-flash)
-        # より高性能なモデルが必要な場合は 'gemini-1.5-pro-latest' など
-        model = genai.GenerativeModel('gemini-1.5-flash')
+# 件名の生成方法: "local"（本文の見出し・キーフレーズから抽出。APIを呼ばない）/ "llm"（Gemini で生成）
+SUBJECT_GENERATOR = settings.SUBJECT_GENERATOR
 
-        return model
 
-    except Exception as e:
-        print(f"Gemini API の初期化中にエラーが発生しました: {e}")
-        exit()
+def _use_llm(use_llm: bool | None) -> bool:
+    return use_llm if use_llm is not None else SUBJECT_GENERATOR == "llm"
 
 
-def generate_subject_from_text(text_body: str, max_length: int = 20) -> str:
-    """
-    Gemini API を使用して、与えられたテキスト本文からメールの件名を生成します。
+def _check_api_key():
+    # --- 1. APIクライアントの準備（クライアントは llm_client で共有する） ---
+    if not os.getenv('GEMINI_API_KEY'):
+        raise ValueError("環境変数 'GEMINI_API_KEY' が設定されていません。")
 
-    Args:
-        text_body (str): 件名を生成したいテキスト本文。
-        max_length (int): 生成する件名の最大文字数（目安）。
-
-    Returns:
-        str: 生成された件名。エラーの場合はエラーメッセージ。
-    """
-    if not text_body:
-        return "エラー: テキスト本文が空です。"
 
+def _build_subject_prompt(text_body: str, max_length: int) -> str:
     # --- 2. プロンプトの設計 ---
-    prompt = f"""以下の文章の内容を正確に反映し、かつ簡潔で分かりやすい日本語の件名を1つだけ生成してください。
+    return f"""以下の文章の内容を正確に反映し、かつ簡潔で分かりやすい日本語の件名を1つだけ生成してください。
 件名は最大{max_length}文字程度にしてください。件名以外の余計な言葉（例：「はい、件名は～です」など）は含めないでください。
 
 --- 本文 ---
@@ -47,55 +31,112 @@ def generate_subject_from_text(text_body: str, max_length: int = 20) -> str:
 
 生成された件名:"""
 
-    # --- 3. API 呼び出し ---
+
+def _build_budgeted_prompt(text_body: str, max_length: int, model_name: str) -> str:
+    # 件名には冒頭と見出しがあれば十分なため、本文を件名生成用の上限に収めてから渡す
+    reserved_tokens = count_tokens(_build_subject_prompt("", max_length), model_name)
+    return _build_subject_prompt(budget_input(text_body, model_name, TASK_SUBJECT, reserved_tokens), max_length)
+
+
+def _subject_generation_config():
+    # 生成設定 (温度を低めに設定して一貫性を高める)
+    return gemini_provider.generation_config(
+        temperature=0.2,
+        max_output_tokens=50 # 件名なので短めに設定
+    )
+
+
+def _postprocess_subject(response, max_length: int) -> str:
+    # --- 4. 結果の取得と後処理 ---
+    generated_subject = response.text.strip()
+
+    # 前後に不要な引用符などが付いていたら削除
+    generated_subject = generated_subject.strip('"`\'')
+
+    # 必要に応じてさらに後処理 (例: 長すぎる場合の切り詰め)
+    if len(generated_subject) > max_length * 1.5: # 多少のオーバーは許容
+        print(f"Warning: Generated subject is longer than expected ({len(generated_subject)} chars). Truncating.")
+        # 単純に切り詰めるか、再度生成を試みるかなどの戦略が必要
+        generated_subject = generated_subject[:max_length] + "..."
+
+    # 空の結果チェック（呼び出し元で抽出した件名に切り替える）
+    if not generated_subject:
+        raise ValueError("件名を生成できませんでした（空の結果）。")
+
+    return generated_subject
+
+
+def _report_generation_error(e, response) -> str:
+    print(f"件名生成中にエラーが発生しました: {e}")
+    # response オブジェクトが存在すれば、ブロック理由などを確認できる場合がある
     try:
-        # 生成設定 (温度を低めに設定して一貫性を高める)
-        generation_config = genai.types.GenerationConfig(
-            temperature=0.2,
-            max_output_tokens=50 # 件名なので短めに設定
-        )
+        if response and response.prompt_feedback:
+            print(f"Prompt Feedback: {response.prompt_feedback}")
+        # Gemini API の safety ratings によりブロックされた場合など
+        if response and response.candidates and response.candidates[0].finish_reason.name != "STOP":
+            print(f"Generation finished with reason: {response.candidates[0].finish_reason.name}")
+            if response.candidates[0].safety_ratings:
+                print(f"Safety Ratings: {response.candidates[0].safety_ratings}")
 
-        print("Generating subject...") # デバッグ用
-        model = getmodel()
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
-        print("Generation complete.") # デバッグ用
+    except Exception as inner_e:
+        print(f"Error details unavailable or failed to access: {inner_e}")
+
+    return f"エラー: 件名生成中にエラーが発生しました: {e}"
 
-        # --- 4. 結果の取得と後処理 ---
-        generated_subject = response.text.strip()
 
-        # 前後に不要な引用符などが付いていたら削除
-        generated_subject = generated_subject.strip('"`\'')
+def generate_subject_from_text(text_body: str, max_length: int = 20, use_llm: bool | None = None) -> str:
+    """
+    与えられたテキスト本文からメールの件名を生成します。
 
-        # 必要に応じてさらに後処理 (例: 長すぎる場合の切り詰め)
-        if len(generated_subject) > max_length * 1.5: # 多少のオーバーは許容
-            print(f"Warning: Generated subject is longer than expected ({len(generated_subject)} chars). Truncating.")
-            # 単純に切り詰めるか、再度生成を試みるかなどの戦略が必要
-            generated_subject = generated_subject[:max_length] + "..."
+    既定では本文の見出し・キーフレーズから抽出し（APIを呼ばない）、SUBJECT_GENERATOR=llm または
+    use_llm=True の場合は Gemini API で生成します。Gemini の呼び出しに失敗した場合は抽出した件名を返します。
 
-        # 空の結果チェック
-        if not generated_subject:
-            return "エラー: 件名を生成できませんでした（空の結果）。"
+    Args:
+        text_body (str): 件名を生成したいテキスト本文。
+        max_length (int): 生成する件名の最大文字数（目安）。
+        use_llm (bool | None): True の場合は Gemini で生成する。None の場合は SUBJECT_GENERATOR に従う。
+
+    Returns:
+        str: 生成された件名。本文が空の場合はエラーメッセージ。
+    """
+    if not text_body:
+        return "エラー: テキスト本文が空です。"
+    if not _use_llm(use_llm):
+        return extract_subject(text_body, max_length)
 
-        return generated_subject
+    # --- 3. API 呼び出し ---
+    response = None
+    try:
+        print("Generating subject...") # デバッグ用
+        _check_api_key()
+        # 件名は短いため、Gemini のうち最も速いモデルを選ぶ
+        model_name = route_model(TASK_SUBJECT, text_body, providers={"gemini"})
+        prompt = _build_budgeted_prompt(text_body, max_length, model_name)
+        response = gemini_provider.generate(model_name, prompt, generation_config=_subject_generation_config())
+        print("Generation complete.") # デバッグ用
+        return _postprocess_subject(response, max_length)
 
     except Exception as e:
-        print(f"件名生成中にエラーが発生しました: {e}")
-        # response オブジェクトが存在すれば、ブロック理由などを確認できる場合がある
-        try:
-            if response and response.prompt_feedback:
-                print(f"Prompt Feedback: {response.prompt_feedback}")
-            # Gemini API の safety ratings によりブロックされた場合など
-            if response and response.candidates and response.candidates[0].finish_reason.name != "STOP":
-                print(f"Generation finished with reason: {response.candidates[0].finish_reason.name}")
-                if response.candidates[0].safety_ratings:
-                    print(f"Safety Ratings: {response.candidates[0].safety_ratings}")
+        _report_generation_error(e, response)
+        return extract_subject(text_body, max_length)
 
-        except Exception as inner_e:
-            print(f"Error details unavailable or failed to access: {inner_e}")
 
-        return f"エラー: 件名生成中にエラーが発生しました: {e}"
+async def agenerate_subject_from_text(text_body: str, max_length: int = 20, use_llm: bool | None = None) -> str:
+    """generate_subject_from_text の非同期版。"""
+    if not text_body:
+        return "エラー: テキスト本文が空です。"
+    if not _use_llm(use_llm):
+        return extract_subject(text_body, max_length)
 
+    response = None
+    try:
+        _check_api_key()
+        # 件名は短いため、Gemini のうち最も速いモデルを選ぶ
+        model_name = route_model(TASK_SUBJECT, text_body, providers={"gemini"})
+        prompt = _build_budgeted_prompt(text_body, max_length, model_name)
+        response = await gemini_provider.agenerate(model_name, prompt, generation_config=_subject_generation_config())
+        return _postprocess_subject(response, max_length)
 
+    except Exception as e:
+        _report_generation_error(e, response)
+        return extract_subject(text_body, max_length)
@@ -0,0 +1,304 @@
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from aiagent.utils.deadline import DeadlineExceeded
+from aiagent.utils.metrics import LLM_HEDGE_REQUESTS_TOTAL
+from aiagent.utils.usage import estimate_cost
+from aiagent.aiagent.model_registry import MODEL_REGISTRY, MODEL_ROUTER_CANDIDATES, TASK_PROFILES, TASK_GENERAL, get_model_spec
+from app.core.config import settings
+from app.core.logger import getlogger
+
+
+# True の場合、応答が遅いLLM呼び出しを別プロバイダの同等のモデルにも送り、先に返った方を使う
+LLM_HEDGE_ENABLED = settings.LLM_HEDGE_ENABLED
+# 予備のリクエストを送るまでの待ち時間として使う、これまでの所要時間のパーセンタイル
+LLM_HEDGE_PERCENTILE = settings.LLM_HEDGE_PERCENTILE
+# パーセンタイルの計算に必要な計測数（モデル・処理の種類ごと）。これより少ない間は予備のリクエストを送らない
+LLM_HEDGE_MIN_SAMPLES = settings.LLM_HEDGE_MIN_SAMPLES
+# パーセンタイルの計算に使う直近の計測数
+LLM_HEDGE_WINDOW = settings.LLM_HEDGE_WINDOW
+# 予備のリクエストを送るまでの最短の待ち時間（秒）
+LLM_HEDGE_MIN_DELAY_SECONDS = settings.LLM_HEDGE_MIN_DELAY_SECONDS
+# 予備のモデルの指定（モデル名の前方一致。例: '{"gemini-1.5-pro": "gpt-4o"}'）。指定が無い場合は自動で選ぶ
+LLM_HEDGE_BACKUP_MODELS = settings.LLM_HEDGE_BACKUP_MODELS
+# 同期呼び出しで並行して待つためのスレッド数
+LLM_HEDGE_MAX_WORKERS = settings.LLM_HEDGE_MAX_WORKERS
+
+# プロバイダと、利用に必要な API キーの環境変数
+PROVIDER_API_KEYS = {"openai": "OPENAI_API_KEY", "gemini": "GEMINI_API_KEY"}
+
+# 呼び出しの結果
+HEDGE_NOT_HEDGED = "not_hedged"   # 期限内に主のモデルが応答した
+HEDGE_PRIMARY = "primary"         # 予備のリクエストを送ったが、主のモデルが先に応答した
+HEDGE_BACKUP = "backup"           # 予備のモデルが先に応答した
+HEDGE_FAILOVER = "failover"       # 主のモデルがエラーとなり、予備のモデルの応答を使った
+
+
+class Hedger:
+    """
+    LLM呼び出しのテールレイテンシを抑えるため、応答が遅い場合に別プロバイダの同等のモデルへ
+    予備のリクエストを送り（ヘッジ）、先に返った方の応答を使うクラス。
+
+    予備のリクエストを送るまでの待ち時間は、モデル・処理の種類ごとの直近の所要時間のパーセンタイルとする。
+    主のモデルがエラーとなった場合も予備のモデルで呼び出し直す（フェイルオーバー）。
+    非同期の呼び出しでは負けた側をキャンセルする。同期の呼び出しでは HTTP リクエストを中断できないため、
+    負けた側の応答は破棄する（トークン使用量は記録される）。
+    """
+
+    def __init__(self, enabled: bool, percentile: float, min_samples: int, window: int, min_delay: float,
+                 backup_models: dict | None = None, max_workers: int = LLM_HEDGE_MAX_WORKERS):
+        """
+        Args:
+            enabled (bool): False の場合はヘッジ・フェイルオーバーを行わない。
+            percentile (float): 予備のリクエストを送るまでの待ち時間に使うパーセンタイル（0-100）。
+            min_samples (int): パーセンタイルの計算に必要な計測数。
+            window (int): パーセンタイルの計算に使う直近の計測数。
+            min_delay (float): 予備のリクエストを送るまでの最短の待ち時間（秒）。
+            backup_models (dict | None): モデル名（前方一致） -> 予備のモデル名。
+            max_workers (int): 同期呼び出しで並行して待つためのスレッド数。
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self.backup_models = backup_models or {}
+        self.max_workers = max_workers
+        self._latencies = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    # --- 待ち時間・予備のモデル ---
+    def observe(self, model_name: str, task: str, seconds: float):
+        """主のモデルの所要時間を記録する。"""
+        with self._lock:
+            samples = self._latencies.get((model_name, task))
+            if samples is None:
+                samples = self._latencies[(model_name, task)] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def delay(self, model_name: str, task: str) -> float | None:
+        """予備のリクエストを送るまでの待ち時間（秒）。計測数が足りない場合は None。"""
+        with self._lock:
+            samples = sorted(self._latencies.get((model_name, task), ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(len(samples) * self.percentile / 100) - 1))
+        return max(self.min_delay, samples[index])
+
+    def backup_model(self, model_name: str, task: str = TASK_GENERAL, capabilities=frozenset()) -> str | None:
+        """
+        主のモデルと同等（同じ品質・必要な機能を持つ）の、別プロバイダのモデルを返す。
+
+        Args:
+            model_name (str): 主のモデル名。
+            task (str): 処理の種類（model_registry.TASK_PROFILES のキー）。
+            capabilities (frozenset): 処理の種類の要件に加えて必要な機能（画像入力等）。
+
+        Returns:
+            str | None: 予備のモデル名。無効な場合・候補が無い場合は None。
+        """
+        if not self.enabled:
+            return None
+        spec = get_model_spec(model_name)
+        providers = {p for p, env in PROVIDER_API_KEYS.items() if p != spec.provider and os.getenv(env)}
+        matches = [key for key in self.backup_models if spec.name.startswith(key)]
+        if matches:
+            backup = self.backup_models[max(matches, key=len)]
+            return backup if get_model_spec(backup).provider in providers else None
+
+        required = TASK_PROFILES.get(task, TASK_PROFILES[TASK_GENERAL])["capabilities"] | capabilities
+        candidates = [
+            s for name, s in MODEL_REGISTRY.items()
+            if (not MODEL_ROUTER_CANDIDATES or name in MODEL_ROUTER_CANDIDATES)
+            and s.provider in providers
+            and required <= s.capabilities
+            and s.quality >= spec.quality
+        ]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda s: (s.quality, s.typical_latency_sec, estimate_cost(s.name, 1000, 1000)))
+        return best.name
+
+    # --- 呼び出し ---
+    def call(self, model_name: str, backup_model: str | None, task: str, call):
+        """
+        call(model_name) を実行する。遅い場合・エラーの場合は call(backup_model) も実行し、先に返った方を返す。
+
+        Args:
+            model_name (str): 主のモデル名。
+            backup_model (str | None): 予備のモデル名。None の場合は主のモデルのみで実行する。
+            task (str): 処理の種類（所要時間の集計単位）。
+            call (Callable[[str], T]): モデル名を受け取りLLMを呼び出す関数。
+
+        Returns:
+            T: 採用した方の call の戻り値。
+        """
+        if not self.enabled or backup_model is None:
+            return call(model_name)
+        delay = self.delay(model_name, task)
+        start = time.perf_counter()
+        if delay is None:
+            # 計測数が足りない間はヘッジせず、エラーの場合のみ予備のモデルで呼び出し直す
+            try:
+                result = call(model_name)
+            except Exception as e:
+                self._failover(model_name, backup_model, e)
+                return call(backup_model)
+            self.observe(model_name, task, time.perf_counter() - start)
+            self._record(model_name, HEDGE_NOT_HEDGED)
+            return result
+
+        primary = self._submit(call, model_name)
+        done, _ = wait([primary], timeout=delay)
+        if primary in done:
+            if primary.exception() is None:
+                self.observe(model_name, task, time.perf_counter() - start)
+                self._record(model_name, HEDGE_NOT_HEDGED)
+                return primary.result()
+            self._failover(model_name, backup_model, primary.exception())
+            return call(backup_model)
+
+        getlogger().info("LLM call to '%s' exceeded %.2fs. Sending a hedged request to '%s'", model_name, delay, backup_model)
+        backup = self._submit(call, backup_model)
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (primary, backup):
+                if future in done and future.exception() is None:
+                    # 主のモデルが負けた場合も、そこまでの時間（下限）を所要時間として記録する
+                    self.observe(model_name, task, time.perf_counter() - start)
+                    self._record(model_name, HEDGE_PRIMARY if future is primary else HEDGE_BACKUP)
+                    return future.result()
+        # 両方ともエラーの場合は主のモデルのエラーを送出する
+        raise primary.exception()
+
+    async def acall(self, model_name: str, backup_model: str | None, task: str, call):
+        """call の非同期版。call はモデル名を受け取り awaitable を返す関数で渡す。負けた側はキャンセルする。"""
+        if not self.enabled or backup_model is None:
+            return await call(model_name)
+        delay = self.delay(model_name, task)
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(call(model_name))
+        backup = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if primary in done:
+                if primary.exception() is None:
+                    self.observe(model_name, task, time.perf_counter() - start)
+                    self._record(model_name, HEDGE_NOT_HEDGED)
+                    return primary.result()
+                self._failover(model_name, backup_model, primary.exception())
+                return await call(backup_model)
+
+            getlogger().info("LLM call to '%s' exceeded %.2fs. Sending a hedged request to '%s'", model_name, delay, backup_model)
+            backup = asyncio.ensure_future(call(backup_model))
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task_ in (primary, backup):
+                    if task_ in done and task_.exception() is None:
+                        self.observe(model_name, task, time.perf_counter() - start)
+                        self._record(model_name, HEDGE_PRIMARY if task_ is primary else HEDGE_BACKUP)
+                        return task_.result()
+            raise primary.exception()
+        finally:
+            for task_ in (primary, backup):
+                if task_ is not None and not task_.done():
+                    task_.cancel()
+
+    async def astream(self, model_name: str, backup_model: str | None, task: str, open_stream):
+        """
+        ストリーミングの呼び出しをヘッジする非同期イテレータ。最初のチャンクが先に届いた方のストリームを返す。
+
+        Args:
+            model_name (str): 主のモデル名。
+            backup_model (str | None): 予備のモデル名。
+            task (str): 処理の種類（最初のチャンクまでの時間の集計単位）。
+            open_stream (Callable[[str], AsyncIterator]): モデル名を受け取り、ストリームを返す関数。
+        """
+        if not self.enabled or backup_model is None:
+            async for chunk in open_stream(model_name):
+                yield chunk
+            return
+        winner = await self.acall(model_name, backup_model, f"{task}:first_chunk",
+                                  lambda m: _first_chunk(open_stream(m)))
+        stream, first = winner
+        try:
+            if first is not _END:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    # --- 内部処理 ---
+    def _submit(self, call, model_name: str):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-hedge")
+        # 期限・使用量・優先度等の contextvar を引き継ぐ
+        return self._pool.submit(contextvars.copy_context().run, call, model_name)
+
+    def _failover(self, model_name: str, backup_model: str, exc: BaseException):
+        if isinstance(exc, (DeadlineExceeded, asyncio.CancelledError)):
+            raise exc
+        print(f"LLM call to '{model_name}' failed ({type(exc).__name__}: {exc}). Failing over to '{backup_model}'")
+        self._record(model_name, HEDGE_FAILOVER)
+
+    def _record(self, model_name: str, outcome: str):
+        LLM_HEDGE_REQUESTS_TOTAL.labels(model=model_name, outcome=outcome).inc()
+        with self._lock:
+            counts = self._counts.setdefault(model_name, {o: 0 for o in (
+                HEDGE_NOT_HEDGED, HEDGE_PRIMARY, HEDGE_BACKUP, HEDGE_FAILOVER)})
+            counts[outcome] += 1
+
+    def stats(self) -> dict:
+        """モデルごとの呼び出し数、ヘッジした割合と予備のモデルが勝った割合、現在の待ち時間を返す。"""
+        with self._lock:
+            counts = {model: dict(c) for model, c in self._counts.items()}
+            tasks = list(self._latencies)
+        models = {}
+        for model, c in counts.items():
+            total = sum(c.values())
+            hedged = c[HEDGE_PRIMARY] + c[HEDGE_BACKUP]
+            models[model] = {
+                **c,
+                "total": total,
+                "hedge_rate": hedged / total if total else 0.0,
+                "backup_win_rate": c[HEDGE_BACKUP] / hedged if hedged else 0.0,
+            }
+        delays = {f"{model}/{task}": self.delay(model, task) for model, task in tasks}
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "models": models,
+            "delay_seconds": delays,
+        }
+
+
+# ストリームの終端を表す値
+_END = object()
+
+
+async def _first_chunk(stream):
+    """ストリームの最初のチャンクを待ち、(ストリーム, 最初のチャンク) を返す"""
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = _END
+    return stream, first
+
+
+# アプリケーション全体で共有するヘッジ
+hedger = Hedger(LLM_HEDGE_ENABLED, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES, LLM_HEDGE_WINDOW,
+                LLM_HEDGE_MIN_DELAY_SECONDS, LLM_HEDGE_BACKUP_MODELS)
@@ -1,13 +1,17 @@
+import asyncio
 import html2text
 from aiagent.googleapis.drive import get_or_create_folder, upload_file
 from bs4 import BeautifulSoup, NavigableString
 from aiagent.utils.file_operation import delete_file
+from aiagent.utils.timing import timed
+from aiagent.utils.deadline import DeadlineExceeded, timeout_for
 import re
 import requests
 import uuid
 from pathlib import Path
 
 
+@timed("html2markdown")
 def getMarkdown(url, isUpload=True):
     try:
         result = {
@@ -15,7 +19,8 @@ def getMarkdown(url, isUpload=True):
             "result": ""
         }
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=10)
+        # 実行中のエージェントに期限がある場合は残り時間を超えて待たない
+        response = requests.get(url, headers=headers, timeout=timeout_for(10))
 
         if response.status_code == 200:
             html_content = response.text
@@ -47,12 +52,20 @@ def getMarkdown(url, isUpload=True):
             return result
         else:
             return str(response.status_code) + "エラー"
+    except DeadlineExceeded:
+        # 期限切れはエラー結果にせず、エージェントの実行ごと打ち切る
+        raise
     except Exception as e:
         print(e)
         result["result"] = e
         return result
 
 
+async def agetMarkdown(url, isUpload=True):
+    """getMarkdown の非同期版。HTTP取得とDriveアップロードをワーカースレッドで実行する。"""
+    return await asyncio.to_thread(getMarkdown, url, isUpload)
+
+
 def convert_html_to_markdown(html_content):
     print("convert start")
     # html2textのインスタンスを作成
@@ -0,0 +1,32 @@
+import functools
+import importlib
+
+
+def import_object(path: str):
+    """
+    'パッケージ.モジュール:属性' 形式のパスが指すオブジェクトをインポートして返す。
+
+    重い依存（LLM SDK・Google API クライアント・pandas 等）を持つモジュールを
+    起動時ではなく初めて使う時点で読み込むために使う。属性を省略した場合はモジュールを返す。
+    """
+    module_name, _, attr = path.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr) if attr else module
+
+
+@functools.cache
+def with_lazy_base(cls: type, base_path: str) -> type:
+    """
+    cls に、base_path（'パッケージ.モジュール:クラス' 形式）が指すクラスを基底クラスとして加えたクラスを返す。
+
+    LangChain のコールバックハンドラ・レートリミッタ等を、langchain_core を起動時に読み込まずに定義するために使う。
+    cls には基底クラスのメソッドを上書きするメソッドだけを定義しておく。生成したクラスは cls ごとに1つだけ作る。
+    """
+    base = import_object(base_path)
+    return type(cls.__name__, (cls, base), {
+        "__module__": cls.__module__, "__qualname__": cls.__qualname__, "__doc__": cls.__doc__})
+
+
+def langchain_callback_handler(cls: type) -> type:
+    """cls を LangChain のコールバックハンドラ（BaseCallbackHandler の派生クラス）にしたクラスを返す"""
+    return with_lazy_base(cls, "langchain_core.callbacks:BaseCallbackHandler")
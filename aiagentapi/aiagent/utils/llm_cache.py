@@ -0,0 +1,209 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from aiagent.utils.metrics import LLM_CACHE_REQUESTS_TOTAL
+from app.core.config import settings
+
+
+# SQLite ファイルのパス。指定した場合のみ execLlmApi の応答をキャッシュする（空の場合は無効）
+LLM_CACHE_DB_PATH = settings.LLM_CACHE_DB_PATH
+# キャッシュの有効期間（秒。0 の場合はキャッシュしない）
+LLM_CACHE_TTL_SECONDS = settings.LLM_CACHE_TTL_SECONDS
+# 保存する応答の合計サイズの上限（バイト）。超えた場合は最も長く使われていないものから削除する
+LLM_CACHE_MAX_BYTES = settings.LLM_CACHE_MAX_BYTES
+# 最終参照時刻を更新する最小間隔（秒）。ヒットのたびに書き込みが発生しないようにする
+LLM_CACHE_TOUCH_INTERVAL_SECONDS = settings.LLM_CACHE_TOUCH_INTERVAL_SECONDS
+
+# キーの形式を変更した場合に上げる（古い形式のキーには一致しなくなる）
+LLM_CACHE_KEY_VERSION = 1
+
+
+class LlmResponseCache:
+    """
+    LLM の応答テキストを、入力の内容から求めたキーで SQLite に保存するキャッシュ。
+
+    キーはモデル・メッセージ・画像・生成パラメータの SHA-256 で、同じ入力（同じURLのマークダウン等）から
+    定期実行で生成し直す場合に、API を呼び出さずに前回の応答を返す。
+    有効期間（TTL）と合計サイズの上限（LRU）で管理する。SQLite の WAL モードとトランザクションで
+    排他するため、複数の uvicorn ワーカープロセスから同じファイルを共有できる。
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int, max_bytes: int,
+                 touch_interval: float = LLM_CACHE_TOUCH_INTERVAL_SECONDS):
+        """
+        Args:
+            db_path (str): SQLite ファイルのパス。空の場合はキャッシュしない。
+            ttl_seconds (int): 有効期間（秒）。0 以下の場合はキャッシュしない。
+            max_bytes (int): 保存する応答の合計サイズの上限（バイト）。
+            touch_interval (float): 最終参照時刻を更新する最小間隔（秒）。
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._evicted = 0
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.db_path) and self.ttl_seconds > 0
+
+    @contextmanager
+    def _connect(self):
+        """接続を開き、正常終了時にコミットして閉じる"""
+        self._initialize()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self):
+        """初回の接続時にテーブルを作成する（インポート時にはファイルを作らない）"""
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                with conn:
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS llm_responses (
+                            key TEXT PRIMARY KEY,
+                            model TEXT NOT NULL,
+                            response TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            created_at REAL NOT NULL,
+                            expires_at REAL NOT NULL,
+                            last_accessed REAL NOT NULL
+                        )
+                        """
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_expires_at ON llm_responses (expires_at)")
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_accessed ON llm_responses (last_accessed)")
+            finally:
+                conn.close()
+            self._initialized = True
+
+    @staticmethod
+    def make_key(model_name: str, messages: list, encoded_file: str = "", **params) -> str:
+        """
+        キャッシュのキーを生成する。
+
+        Args:
+            model_name (str): 選択済みのモデル名。
+            messages (list): {"role", "content"} のリスト。
+            encoded_file (str): base64 エンコードした画像（キーにはハッシュ値のみ含める）。
+            **params: 応答に影響するその他の生成パラメータ（temperature 等）。
+        """
+        payload = json.dumps(
+            {
+                "version": LLM_CACHE_KEY_VERSION,
+                "model": model_name,
+                "messages": messages,
+                "file": hashlib.sha256(encoded_file.encode("utf-8")).hexdigest() if encoded_file else "",
+                "params": params,
+            },
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, model_name: str = "") -> str | None:
+        """有効期間内の応答を返す。無い場合は None。"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, last_accessed FROM llm_responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None and now - row[1] >= self.touch_interval:
+                conn.execute("UPDATE llm_responses SET last_accessed = ? WHERE key = ?", (now, key))
+        self._count("hit" if row is not None else "miss", model_name)
+        return row[0] if row is not None else None
+
+    def set(self, key: str, model_name: str, response: str):
+        """応答を保存し、期限切れの行と上限を超えた分を削除する。"""
+        with self._connect() as conn:
+            # 書き込みロックを先に取り、他のプロセスとの削除の競合を避ける
+            # （時刻はロックの取得後に求め、待っている間に書き込まれた行より古くならないようにする）
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses "
+                "(key, model, response, size, created_at, expires_at, last_accessed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, len(response.encode("utf-8")), now, now + self.ttl_seconds, now)
+            )
+            evicted = conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (now,)).rowcount
+            # 最近使われた順にサイズを累積し、上限を超えた行を削除する
+            evicted += conn.execute(
+                """
+                DELETE FROM llm_responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_accessed DESC, key) AS cumulative
+                        FROM llm_responses
+                    ) WHERE cumulative > ?
+                )
+                """, (self.max_bytes,)
+            ).rowcount
+        if evicted:
+            with self._lock:
+                self._evicted += evicted
+
+    def bypass(self, model_name: str = ""):
+        """キャッシュを使わなかった呼び出しを記録する（統計用）。"""
+        self._count("bypass", model_name)
+
+    def _count(self, result: str, model_name: str):
+        with self._lock:
+            if result == "hit":
+                self._hits += 1
+            elif result == "miss":
+                self._misses += 1
+            else:
+                self._bypassed += 1
+        LLM_CACHE_REQUESTS_TOTAL.labels(model=model_name or "unknown", result=result).inc()
+
+    def clear(self):
+        """保存しているキャッシュをすべて削除する。"""
+        if self.enabled:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM llm_responses")
+
+    def stats(self) -> dict:
+        """ヒット/ミス数（このプロセス分）と、保存件数・サイズ（全プロセス共有分）を返す。"""
+        entries, total_bytes = 0, 0
+        if self.enabled:
+            with self._connect() as conn:
+                entries, total_bytes = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses WHERE expires_at > ?", (time.time(),)
+                ).fetchone()
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "hits": self._hits,
+                "misses": self._misses,
+                "bypassed": self._bypassed,
+                "hit_rate": self._hits / total if total else 0.0,
+                "evicted": self._evicted,
+                "entries": entries,
+                "bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# アプリケーション全体で共有する LLM 応答キャッシュ
+llm_cache = LlmResponseCache(LLM_CACHE_DB_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES)
@@ -0,0 +1,580 @@
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import timedelta
+from aiagent.utils.usage import record_response_usage
+from aiagent.utils.metrics import LLM_API_RETRIES_TOTAL
+from aiagent.utils.rate_limit import llm_rate_limiter
+from aiagent.utils.deadline import DeadlineExceeded, current_deadline, check_deadline, timeout_for, LLM_API_TIMEOUT_SECONDS
+from aiagent.aiagent.model_registry import is_openai, is_gemini, estimate_tokens
+from app.core.config import settings
+from app.core.logger import getlogger
+
+
+# 一時的なエラー（429・5xx・通信エラー）の再試行回数（初回の呼び出しは含まない）
+LLM_MAX_RETRIES = settings.LLM_MAX_RETRIES
+# 再試行までの待ち時間: 0 〜 min(上限, 基準 * 2^n) の一様乱数（full jitter）
+LLM_RETRY_BASE_SECONDS = settings.LLM_RETRY_BASE_SECONDS
+LLM_RETRY_MAX_SECONDS = settings.LLM_RETRY_MAX_SECONDS
+
+# OpenAI API の接続プール（keep-alive で接続を使い回す）
+LLM_HTTP_MAX_CONNECTIONS = settings.LLM_HTTP_MAX_CONNECTIONS
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS
+LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS = settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS
+
+# 生成済みの GenerativeModel を保持する数（モデル名とシステムプロンプトの組ごと）
+GEMINI_MODEL_CACHE_SIZE = settings.GEMINI_MODEL_CACHE_SIZE
+# Gemini のコンテキストキャッシュ（システムプロンプトをサーバー側に保存し、入力単価を下げる）の有効期間（秒。0 の場合は使わない）
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS
+# コンテキストキャッシュを使うシステムプロンプトの最小トークン数（これより短いものは API が受け付けない）
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS
+# 同時に保持するコンテキストキャッシュの最大数（保存期間に応じて課金されるため、使用頻度の低いものから破棄する）
+GEMINI_CONTEXT_CACHE_MAX_ENTRIES = settings.GEMINI_CONTEXT_CACHE_MAX_ENTRIES
+
+# 再試行するHTTPステータス
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+# ステータスを持たない通信エラー。SDKを読み込まずに判定するため、クラス名で扱う
+RETRYABLE_ERROR_NAMES = frozenset({
+    "APIConnectionError", "APITimeoutError",                            # openai
+    "ConnectError", "ConnectTimeout", "ReadTimeout", "RemoteProtocolError",  # httpx
+})
+
+
+# --- 共有クライアント（初めて使う時点で生成する） ---
+@functools.cache
+def get_openai_client():
+    """接続プールを共有する OpenAI クライアント。再試行は with_retry で行うため SDK の再試行は無効にする。"""
+    from openai import OpenAI, DefaultHttpxClient
+    return OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0,
+                  http_client=DefaultHttpxClient(limits=_http_limits()))
+
+
+@functools.cache
+def get_openai_async_client():
+    """接続プールを共有する AsyncOpenAI クライアント"""
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0,
+                       http_client=DefaultAsyncHttpxClient(limits=_http_limits()))
+
+
+@functools.cache
+def get_genai():
+    """APIキーを設定済みの google.generativeai モジュール（接続は SDK 内で共有される）"""
+    import google.generativeai as genai
+    genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+    return genai
+
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+# --- 再試行 ---
+def _status_code(exc: Exception) -> int | None:
+    # openai: status_code / google.api_core: code（HTTPステータス）
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """一時的なエラー（レート制限・サーバーエラー・通信エラー）か判定する"""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def _retry_after(exc: Exception) -> float | None:
+    """Retry-After ヘッダー（秒）。無い場合は None。"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def backoff_delay(attempt: int, exc: Exception | None = None) -> float:
+    """
+    attempt 回目（0 始まり）の再試行までの待ち時間（秒）。
+
+    指数バックオフに full jitter を掛け、Retry-After が指定されていればそれより短くしない。
+    """
+    delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+    retry_after = _retry_after(exc) if exc is not None else None
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, LLM_RETRY_MAX_SECONDS))
+    return delay
+
+
+def _next_delay(provider: str, attempt: int, exc: Exception, model_name: str | None = None) -> float | None:
+    """再試行する場合は待ち時間、しない場合は None を返す"""
+    status = _status_code(exc)
+    if status == 429 and model_name:
+        # 同じ枠を使う他の呼び出しも、待ち時間の間は新たに送らない
+        llm_rate_limiter.pause(model_name, _retry_after(exc) or backoff_delay(attempt))
+    if attempt >= LLM_MAX_RETRIES or not is_retryable(exc):
+        return None
+    delay = backoff_delay(attempt, exc)
+    # 期限までに再試行できない場合は諦める
+    deadline = current_deadline()
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is not None and delay >= remaining:
+        return None
+    LLM_API_RETRIES_TOTAL.labels(provider=provider, reason=str(status) if status else type(exc).__name__).inc()
+    getlogger().warning("LLM API call failed (%s: %s). Retrying in %.2fs (%d/%d)",
+                        type(exc).__name__, exc, delay, attempt + 1, LLM_MAX_RETRIES)
+    return delay
+
+
+def with_retry(provider: str, call, model_name: str | None = None):
+    """
+    call() を実行し、一時的なエラーの場合は指数バックオフで再試行する。
+
+    call はタイムアウトを呼び出しごとに計算できるよう、引数なしの関数で渡す。
+
+    Args:
+        provider (str): プロバイダ名（メトリクスのラベル）。
+        call (Callable[[], T]): API呼び出し。
+        model_name (str | None): 指定した場合は、呼び出し（再試行を含む）ごとにモデルのレート制限の枠を確保する。
+
+    Returns:
+        T: call() の戻り値。
+    """
+    attempt = 0
+    while True:
+        if model_name:
+            llm_rate_limiter.acquire(model_name)
+        try:
+            return call()
+        except Exception as e:
+            delay = _next_delay(provider, attempt, e, model_name)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        check_deadline()
+        attempt += 1
+
+
+async def awith_retry(provider: str, call, model_name: str | None = None):
+    """with_retry の非同期版。call は awaitable を返す引数なしの関数で渡す。"""
+    attempt = 0
+    while True:
+        if model_name:
+            await llm_rate_limiter.aacquire(model_name)
+        try:
+            return await call()
+        except Exception as e:
+            delay = _next_delay(provider, attempt, e, model_name)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        check_deadline()
+        attempt += 1
+
+
+# --- プロバイダ ---
+class LlmProvider(ABC):
+    """
+    LLM API の呼び出しをプロバイダごとにまとめた基底クラス。
+
+    共有クライアント（接続プール）の利用、レート制限の枠の確保、期限を反映したタイムアウト、
+    一時的なエラーの再試行、トークン使用量の記録を、同期・非同期の両方で行う。
+    呼び出し元は get_provider で選んだプロバイダの complete / acomplete / stream / astream に
+    {"role", "content"} のメッセージを渡し、プロバイダごとの形式の違いを意識せずに使う。
+    """
+    name = "unknown"
+
+    @abstractmethod
+    def complete(self, model_name: str, messages: list, system: str | None = None, **kwargs) -> str:
+        """
+        メッセージに対する応答テキストを返す。
+
+        Args:
+            model_name (str): モデル名。
+            messages (list): {"role", "content"} のリスト（system ロールを含んでもよい）。
+            system (str | None): メッセージの前に置くシステムプロンプト。
+            **kwargs: プロバイダの API にそのまま渡す引数。
+        """
+
+    @abstractmethod
+    async def acomplete(self, model_name: str, messages: list, system: str | None = None, **kwargs) -> str:
+        """complete の非同期版。"""
+
+    @abstractmethod
+    def stream(self, model_name: str, messages: list, system: str | None = None, **kwargs):
+        """complete のストリーミング版。生成されたテキストを差分ごとに返すジェネレータ。"""
+
+    @abstractmethod
+    def astream(self, model_name: str, messages: list, system: str | None = None, **kwargs):
+        """stream の非同期版。生成されたテキストを差分ごとに返す非同期イテレータ。"""
+
+    @staticmethod
+    @abstractmethod
+    def text(response) -> str:
+        """レスポンスから応答テキストを取り出す"""
+
+    @abstractmethod
+    def chunk_text(self, model_name: str, chunk) -> str:
+        """ストリーミングのチャンクから差分のテキストを取り出す（本文を含まないチャンクでは空文字列）"""
+
+
+class OpenAIProvider(LlmProvider):
+    name = "openai"
+
+    @staticmethod
+    def _with_system(messages: list, system: str | None) -> list:
+        return [{"role": "system", "content": system}, *messages] if system else messages
+
+    def complete(self, model_name: str, messages: list, system: str | None = None, **kwargs) -> str:
+        return self.text(self.chat(model_name, self._with_system(messages, system), **kwargs))
+
+    async def acomplete(self, model_name: str, messages: list, system: str | None = None, **kwargs) -> str:
+        return self.text(await self.achat(model_name, self._with_system(messages, system), **kwargs))
+
+    def stream(self, model_name: str, messages: list, system: str | None = None, **kwargs):
+        return self.chat_stream(model_name, self._with_system(messages, system), **kwargs)
+
+    def astream(self, model_name: str, messages: list, system: str | None = None, **kwargs):
+        return self.achat_stream(model_name, self._with_system(messages, system), **kwargs)
+
+    def chat(self, model_name: str, messages: list, **kwargs):
+        """Chat Completions API を呼び出し、レスポンスを返す。"""
+        def call():
+            return get_openai_client().chat.completions.create(
+                model=model_name, messages=messages, timeout=timeout_for(LLM_API_TIMEOUT_SECONDS), **kwargs)
+        response = with_retry(self.name, call, model_name)
+        record_response_usage(model_name, response)
+        return response
+
+    async def achat(self, model_name: str, messages: list, **kwargs):
+        """chat の非同期版。"""
+        def call():
+            return get_openai_async_client().chat.completions.create(
+                model=model_name, messages=messages, timeout=timeout_for(LLM_API_TIMEOUT_SECONDS), **kwargs)
+        response = await awith_retry(self.name, call, model_name)
+        record_response_usage(model_name, response)
+        return response
+
+    def chat_stream(self, model_name: str, messages: list, **kwargs):
+        """
+        Chat Completions API をストリーミングで呼び出し、生成されたテキストを差分ごとに返すジェネレータ。
+
+        再試行はストリームの開始（HTTPレスポンスの受信）までに限る。途中まで返した後のエラーはそのまま送出する。
+        """
+        def call():
+            return get_openai_client().chat.completions.create(
+                model=model_name, messages=messages, stream=True, stream_options={"include_usage": True},
+                timeout=timeout_for(LLM_API_TIMEOUT_SECONDS), **kwargs)
+        stream = with_retry(self.name, call, model_name)
+        try:
+            for chunk in stream:
+                check_deadline()
+                delta = self.chunk_text(model_name, chunk)
+                if delta:
+                    yield delta
+        finally:
+            stream.close()
+
+    async def achat_stream(self, model_name: str, messages: list, **kwargs):
+        """chat_stream の非同期版。"""
+        def call():
+            return get_openai_async_client().chat.completions.create(
+                model=model_name, messages=messages, stream=True, stream_options={"include_usage": True},
+                timeout=timeout_for(LLM_API_TIMEOUT_SECONDS), **kwargs)
+        stream = await awith_retry(self.name, call, model_name)
+        try:
+            async for chunk in stream:
+                check_deadline()
+                delta = self.chunk_text(model_name, chunk)
+                if delta:
+                    yield delta
+        finally:
+            await stream.close()
+
+    def chunk_text(self, model_name: str, chunk) -> str:
+        # 使用量は choices が空の最後のチャンクで返る
+        if getattr(chunk, "usage", None) is not None:
+            record_response_usage(model_name, chunk)
+        return chunk.choices[0].delta.content if chunk.choices else ""
+
+    @staticmethod
+    def text(response) -> str:
+        return response.choices[0].message.content
+
+
+class GeminiProvider(LlmProvider):
+    name = "gemini"
+
+    def __init__(self, cache_size: int = GEMINI_MODEL_CACHE_SIZE,
+                 context_cache_ttl: int = GEMINI_CONTEXT_CACHE_TTL_SECONDS,
+                 context_cache_min_tokens: int = GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+                 context_cache_max_entries: int = GEMINI_CONTEXT_CACHE_MAX_ENTRIES):
+        self.cache_size = cache_size
+        self.context_cache_ttl = context_cache_ttl
+        self.context_cache_min_tokens = context_cache_min_tokens
+        self.context_cache_max_entries = context_cache_max_entries
+        # (モデル名, システムプロンプト) -> (GenerativeModel, 延長する時刻。None は無期限, CachedContent | None)
+        self._models = OrderedDict()
+        # コンテキストキャッシュを作成できなかった組（未対応のモデル等。同じ組では再び試みない）
+        self._context_cache_failed = set()
+        self._lock = threading.Lock()
+
+    def model(self, model_name: str, system_instruction: str | None = None):
+        """
+        GenerativeModel を返す。同じモデル名・システムプロンプトの組は生成済みのものを使い回す。
+
+        コンテキストキャッシュが有効で、システムプロンプトが十分に長い場合は、サーバー側にキャッシュした
+        システムプロンプトを参照するモデルを返す。キャッシュの期限が近づいたら有効期間を延長し、
+        保持数の上限を超えて破棄したキャッシュは期限を早めて削除させる。
+        """
+        key = (model_name, system_instruction)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                self._models.move_to_end(key)
+                return entry[0]
+
+        released = []
+        model = cached_content = None
+        if entry is not None and entry[2] is not None:
+            if self._extend_context_cache(entry[2], self.context_cache_ttl):
+                model, cached_content = entry[0], entry[2]
+            else:
+                released.append(entry[2])
+        if model is None:
+            cached_content = self._create_context_cache(model_name, system_instruction)
+            if cached_content is not None:
+                model = get_genai().GenerativeModel.from_cached_content(cached_content=cached_content)
+            else:
+                model = get_genai().GenerativeModel(model_name=model_name, system_instruction=system_instruction)
+        # 期限の直前に使われないよう、余裕を持って延長する
+        expires_at = now + self.context_cache_ttl * 0.9 if cached_content is not None else None
+
+        with self._lock:
+            previous = self._models.pop(key, None)
+            # 別のスレッドが同じ組のキャッシュを先に作成していた場合
+            if previous is not None and previous[2] is not None and previous[2] is not cached_content \
+                    and previous[2] not in released:
+                released.append(previous[2])
+            self._models[key] = (model, expires_at, cached_content)
+            while len(self._models) > self.cache_size:
+                _, evicted = self._models.popitem(last=False)
+                if evicted[2] is not None:
+                    released.append(evicted[2])
+            cached_keys = [k for k, e in self._models.items() if e[2] is not None]
+            for k in cached_keys[:max(0, len(cached_keys) - self.context_cache_max_entries)]:
+                released.append(self._models.pop(k)[2])
+        for content in released:
+            self._release_context_cache(content)
+        return model
+
+    def _create_context_cache(self, model_name: str, system_instruction: str | None):
+        """システムプロンプトのコンテキストキャッシュ（CachedContent）を作成する。使わない場合は None。"""
+        key = (model_name, system_instruction)
+        if (self.context_cache_ttl <= 0 or self.context_cache_max_entries <= 0 or not system_instruction
+                or key in self._context_cache_failed
+                or estimate_tokens(system_instruction) < self.context_cache_min_tokens):
+            return None
+        try:
+            get_genai()
+            from google.generativeai import caching
+            cached_content = caching.CachedContent.create(
+                model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+                system_instruction=system_instruction,
+                ttl=timedelta(seconds=self.context_cache_ttl),
+            )
+            getlogger().debug("Gemini context cache created: model=%s name=%s", model_name, cached_content.name)
+            return cached_content
+        except Exception as e:
+            # キャッシュに対応していないモデル・短すぎる入力等。通常の呼び出しで続ける
+            getlogger().debug("Gemini context cache unavailable for '%s': %s", model_name, e)
+            with self._lock:
+                self._context_cache_failed.add(key)
+            return None
+
+    @staticmethod
+    def _extend_context_cache(cached_content, ttl: float) -> bool:
+        """コンテキストキャッシュの有効期間を ttl 秒後までに変更する。失敗した場合は False。"""
+        try:
+            cached_content.update(ttl=timedelta(seconds=ttl))
+            return True
+        except Exception as e:
+            getlogger().debug("Failed to update Gemini context cache '%s': %s", cached_content.name, e)
+            return False
+
+    def _release_context_cache(self, cached_content):
+        """
+        使わなくなったコンテキストキャッシュを破棄する。
+
+        実行中の呼び出しが参照している可能性があるため、すぐには削除せず、API 呼び出し1回分のタイムアウトの後に
+        期限切れになるようにする。期限を変更できない場合は削除する。
+        """
+        if self._extend_context_cache(cached_content, min(LLM_API_TIMEOUT_SECONDS, self.context_cache_ttl)):
+            return
+        try:
+            cached_content.delete()
+        except Exception as e:
+            # 期限切れでサーバー側から削除済みの場合等
+            getlogger().debug("Failed to delete Gemini context cache '%s': %s", cached_content.name, e)
+
+    @staticmethod
+    def split_messages(messages: list, system: str | None = None) -> tuple[list, str | None]:
+        """
+        {"role", "content"} のリストを、generate_content の contents とシステムプロンプトに分ける。
+
+        Args:
+            messages (list): {"role", "content"} のリスト。
+            system (str | None): メッセージの system ロールの前に置くシステムプロンプト。
+
+        Returns:
+            tuple[list, str | None]: contents（role/parts のリスト）と、システムプロンプト（無い場合は None）。
+        """
+        system_instruction = None
+        contents = []
+        for msg in messages:
+            role = msg.get("role")
+            content = msg.get("content")
+            if not role or not content:
+                continue
+            if role == "system":
+                system_instruction = content
+            elif role == "user":
+                contents.append({"role": "user", "parts": [{"text": content}]})
+            elif role in ("assistant", "model"):
+                contents.append({"role": "model", "parts": [{"text": content}]})
+        if system:
+            system_instruction = f"{system}\n\n{system_instruction}" if system_instruction else system
+        return contents, system_instruction
+
+    def complete(self, model_name: str, messages: list, system: str | None = None, **kwargs) -> str:
+        contents, system_instruction = self.split_messages(messages, system)
+        return self.text(self.generate(model_name, contents, system_instruction, **kwargs))
+
+    async def acomplete(self, model_name: str, messages: list, system: str | None = None, **kwargs) -> str:
+        contents, system_instruction = self.split_messages(messages, system)
+        return self.text(await self.agenerate(model_name, contents, system_instruction, **kwargs))
+
+    def stream(self, model_name: str, messages: list, system: str | None = None, **kwargs):
+        contents, system_instruction = self.split_messages(messages, system)
+        return self.generate_stream(model_name, contents, system_instruction, **kwargs)
+
+    def astream(self, model_name: str, messages: list, system: str | None = None, **kwargs):
+        contents, system_instruction = self.split_messages(messages, system)
+        return self.agenerate_stream(model_name, contents, system_instruction, **kwargs)
+
+    def generate(self, model_name: str, contents, system_instruction: str | None = None, **kwargs):
+        """
+        generate_content を呼び出し、レスポンスを返す。
+
+        Args:
+            model_name (str): モデル名（"models/" 付きも可）。
+            contents: プロンプト（文字列、または role/parts のリスト）。
+            system_instruction (str | None): システムプロンプト。
+            **kwargs: generation_config・tools 等、generate_content にそのまま渡す引数。
+        """
+        model = self.model(model_name, system_instruction)
+
+        def call():
+            return model.generate_content(
+                contents, request_options={"timeout": timeout_for(LLM_API_TIMEOUT_SECONDS)}, **kwargs)
+        response = with_retry(self.name, call, model_name)
+        record_response_usage(model_name, response)
+        return response
+
+    async def agenerate(self, model_name: str, contents, system_instruction: str | None = None, **kwargs):
+        """generate の非同期版。"""
+        model = self.model(model_name, system_instruction)
+
+        def call():
+            return model.generate_content_async(
+                contents, request_options={"timeout": timeout_for(LLM_API_TIMEOUT_SECONDS)}, **kwargs)
+        response = await awith_retry(self.name, call, model_name)
+        record_response_usage(model_name, response)
+        return response
+
+    def generate_stream(self, model_name: str, contents, system_instruction: str | None = None, **kwargs):
+        """
+        generate_content をストリーミングで呼び出し、生成されたテキストを差分ごとに返すジェネレータ。
+
+        再試行はストリームの開始（最初のチャンクの受信）までに限る。
+        """
+        model = self.model(model_name, system_instruction)
+
+        def call():
+            return model.generate_content(
+                contents, stream=True, request_options={"timeout": timeout_for(LLM_API_TIMEOUT_SECONDS)}, **kwargs)
+        response = with_retry(self.name, call, model_name)
+        for chunk in response:
+            check_deadline()
+            delta = self.chunk_text(model_name, chunk)
+            if delta:
+                yield delta
+        # 使用量は全チャンクの受信後に確定する
+        record_response_usage(model_name, response)
+
+    async def agenerate_stream(self, model_name: str, contents, system_instruction: str | None = None, **kwargs):
+        """generate_stream の非同期版。"""
+        model = self.model(model_name, system_instruction)
+
+        def call():
+            return model.generate_content_async(
+                contents, stream=True, request_options={"timeout": timeout_for(LLM_API_TIMEOUT_SECONDS)}, **kwargs)
+        response = await awith_retry(self.name, call, model_name)
+        async for chunk in response:
+            check_deadline()
+            delta = self.chunk_text(model_name, chunk)
+            if delta:
+                yield delta
+        record_response_usage(model_name, response)
+
+    def chunk_text(self, model_name: str, chunk) -> str:
+        # 本文を含まないチャンク（終了理由のみ等）では text が ValueError を送出する
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
+
+    @staticmethod
+    def generation_config(**kwargs):
+        """GenerationConfig を生成する（temperature・max_output_tokens 等）"""
+        return get_genai().types.GenerationConfig(**kwargs)
+
+    @staticmethod
+    def text(response) -> str:
+        return response.text
+
+
+# アプリケーション全体で共有するプロバイダ
+openai_provider = OpenAIProvider()
+gemini_provider = GeminiProvider()
+
+
+def get_provider(model_name: str) -> LlmProvider:
+    """
+    モデル名に対応するプロバイダを返す。
+
+    Raises:
+        ValueError: 対応するプロバイダが無い場合。
+    """
+    if is_openai(model_name):
+        return openai_provider
+    if is_gemini(model_name):
+        return gemini_provider
+    raise ValueError(f"Model '{model_name}' is not supported.")
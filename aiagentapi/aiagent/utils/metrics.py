@@ -0,0 +1,188 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+from aiagent.utils.lazy_import import langchain_callback_handler
+
+
+# LLM・エージェントは数十秒かかることがあるため、長めの区間まで用意する
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# --- HTTP ---
+HTTP_REQUESTS_TOTAL = Counter(
+    "aiagent_http_requests_total", "HTTPリクエスト数", ["method", "path", "status"])
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "aiagent_http_requests_in_progress", "処理中のHTTPリクエスト数", ["method"])
+HTTP_REQUEST_DURATION = Histogram(
+    "aiagent_http_request_duration_seconds", "HTTPリクエストの処理時間（ストリーミングは最後の本文の送信まで）",
+    ["method", "path"], buckets=LATENCY_BUCKETS)
+
+# --- エージェント・ツール ---
+AGENT_RUNS_IN_PROGRESS = Gauge(
+    "aiagent_agent_runs_in_progress", "実行中のエージェント数", ["agent"])
+AGENT_RUN_DURATION = Histogram(
+    "aiagent_agent_run_duration_seconds", "エージェント実行1回の所要時間",
+    ["agent", "model", "status"], buckets=LATENCY_BUCKETS)
+TOOL_CALL_DURATION = Histogram(
+    "aiagent_tool_call_duration_seconds", "ツール呼び出しの所要時間",
+    ["tool", "status"], buckets=LATENCY_BUCKETS)
+
+# --- 外部API ---
+LLM_REQUEST_DURATION = Histogram(
+    "aiagent_llm_request_duration_seconds", "LLM API呼び出しの所要時間",
+    ["provider", "model", "status"], buckets=LATENCY_BUCKETS)
+LLM_API_RETRIES_TOTAL = Counter(
+    "aiagent_llm_api_retries_total", "LLM API呼び出しの再試行回数", ["provider", "reason"])
+LLM_CACHE_REQUESTS_TOTAL = Counter(
+    "aiagent_llm_cache_requests_total", "LLM応答キャッシュの参照回数", ["model", "result"])
+LLM_RATE_LIMIT_QUEUE_DEPTH = Gauge(
+    "aiagent_llm_rate_limit_queue_depth", "LLM呼び出しのレート制限で枠を待っている呼び出し数", ["limit", "priority"])
+LLM_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "aiagent_llm_rate_limit_wait_seconds", "LLM呼び出しのレート制限で枠を待った時間",
+    ["limit", "priority"], buckets=LATENCY_BUCKETS)
+LLM_HEDGE_REQUESTS_TOTAL = Counter(
+    "aiagent_llm_hedge_requests_total", "ヘッジを有効にしたLLM呼び出しの結果（not_hedged/primary/backup/failover）",
+    ["model", "outcome"])
+LLM_INPUT_TRIMMED_TOKENS_TOTAL = Counter(
+    "aiagent_llm_input_trimmed_tokens_total", "入力の上限を超えたため省略したトークン数", ["task"])
+LLM_TOKENS_TOTAL = Counter(
+    "aiagent_llm_tokens_total", "LLMのトークン使用量", ["provider", "model", "type"])
+LLM_PROMPT_CACHED_RATIO = Histogram(
+    "aiagent_llm_prompt_cached_ratio", "LLM呼び出しごとの、入力トークンのうちプロバイダ側でキャッシュされた割合",
+    ["provider", "model"], buckets=(0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0))
+LLM_COST_USD_TOTAL = Counter(
+    "aiagent_llm_cost_usd_total", "LLMの推定コスト（USD）", ["provider", "model"])
+GOOGLE_API_REQUEST_DURATION = Histogram(
+    "aiagent_google_api_request_duration_seconds", "Google API呼び出しの所要時間",
+    ["service", "method", "status"], buckets=LATENCY_BUCKETS)
+
+
+def llm_provider(model_name: str) -> str:
+    """モデル名からプロバイダ名を推定する"""
+    model_name = model_name or ""
+    if "gemini" in model_name:
+        return "gemini"
+    if model_name.startswith(("gpt", "o1", "o3", "o4", "chatgpt")):
+        return "openai"
+    return "unknown"
+
+
+@contextmanager
+def observe(histogram: Histogram, **labels):
+    """ブロックの所要時間を histogram に記録する。例外時は status="error" とする。"""
+    start = time.perf_counter()
+    status = "success"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        histogram.labels(status=status, **labels).observe(time.perf_counter() - start)
+
+
+def observe_llm_api(func):
+    """第1引数をモデル名とするLLM呼び出し関数（同期・非同期）の所要時間を記録するデコレータ"""
+    def _labels(args, kwargs):
+        model_name = args[0] if args else kwargs.get("_selected_model", "")
+        return {"provider": llm_provider(model_name), "model": model_name}
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with observe(LLM_REQUEST_DURATION, **_labels(args, kwargs)):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with observe(LLM_REQUEST_DURATION, **_labels(args, kwargs)):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class MetricsCallbackHandler:
+    """
+    エージェント実行・ツール呼び出し・LLM呼び出しの所要時間を Prometheus に記録するコールバックハンドラ。
+
+    全リクエストで共有する。実行中の run_id ごとの開始時刻のみを保持し、
+    終了時（エラー・キャンセルを含む）に破棄する。
+    エージェント名・モデル名は実行時の config の metadata (agent / model) から取得する。
+    langchain_core を起動時に読み込まないよう、ハンドラは get_metrics_callback() で取得する。
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = {}
+
+    def _start(self, run_id, kind: str, labels: dict):
+        with self._lock:
+            self._running[run_id] = (kind, labels, time.perf_counter())
+        if kind == "agent":
+            AGENT_RUNS_IN_PROGRESS.labels(agent=labels["agent"]).inc()
+
+    def _end(self, run_id, status: str):
+        with self._lock:
+            started = self._running.pop(run_id, None)
+        if started is None:
+            return
+        kind, labels, start = started
+        elapsed = time.perf_counter() - start
+        if kind == "agent":
+            AGENT_RUNS_IN_PROGRESS.labels(agent=labels["agent"]).dec()
+            AGENT_RUN_DURATION.labels(status=status, **labels).observe(elapsed)
+        elif kind == "tool":
+            TOOL_CALL_DURATION.labels(status=status, **labels).observe(elapsed)
+        elif kind == "llm":
+            LLM_REQUEST_DURATION.labels(status=status, **labels).observe(elapsed)
+
+    # --- エージェント（最上位のチェーン） ---
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        if parent_run_id is None:
+            metadata = metadata or {}
+            self._start(run_id, "agent", {"agent": metadata.get("agent", "unknown"), "model": metadata.get("model", "unknown")})
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id, "success")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+    # --- ツール ---
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", {"tool": (serialized or {}).get("name") or kwargs.get("name") or "unknown"})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, "success")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+    # --- エージェントが使用するLLM ---
+    def _start_llm(self, run_id, metadata):
+        metadata = metadata or {}
+        model_name = metadata.get("ls_model_name") or metadata.get("model") or "unknown"
+        provider = llm_provider(model_name)
+        self._start(run_id, "llm", {"provider": provider, "model": model_name})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start_llm(run_id, metadata)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start_llm(run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id, "success")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+
+@functools.cache
+def get_metrics_callback():
+    """アプリケーション全体で共有するハンドラを返す"""
+    return langchain_callback_handler(MetricsCallbackHandler)()
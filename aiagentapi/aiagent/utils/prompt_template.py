@@ -0,0 +1,44 @@
+import re
+import textwrap
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    プロンプトの空白を正規化する。
+
+    ソースコードのインデント・行末の空白を除き、連続する空行を1行にまとめる。
+    同じ指示文が毎回同じ文字列（＝同じトークン列）になるようにし、無駄なトークンも減らす。
+    """
+    lines = [line.rstrip() for line in textwrap.dedent(text).splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+class PromptTemplate:
+    """
+    固定の指示文と可変の入力を分けたプロンプトのテンプレート。
+
+    指示文は正規化してシステムプロンプトに置き、入力（マークダウン等）はユーザーメッセージとして最後に置く。
+    先頭が毎回同じになるため、OpenAI のプロンプトキャッシュ（先頭1024トークン以上の一致で自動適用）や
+    Gemini のキャッシュ（暗黙的キャッシュ、GEMINI_CONTEXT_CACHE_TTL_SECONDS 設定時のコンテキストキャッシュ）が効く。
+    """
+
+    def __init__(self, name: str, instructions: str, input_heading: str = ""):
+        """
+        Args:
+            name (str): テンプレート名（ログ・統計用）。
+            instructions (str): 固定の指示文（役割・出力形式等）。可変の値を埋め込まないこと。
+            input_heading (str): 入力の前に付ける見出し（例: "# 入力情報"）。
+        """
+        self.name = name
+        self.instructions = normalize_prompt(instructions)
+        self.input_heading = input_heading
+
+    def build_messages(self, input_info: str) -> list:
+        """入力を埋め込んだ {"role", "content"} のリストを返す"""
+        content = (input_info or "").strip()
+        if self.input_heading:
+            content = f"{self.input_heading}\n{content}"
+        return [
+            {"role": "system", "content": self.instructions},
+            {"role": "user", "content": content}
+        ]
@@ -0,0 +1,306 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager, suppress
+from aiagent.utils.deadline import current_deadline, check_deadline
+from aiagent.utils.metrics import LLM_RATE_LIMIT_QUEUE_DEPTH, LLM_RATE_LIMIT_WAIT_SECONDS, llm_provider
+from aiagent.utils.lazy_import import with_lazy_base
+from app.core.config import settings
+
+
+# 優先度（値が小さいほど優先）
+PRIORITY_INTERACTIVE = 0  # API から直接呼び出された、ユーザーが応答を待っている処理
+PRIORITY_BACKGROUND = 1   # ジョブ・定期実行のメルマガ/ポッドキャスト生成等
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+# モデル名（前方一致）またはプロバイダ名（"openai" / "gemini"）ごとの上限。
+# 例: '{"openai": {"rpm": 500, "tpm": 200000}, "gemini-1.5-pro": {"rpm": 60}}'
+# 最も長く一致したキーの上限を使い、同じキーに一致するモデルは枠を共有する。一致しないモデルは制限しない
+LLM_RATE_LIMITS = settings.LLM_RATE_LIMITS
+# 一度に使える枠（何秒分の上限を溜めておけるか）
+LLM_RATE_LIMIT_BURST_SECONDS = settings.LLM_RATE_LIMIT_BURST_SECONDS
+# バックグラウンド処理が使わずに残しておく、リクエスト枠の割合（対話的な処理のバーストに備える）
+LLM_RATE_LIMIT_BACKGROUND_RESERVE = settings.LLM_RATE_LIMIT_BACKGROUND_RESERVE
+# 待機中に順番・期限を確認する間隔（秒）
+LLM_RATE_LIMIT_POLL_SECONDS = 0.05
+
+# 実行中の処理の優先度
+_current_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def activate_priority(priority: int):
+    """この区間（およびそこから起動したスレッド・タスク）のLLM呼び出しの優先度を設定する"""
+    token = _current_priority.set(priority)
+    try:
+        yield priority
+    finally:
+        with suppress(ValueError):
+            _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+class _TokenBucket:
+    """rate（/秒）で補充され、capacity まで溜まるバケツ。使用量の事後精算のため負の値も取る。"""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, required: float) -> float:
+        """level が required に達するまでの時間（秒）"""
+        return 0.0 if self.level >= required else (required - self.level) / self.rate
+
+
+class ModelRateLimiter:
+    """
+    1つの上限（モデルまたはプロバイダ）に対する、リクエスト数（RPM）とトークン数（TPM）のトークンバケット。
+
+    待機中の呼び出しは（優先度, 到着順）の順に1つずつ枠を確保するため、対話的な処理は
+    先に待っているバックグラウンド処理より先に実行される。トークン数は呼び出し前には分からないため、
+    使用量の記録時に debit() で差し引き、残量が負の間は新しい呼び出しを待たせる。
+    """
+
+    def __init__(self, name: str, rpm: float | None = None, tpm: float | None = None,
+                 burst_seconds: float = LLM_RATE_LIMIT_BURST_SECONDS,
+                 background_reserve: float = LLM_RATE_LIMIT_BACKGROUND_RESERVE):
+        """
+        Args:
+            name (str): 上限の名前（LLM_RATE_LIMITS のキー）。
+            rpm (float | None): 1分あたりのリクエスト数の上限。None の場合は制限しない。
+            tpm (float | None): 1分あたりのトークン数の上限。None の場合は制限しない。
+            burst_seconds (float): 一度に使える枠（何秒分の上限を溜めておけるか）。
+            background_reserve (float): バックグラウンド処理が使わずに残しておくリクエスト枠の割合。
+        """
+        self.name = name
+        self.requests = _TokenBucket(rpm, burst_seconds) if rpm else None
+        self.tokens = _TokenBucket(tpm, burst_seconds) if tpm else None
+        self.background_reserve = background_reserve
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._granted = {lane: 0 for lane in PRIORITY_NAMES.values()}
+
+    def _required_requests(self, priority: int) -> float:
+        if priority <= PRIORITY_INTERACTIVE:
+            return 1.0
+        return min(self.requests.capacity, 1.0 + self.requests.capacity * self.background_reserve)
+
+    def _try_acquire(self, ticket) -> float:
+        """ticket が先頭で枠があれば確保して 0 を、無ければ再確認までの時間（秒）を返す（ロック内で呼ぶ）"""
+        if self._waiters[0] != ticket:
+            return LLM_RATE_LIMIT_POLL_SECONDS
+        now = time.monotonic()
+        wait = max(0.0, self._paused_until - now)
+        if self.requests is not None:
+            self.requests.refill(now)
+            wait = max(wait, self.requests.wait_for(self._required_requests(ticket[0])))
+        if self.tokens is not None:
+            self.tokens.refill(now)
+            # 精算済みの使用量で枠を超えていなければ通す
+            wait = max(wait, self.tokens.wait_for(1.0))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.level -= 1
+        heapq.heappop(self._waiters)
+        self._granted[PRIORITY_NAMES.get(ticket[0], str(ticket[0]))] += 1
+        self._cond.notify_all()
+        return 0.0
+
+    def _enqueue(self, priority: int):
+        ticket = (priority, next(self._seq))
+        heapq.heappush(self._waiters, ticket)
+        LLM_RATE_LIMIT_QUEUE_DEPTH.labels(limit=self.name, priority=PRIORITY_NAMES.get(priority, str(priority))).inc()
+        return ticket
+
+    def _leave(self, ticket, started: float):
+        """待ち行列から抜けた（確保・中断のいずれも）ことを記録する（ロック内で呼ぶ）"""
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+            self._cond.notify_all()
+        priority = PRIORITY_NAMES.get(ticket[0], str(ticket[0]))
+        LLM_RATE_LIMIT_QUEUE_DEPTH.labels(limit=self.name, priority=priority).dec()
+        LLM_RATE_LIMIT_WAIT_SECONDS.labels(limit=self.name, priority=priority).observe(time.monotonic() - started)
+
+    @staticmethod
+    def _wait_timeout(wait: float) -> float:
+        """待ち時間を期限までの残り時間で切り詰める"""
+        deadline = current_deadline()
+        remaining = deadline.remaining() if deadline is not None else None
+        wait = min(wait, LLM_RATE_LIMIT_POLL_SECONDS * 20)
+        return wait if remaining is None else max(0.0, min(wait, remaining))
+
+    def acquire(self, priority: int | None = None, blocking: bool = True) -> bool:
+        """
+        リクエスト1回分の枠を確保する。枠が無い場合は順番が来るまで待つ。
+
+        Args:
+            priority (int | None): 優先度。None の場合は実行中の処理の優先度。
+            blocking (bool): False の場合は待たずに結果を返す。
+
+        Returns:
+            bool: 確保できた場合は True。
+
+        Raises:
+            DeadlineExceeded: 枠を確保する前に期限切れ・キャンセルとなった場合。
+        """
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    wait = self._try_acquire(ticket)
+                    if wait == 0:
+                        return True
+                    if not blocking:
+                        return False
+                    check_deadline()
+                    self._cond.wait(self._wait_timeout(wait))
+            finally:
+                self._leave(ticket, started)
+
+    async def aacquire(self, priority: int | None = None, blocking: bool = True) -> bool:
+        """acquire の非同期版。待機中もイベントループをブロックしない。"""
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(ticket)
+                if wait == 0:
+                    return True
+                if not blocking:
+                    return False
+                check_deadline()
+                # 他の呼び出しが枠を確保した場合にも順番を確認できるよう、短い間隔で確認する
+                await asyncio.sleep(min(self._wait_timeout(wait), LLM_RATE_LIMIT_POLL_SECONDS))
+        finally:
+            with self._cond:
+                self._leave(ticket, started)
+
+    def debit(self, tokens: int):
+        """使用したトークン数を差し引く。"""
+        if self.tokens is None or tokens <= 0:
+            return
+        with self._cond:
+            self.tokens.refill(time.monotonic())
+            self.tokens.level -= tokens
+
+    def pause(self, seconds: float):
+        """429 等を受けた場合に、seconds 秒間は新しい呼び出しを待たせる。"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+            queued = {lane: 0 for lane in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                "rpm": self.requests.rate * 60 if self.requests else None,
+                "tpm": self.tokens.rate * 60 if self.tokens else None,
+                "available_requests": round(self.requests.level, 2) if self.requests else None,
+                "available_tokens": round(self.tokens.level) if self.tokens else None,
+                "paused_seconds": round(max(0.0, self._paused_until - now), 2),
+                "queued": queued,
+                "granted": dict(self._granted),
+            }
+
+
+class LlmRateLimiter:
+    """
+    モデル名から上限（ModelRateLimiter）を選び、プロセス内のすべてのLLM呼び出しで共有するクラス。
+
+    上限はプロセスごとに管理する（複数ワーカーで動かす場合は、ワーカー数で割った値を設定する）。
+    """
+
+    def __init__(self, limits: dict):
+        """
+        Args:
+            limits (dict): 上限の名前（モデル名の前方一致またはプロバイダ名） -> {"rpm": ..., "tpm": ...}。
+        """
+        self.limiters = {
+            name: ModelRateLimiter(name, rpm=limit.get("rpm"), tpm=limit.get("tpm"))
+            for name, limit in limits.items()
+        }
+
+    def limiter_for(self, model_name) -> ModelRateLimiter | None:
+        """モデルに適用する上限。上限が無い場合は None。"""
+        model_name = str(model_name or "").removeprefix("models/")
+        matches = [name for name in self.limiters if model_name.startswith(name)]
+        if matches:
+            return self.limiters[max(matches, key=len)]
+        return self.limiters.get(llm_provider(model_name))
+
+    def acquire(self, model_name):
+        limiter = self.limiter_for(model_name)
+        if limiter is not None:
+            limiter.acquire()
+
+    async def aacquire(self, model_name):
+        limiter = self.limiter_for(model_name)
+        if limiter is not None:
+            await limiter.aacquire()
+
+    def debit(self, model_name, tokens: int):
+        limiter = self.limiter_for(model_name)
+        if limiter is not None:
+            limiter.debit(tokens)
+
+    def pause(self, model_name, seconds: float):
+        limiter = self.limiter_for(model_name)
+        if limiter is not None:
+            limiter.pause(seconds)
+
+    def for_langchain(self, model_name) -> "LangChainRateLimiter":
+        """LangChain のチャットモデル（rate_limiter 引数）に渡すレートリミッタを返す。"""
+        return with_lazy_base(LangChainRateLimiter, "langchain_core.rate_limiters:BaseRateLimiter")(self, model_name)
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+class LangChainRateLimiter:
+    """
+    LangChain のチャットモデルの呼び出しを、LlmRateLimiter の枠・優先度で制限するアダプタ。
+
+    BaseRateLimiter を基底クラスに加えたものを for_langchain() で生成する（langchain_core を起動時に読み込まないため）。
+    """
+
+    def __init__(self, rate_limiter: LlmRateLimiter, model_name: str):
+        self.rate_limiter = rate_limiter
+        self.model_name = model_name
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        limiter = self.rate_limiter.limiter_for(self.model_name)
+        return True if limiter is None else limiter.acquire(blocking=blocking)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        limiter = self.rate_limiter.limiter_for(self.model_name)
+        return True if limiter is None else await limiter.aacquire(blocking=blocking)
+
+
+# アプリケーション全体で共有するレートリミッタ
+llm_rate_limiter = LlmRateLimiter(LLM_RATE_LIMITS)
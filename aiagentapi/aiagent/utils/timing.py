@@ -0,0 +1,188 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager, suppress
+from aiagent.utils.lazy_import import langchain_callback_handler
+from aiagent.utils.usage import token_usage_from_llm_result
+
+
+# 実行中のエージェントに紐づく計測ハンドラ（ツール内部の処理時間を記録するために使用）
+_current_timing = contextvars.ContextVar("current_timing", default=None)
+
+
+class TimingCallbackHandler:
+    """
+    エージェント実行1回分の処理時間を記録するコールバックハンドラ。
+
+    LLM呼び出しごとの所要時間とトークン数、ツール呼び出しごとの所要時間と結果サイズ、
+    ツール内部の処理（timing_span / timed で計測した区間）を記録し、summary() で集計する。
+    リクエスト単位で new_timing_callback() で生成し、AgentExecutor の実行時に config の callbacks として渡す。
+    """
+
+    # 記録処理は軽量なため、非同期実行時もスレッドに逃がさずその場で実行する
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._running = {}
+        self.events = []
+
+    def _start(self, run_id, event_type: str, name: str):
+        with self._lock:
+            self._running[run_id] = (event_type, name, time.perf_counter())
+
+    def _end(self, run_id, **detail):
+        now = time.perf_counter()
+        with self._lock:
+            started = self._running.pop(run_id, None)
+            if started is None:
+                return
+            event_type, name, start = started
+            self.events.append({
+                "type": event_type,
+                "name": name,
+                "start_sec": round(start - self._origin, 4),
+                "duration_sec": round(now - start, 4),
+                **detail
+            })
+
+    def record_span(self, name: str, start: float, end: float, **detail):
+        """ツール内部など、コールバックの対象外の処理区間を記録する"""
+        with self._lock:
+            self.events.append({
+                "type": "span",
+                "name": name,
+                "start_sec": round(start - self._origin, 4),
+                "duration_sec": round(end - start, 4),
+                **detail
+            })
+
+    # --- LLM ---
+    @staticmethod
+    def _model_name(serialized, metadata, kwargs) -> str:
+        params = kwargs.get("invocation_params") or {}
+        return ((metadata or {}).get("ls_model_name") or params.get("model") or params.get("model_name")
+                or (serialized or {}).get("name") or "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "llm", self._model_name(serialized, metadata, kwargs))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "llm", self._model_name(serialized, metadata, kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens, completion_tokens = token_usage_from_llm_result(response)
+        self._end(run_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    # --- ツール ---
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", (serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        content = getattr(output, "content", output)
+        self._end(run_id, result_chars=len(content if isinstance(content, str) else str(content)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def summary(self) -> dict:
+        """
+        記録した内容を集計して返す。
+
+        Returns:
+            dict: total_sec（計測開始からの経過時間）、llm（呼び出し回数・所要時間・トークン数の合計）、
+                tools / spans（名前ごとの呼び出し回数・所要時間の合計）、events（開始順の明細）。
+        """
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["start_sec"])
+        llm = {"calls": 0, "total_sec": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+        tools, spans = {}, {}
+        for event in events:
+            if event["type"] == "llm":
+                llm["calls"] += 1
+                llm["total_sec"] += event["duration_sec"]
+                llm["prompt_tokens"] += event.get("prompt_tokens") or 0
+                llm["completion_tokens"] += event.get("completion_tokens") or 0
+                continue
+            bucket = (tools if event["type"] == "tool" else spans).setdefault(event["name"], {"calls": 0, "total_sec": 0.0})
+            bucket["calls"] += 1
+            bucket["total_sec"] += event["duration_sec"]
+            if "result_chars" in event:
+                bucket["result_chars"] = bucket.get("result_chars", 0) + event["result_chars"]
+        llm["total_sec"] = round(llm["total_sec"], 4)
+        for bucket in list(tools.values()) + list(spans.values()):
+            bucket["total_sec"] = round(bucket["total_sec"], 4)
+        return {
+            "total_sec": round(time.perf_counter() - self._origin, 4),
+            "llm": llm,
+            "tools": tools,
+            "spans": spans,
+            "events": events,
+        }
+
+
+def new_timing_callback() -> TimingCallbackHandler:
+    """エージェント実行1回分の計測ハンドラを生成する"""
+    return langchain_callback_handler(TimingCallbackHandler)()
+
+
+@contextmanager
+def activate_timing(handler: TimingCallbackHandler):
+    """この区間（およびそこから起動したスレッド・タスク）の timing_span を handler に記録する"""
+    token = _current_timing.set(handler)
+    try:
+        yield handler
+    finally:
+        # ジェネレータを別のコンテキストから閉じた場合は復元できないため無視する
+        with suppress(ValueError):
+            _current_timing.reset(token)
+
+
+@contextmanager
+def timing_span(name: str, **detail):
+    """実行中のエージェントの計測ハンドラに処理区間を記録する（エージェント外では何もしない）"""
+    handler = _current_timing.get()
+    if handler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        handler.record_span(name, start, time.perf_counter(), **detail)
+
+
+def timed(name: str, detail=None):
+    """
+    関数の処理時間を timing_span で記録するデコレータ（同期・非同期関数の両方に対応）。
+
+    Args:
+        name (str): 区間名。
+        detail: 関数の引数を受け取り、記録に追加する辞書を返す関数（例: モデル名）。
+    """
+    def decorator(func):
+        def _detail(args, kwargs):
+            try:
+                return detail(*args, **kwargs) if detail else {}
+            except Exception:
+                return {}
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timing_span(name, **_detail(args, kwargs)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timing_span(name, **_detail(args, kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
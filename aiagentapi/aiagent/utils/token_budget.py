@@ -0,0 +1,288 @@
+import functools
+import re
+from aiagent.utils.metrics import LLM_INPUT_TRIMMED_TOKENS_TOTAL
+from aiagent.aiagent.model_registry import (
+    TASK_PROFILES, TASK_GENERAL, estimate_tokens, get_model_spec, is_openai, route_model
+)
+from app.core.config import settings
+from app.core.logger import getlogger
+
+
+# 省略した箇所に挿入する文字列
+OMISSION_MARKER = "（…中略…）"
+# 収まらない段落の先頭部分だけを残す場合の、残りのトークン数の下限
+MIN_PARTIAL_TOKENS = 100
+# 処理の種類ごとの入力のトークン数の上限（INPUT_TOKEN_BUDGET_<TASK>。None の場合は TASK_PROFILES の max_input_tokens）
+INPUT_TOKEN_BUDGETS = {task: getattr(settings, f"INPUT_TOKEN_BUDGET_{task.upper()}") for task in TASK_PROFILES}
+
+# 見出し（"# タイトル"、"#: テーマ_1" 等）
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}[\s:]")
+# 本文ではない定型文（ナビゲーション・フッター・SNS共有・広告等）
+_BOILERPLATE_RE = re.compile(
+    r"cookie|copyright|©|all rights reserved|privacy policy|terms of (use|service)|subscribe|sign in|log in"
+    r"|利用規約|プライバシー|個人情報|著作権|無断転載|シェア|ツイート|関連記事|おすすめ記事|人気記事|ランキング"
+    r"|ログイン|会員登録|メニュー|ページの先頭|トップへ戻る|サイトマップ|お問い合わせ|広告",
+    re.IGNORECASE
+)
+# 定型文とみなす段落の最大文字数（長い段落は本文として扱う）
+_BOILERPLATE_MAX_CHARS = 200
+# マークダウンのリンク・画像
+_LINK_RE = re.compile(r"!?\[[^\]]*\]\([^)]*\)")
+
+# 段落の種類（残す優先順）
+BLOCK_HEADING = "heading"
+BLOCK_BODY = "body"
+BLOCK_BOILERPLATE = "boilerplate"
+
+
+@functools.cache
+def _openai_encoding(model_name: str):
+    """OpenAI モデルのトークナイザ。tiktoken が使えない場合は None（概算で数える）。"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # 語彙ファイルを取得できない（オフライン等）場合
+        print(f"Failed to load tokenizer for '{model_name}': {e}. Falling back to estimated token counts.")
+        return None
+
+
+def count_tokens(text: str, model_name: str | None = None) -> int:
+    """
+    モデルのトークン数を数える。
+
+    OpenAI のモデルは tiktoken で数え、Gemini 等はAPIを呼ばずに estimate_tokens の概算で数える。
+    """
+    text = text or ""
+    encoding = _openai_encoding(model_name) if model_name and is_openai(model_name) else None
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: list, model_name: str | None = None) -> int:
+    """{"role", "content"} のリストのトークン数（ロール等のオーバーヘッドとして1件あたり4トークンを加える）"""
+    return sum(count_tokens(str(m.get("content", "")), model_name) + 4 for m in messages)
+
+
+def truncate_tokens(text: str, max_tokens: int, model_name: str | None = None) -> str:
+    """text の先頭から max_tokens トークンに収まる部分を返す"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _openai_encoding(model_name) if model_name and is_openai(model_name) else None
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    # estimate_tokens と同じ重み（ASCII は 1/4、それ以外は 1）で数える
+    budget = float(max_tokens)
+    for end, c in enumerate(text):
+        budget -= 0.25 if ord(c) < 128 else 1.0
+        if budget < 0:
+            return text[:end]
+    return text
+
+
+def input_budget(model_name: str, task: str = TASK_GENERAL, reserved_tokens: int = 0) -> int:
+    """
+    処理の種類ごとの、入力（本文）に使えるトークン数。
+
+    TASK_PROFILES の max_input_tokens（環境変数 INPUT_TOKEN_BUDGET_<TASK> で上書き可）と、
+    モデルのコンテキスト長から出力・プロンプトの分を除いた値の小さい方。
+
+    Args:
+        model_name (str): 使用するモデル名。
+        task (str): 処理の種類（model_registry.TASK_PROFILES のキー）。
+        reserved_tokens (int): 本文以外（指示文・システムプロンプト等）のトークン数。
+    """
+    profile = TASK_PROFILES.get(task, TASK_PROFILES[TASK_GENERAL])
+    budget = INPUT_TOKEN_BUDGETS.get(task)
+    if budget is None:
+        budget = profile["max_input_tokens"]
+    context_window = get_model_spec(model_name).context_window
+    if context_window > 0:
+        budget = min(budget, context_window - profile["output_tokens"] - reserved_tokens)
+    return max(0, budget)
+
+
+def _split_blocks(text: str) -> list[dict]:
+    """テキストを見出し・段落の単位に分け、種類・所属する見出し・見出し内での順番を付ける"""
+    blocks = []
+    section = ""
+    rank = 0
+    paragraph = []
+
+    def flush():
+        nonlocal rank
+        if not paragraph:
+            return
+        body = "\n".join(paragraph)
+        paragraph.clear()
+        kind = _classify(body)
+        blocks.append({"text": body, "kind": kind, "section": section, "rank": rank})
+        # 定型文は見出し内の順番に数えない
+        if kind == BLOCK_BODY:
+            rank += 1
+
+    for line in text.splitlines():
+        if _HEADING_RE.match(line):
+            flush()
+            section = line.strip().lstrip("#: ").strip()
+            rank = 0
+            blocks.append({"text": line, "kind": BLOCK_HEADING, "section": section, "rank": -1})
+        elif line.strip():
+            paragraph.append(line)
+        else:
+            flush()
+    flush()
+    for index, block in enumerate(blocks):
+        block["index"] = index
+    return blocks
+
+
+def _classify(paragraph: str) -> str:
+    """段落が定型文（ナビゲーション・フッター・リンクの羅列等）かどうかを判定する"""
+    stripped = paragraph.strip()
+    if len(stripped) <= _BOILERPLATE_MAX_CHARS and _BOILERPLATE_RE.search(stripped):
+        return BLOCK_BOILERPLATE
+    # リンク・画像が大半を占める段落
+    without_links = _LINK_RE.sub("", stripped)
+    if stripped and len(re.sub(r"[\s*\-|]", "", without_links)) < len(stripped) * 0.2:
+        return BLOCK_BOILERPLATE
+    return BLOCK_BODY
+
+
+def _priority(block: dict) -> tuple:
+    """残す優先順: 見出し、各見出しの先頭の段落から順に本文、最後に定型文"""
+    if block["kind"] == BLOCK_HEADING:
+        return (0, 0, block["index"])
+    if block["kind"] == BLOCK_BODY:
+        return (1, block["rank"], block["index"])
+    return (2, 0, block["index"])
+
+
+def _assemble(blocks: list[dict], kept: dict) -> str:
+    """残した段落を元の順に連結し、省略した箇所に OMISSION_MARKER を入れる"""
+    parts = []
+    omitted = False
+    for block in blocks:
+        text = kept.get(block["index"])
+        if text is None:
+            omitted = True
+            continue
+        if omitted and parts:
+            parts.append(OMISSION_MARKER)
+        omitted = False
+        parts.append(text)
+    if omitted:
+        parts.append(OMISSION_MARKER)
+    return "\n\n".join(parts)
+
+
+def fit_to_budget(text: str, model_name: str, max_tokens: int) -> tuple[str, dict]:
+    """
+    text を max_tokens トークンに収まるよう、優先度の低い段落から省略する。
+
+    見出しを最優先で残し、次に各見出しの先頭の段落から順に本文を残す（どの記事・章も冒頭は残る）。
+    ナビゲーション・フッター等の定型文は最後に回す。収まらない段落は、残りが十分あれば先頭部分だけを残す。
+
+    Args:
+        text (str): 入力テキスト（マークダウン等）。
+        model_name (str): トークン数を数えるモデル名。
+        max_tokens (int): トークン数の上限。
+
+    Returns:
+        tuple[str, dict]: 収めたテキストと、省略の内容
+            （budget / original_tokens / tokens / dropped: [{"section", "kind", "tokens", "preview"}]）。
+    """
+    original_tokens = count_tokens(text, model_name)
+    report = {"model": model_name, "budget": max_tokens, "original_tokens": original_tokens,
+              "tokens": original_tokens, "dropped": []}
+    if original_tokens <= max_tokens:
+        return text, report
+
+    blocks = _split_blocks(text)
+    for block in blocks:
+        block["tokens"] = count_tokens(block["text"], model_name)
+    # 段落の区切りと省略の印の分を見込んでおく
+    overhead = count_tokens(f"\n\n{OMISSION_MARKER}\n\n", model_name)
+    remaining = max_tokens
+    kept = {}
+    for block in sorted(blocks, key=_priority):
+        cost = block["tokens"] + overhead
+        if cost <= remaining:
+            kept[block["index"]] = block["text"]
+            remaining -= cost
+        elif block["kind"] != BLOCK_BOILERPLATE and remaining - overhead >= MIN_PARTIAL_TOKENS:
+            kept[block["index"]] = truncate_tokens(block["text"], remaining - overhead, model_name) + "…"
+            remaining = 0
+
+    result = _assemble(blocks, kept)
+    # 概算の誤差で超えた場合は、優先度の低いものから外す
+    for block in sorted(blocks, key=_priority, reverse=True):
+        if count_tokens(result, model_name) <= max_tokens:
+            break
+        if kept.pop(block["index"], None) is not None:
+            result = _assemble(blocks, kept)
+
+    for block in blocks:
+        kept_text = kept.get(block["index"])
+        if kept_text == block["text"]:
+            continue
+        report["dropped"].append({
+            "section": block["section"],
+            "kind": block["kind"] if kept_text is None else f"{block['kind']} (partial)",
+            "tokens": block["tokens"] - (count_tokens(kept_text, model_name) if kept_text else 0),
+            "preview": block["text"][:40],
+        })
+    report["tokens"] = count_tokens(result, model_name)
+    return result, report
+
+
+def budget_input(text: str, model_name: str, task: str = TASK_GENERAL, reserved_tokens: int = 0) -> str:
+    """
+    LLMに渡す前に、入力（本文）を処理の種類ごとの上限に収める。
+
+    省略した場合は内容をログに出力し、省略したトークン数をメトリクスに記録する。
+
+    Args:
+        text (str): 入力テキスト。
+        model_name (str): 使用するモデル名。
+        task (str): 処理の種類（model_registry.TASK_PROFILES のキー）。
+        reserved_tokens (int): 本文以外（指示文・システムプロンプト等）のトークン数。
+
+    Returns:
+        str: 上限に収めたテキスト（収まっている場合はそのまま）。
+    """
+    budget = input_budget(model_name, task, reserved_tokens)
+    fitted, report = fit_to_budget(text or "", model_name, budget)
+    if report["dropped"]:
+        dropped_tokens = report["original_tokens"] - report["tokens"]
+        LLM_INPUT_TRIMMED_TOKENS_TOTAL.labels(task=task).inc(max(0, dropped_tokens))
+        sections = sorted({d["section"] for d in report["dropped"] if d["section"]})
+        getlogger().info("Input trimmed for task=%s model=%s: %s -> %s tokens (budget %s), dropped %d blocks%s",
+                         task, model_name, report["original_tokens"], report["tokens"], budget, len(report["dropped"]),
+                         f" in sections: {', '.join(sections[:10])}" if sections else "")
+    return fitted
+
+
+def route_and_budget(task: str, input_info: str, model_name: str | None, build_messages) -> tuple[str, list]:
+    """
+    処理に使うモデルを決め、入力を上限に収めたメッセージを組み立てる。
+
+    Args:
+        task (str): 処理の種類（model_registry.TASK_PROFILES のキー）。
+        input_info (str): 指示文に埋め込む入力テキスト。
+        model_name (str | None): 呼び出し元が指定したモデル名（省略時は route_model で決める）。
+        build_messages (callable): 入力テキストからメッセージのリストを組み立てる関数。
+
+    Returns:
+        tuple[str, list]: 決定したモデル名と、メッセージのリスト。
+    """
+    model_name = route_model(task, input_info, model_name)
+    reserved_tokens = count_message_tokens(build_messages(""), model_name)
+    return model_name, build_messages(budget_input(input_info, model_name, task, reserved_tokens))
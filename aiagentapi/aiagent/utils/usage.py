@@ -0,0 +1,338 @@
+import contextvars
+import functools
+import threading
+from contextlib import contextmanager, suppress
+from datetime import date
+from aiagent.utils.metrics import LLM_TOKENS_TOTAL, LLM_COST_USD_TOTAL, LLM_PROMPT_CACHED_RATIO, llm_provider
+from aiagent.utils.rate_limit import llm_rate_limiter
+from aiagent.utils.lazy_import import langchain_callback_handler
+from app.core.config import settings
+
+
+# モデルごとの単価（USD / 100万トークン）: (入力, 出力)
+# モデル名の前方一致で検索し、最も長く一致したものを使用する
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "o1-mini": (1.10, 4.40),
+    "o1": (15.00, 60.00),
+    "o3-mini": (1.10, 4.40),
+    "o3": (2.00, 8.00),
+    "o4-mini": (1.10, 4.40),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+# 単価の上書き・追加（例: '{"gpt-4o": [2.5, 10.0]}'）
+MODEL_PRICES.update({k: tuple(v) for k, v in settings.LLM_PRICE_OVERRIDES.items()})
+# プロバイダ側でキャッシュされた入力トークンの単価（入力単価に対する割合）
+LLM_CACHED_INPUT_PRICE_RATIO = settings.LLM_CACHED_INPUT_PRICE_RATIO
+
+# 1リクエストあたりのトークン上限の既定値（0 の場合は無制限）
+DEFAULT_TOKEN_BUDGET = settings.AGENT_DEFAULT_TOKEN_BUDGET
+
+# 実行中のエージェントの使用量トラッカーと、実行中のツール名
+_current_usage = contextvars.ContextVar("current_usage", default=None)
+_current_tool = contextvars.ContextVar("current_tool", default=None)
+
+
+def normalize_model_name(model_name) -> str:
+    """'models/gemini-1.5-flash' のような表記をモデル名に揃える"""
+    return str(model_name or "unknown").removeprefix("models/")
+
+
+def estimate_cost(model_name: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """単価表からコスト（USD）を計算する。単価が不明なモデルは 0。cached_tokens は prompt_tokens の内数。"""
+    matches = [key for key in MODEL_PRICES if model_name.startswith(key)]
+    if not matches:
+        return 0.0
+    input_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    cached_tokens = min(cached_tokens, prompt_tokens)
+    input_cost = (prompt_tokens - cached_tokens) * input_price + cached_tokens * input_price * LLM_CACHED_INPUT_PRICE_RATIO
+    return (input_cost + completion_tokens * output_price) / 1_000_000
+
+
+def token_usage_from_llm_result(response) -> tuple[int | None, int | None]:
+    """LangChain の LLMResult から (プロンプトトークン数, 生成トークン数) を取り出す。取得できない場合は None。"""
+    prompt_tokens = completion_tokens = None
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens = (prompt_tokens or 0) + usage.get("input_tokens", 0)
+                completion_tokens = (completion_tokens or 0) + usage.get("output_tokens", 0)
+    if prompt_tokens is None:
+        # usage_metadata に対応していないモデルは llm_output に入っていることがある
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+    return prompt_tokens, completion_tokens
+
+
+def cached_tokens_from_llm_result(response) -> int:
+    """LangChain の LLMResult から、プロバイダ側でキャッシュされた入力トークン数を取り出す。"""
+    cached_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            cached_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    return cached_tokens
+
+
+def cached_tokens_from_response(response) -> int:
+    """OpenAI / Gemini SDK のレスポンスから、プロバイダ側でキャッシュされた入力トークン数を取り出す。"""
+    usage = getattr(response, "usage", None)  # OpenAI
+    if usage is not None:
+        return getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+    usage = getattr(response, "usage_metadata", None)  # Gemini
+    if usage is not None:
+        return getattr(usage, "cached_content_token_count", 0) or 0
+    return 0
+
+
+def token_usage_from_response(response) -> tuple[int, int] | None:
+    """OpenAI / Gemini SDK のレスポンスから (プロンプトトークン数, 生成トークン数) を取り出す。"""
+    usage = getattr(response, "usage", None)  # OpenAI
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+    usage = getattr(response, "usage_metadata", None)  # Gemini
+    if usage is not None:
+        return getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0
+    return None
+
+
+def _empty_totals() -> dict:
+    return {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost_usd": 0.0}
+
+
+def _add_to(totals: dict, record: dict):
+    totals["calls"] += 1
+    totals["prompt_tokens"] += record["prompt_tokens"]
+    totals["cached_tokens"] += record.get("cached_tokens", 0)
+    totals["completion_tokens"] += record["completion_tokens"]
+    totals["total_tokens"] += record["prompt_tokens"] + record["completion_tokens"]
+    totals["cost_usd"] += record["cost_usd"]
+
+
+def _rounded(totals: dict) -> dict:
+    cached_ratio = totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+    return {**totals, "cached_ratio": round(cached_ratio, 4), "cost_usd": round(totals["cost_usd"], 6)}
+
+
+class UsageTracker:
+    """
+    エージェント実行1回分のトークン使用量とコストを集計するクラス。
+
+    max_tokens を指定した場合、合計トークン数が上限に達したかを exceeded() で確認できる
+    （エージェントはステップの区切りごとに確認し、上限に達した時点で実行を打ち切る）。
+    """
+
+    def __init__(self, max_tokens: int | None = None):
+        """
+        Args:
+            max_tokens (int | None): 1回の実行で使用できるトークン数の上限。None の場合は無制限。
+        """
+        self.max_tokens = max_tokens or None
+        self._lock = threading.Lock()
+        self.records = []
+
+    def add(self, record: dict):
+        with self._lock:
+            self.records.append(record)
+
+    @property
+    def total_tokens(self) -> int:
+        with self._lock:
+            return sum(r["prompt_tokens"] + r["completion_tokens"] for r in self.records)
+
+    def exceeded(self) -> bool:
+        return self.max_tokens is not None and self.total_tokens >= self.max_tokens
+
+    def summary(self) -> dict:
+        """合計と、モデル別・呼び出し元（agent / ツール名）別の内訳を返す。"""
+        with self._lock:
+            records = list(self.records)
+        total, by_model, by_source = _empty_totals(), {}, {}
+        for record in records:
+            _add_to(total, record)
+            _add_to(by_model.setdefault(record["model"], _empty_totals()), record)
+            _add_to(by_source.setdefault(record["source"], _empty_totals()), record)
+        return {
+            **_rounded(total),
+            "max_tokens": self.max_tokens,
+            "by_model": {k: _rounded(v) for k, v in by_model.items()},
+            "by_tool": {k: _rounded(v) for k, v in by_source.items()},
+        }
+
+
+class DailyUsageAggregator:
+    """
+    日別・モデル別・呼び出し元別のトークン使用量とコストをプロセス内で集計するクラス。
+    保持する日数に上限を設け、古い日から破棄する。
+    """
+
+    def __init__(self, max_days: int = 31):
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._days = {}
+
+    def add(self, record: dict):
+        day = date.today().isoformat()
+        with self._lock:
+            stats = self._days.get(day)
+            if stats is None:
+                stats = self._days[day] = {"total": _empty_totals(), "by_model": {}, "by_tool": {}}
+                for old_day in sorted(self._days)[:-self.max_days]:
+                    del self._days[old_day]
+            _add_to(stats["total"], record)
+            _add_to(stats["by_model"].setdefault(record["model"], _empty_totals()), record)
+            _add_to(stats["by_tool"].setdefault(record["source"], _empty_totals()), record)
+
+    def snapshot(self, day: str | None = None) -> dict:
+        """指定日（YYYY-MM-DD、省略時は当日）の集計を返す。"""
+        day = day or date.today().isoformat()
+        with self._lock:
+            stats = self._days.get(day)
+            if stats is None:
+                return {"date": day, **_rounded(_empty_totals()), "by_model": {}, "by_tool": {}}
+            return {
+                "date": day,
+                **_rounded(stats["total"]),
+                "by_model": {k: _rounded(v) for k, v in stats["by_model"].items()},
+                "by_tool": {k: _rounded(v) for k, v in stats["by_tool"].items()},
+            }
+
+    def days(self) -> list[str]:
+        with self._lock:
+            return sorted(self._days)
+
+
+# アプリケーション全体で共有する日別集計
+usage_aggregator = DailyUsageAggregator()
+
+
+def record_usage(model_name, prompt_tokens: int, completion_tokens: int, source: str | None = None,
+                 cached_tokens: int = 0) -> dict:
+    """
+    LLM呼び出し1回分のトークン数を記録する。
+
+    実行中のエージェントがあればそのトラッカーに、あわせて日別集計とメトリクス、レート制限の枠に反映する。
+
+    Args:
+        model_name: モデル名。
+        prompt_tokens (int): 入力トークン数。
+        completion_tokens (int): 出力トークン数。
+        source (str | None): 呼び出し元。省略時は実行中のツール名（ツール外では "direct"）。
+        cached_tokens (int): 入力トークンのうち、プロバイダ側でキャッシュされていたトークン数。
+
+    Returns:
+        dict: 記録した内容。
+    """
+    model_name = normalize_model_name(model_name)
+    prompt_tokens, completion_tokens = int(prompt_tokens or 0), int(completion_tokens or 0)
+    cached_tokens = min(int(cached_tokens or 0), prompt_tokens)
+    record = {
+        "model": model_name,
+        "source": source or _current_tool.get() or "direct",
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": estimate_cost(model_name, prompt_tokens, completion_tokens, cached_tokens),
+    }
+    tracker = _current_usage.get()
+    if tracker is not None:
+        tracker.add(record)
+    usage_aggregator.add(record)
+    # トークン数の上限（TPM）は使用量が確定した時点で差し引く
+    llm_rate_limiter.debit(model_name, prompt_tokens + completion_tokens)
+
+    provider = llm_provider(model_name)
+    LLM_TOKENS_TOTAL.labels(provider=provider, model=model_name, type="prompt").inc(prompt_tokens)
+    LLM_TOKENS_TOTAL.labels(provider=provider, model=model_name, type="completion").inc(completion_tokens)
+    LLM_TOKENS_TOTAL.labels(provider=provider, model=model_name, type="cached").inc(cached_tokens)
+    if prompt_tokens:
+        LLM_PROMPT_CACHED_RATIO.labels(provider=provider, model=model_name).observe(cached_tokens / prompt_tokens)
+    LLM_COST_USD_TOTAL.labels(provider=provider, model=model_name).inc(record["cost_usd"])
+    return record
+
+
+def record_response_usage(model_name, response, source: str | None = None):
+    """OpenAI / Gemini SDK のレスポンスに含まれる使用量を記録する（取得できない場合は何もしない）"""
+    try:
+        usage = token_usage_from_response(response)
+        if usage is not None:
+            record_usage(model_name, usage[0], usage[1], source, cached_tokens_from_response(response))
+    except Exception as e:
+        # 集計の失敗で本処理を止めない
+        print(f"トークン使用量の記録に失敗しました: {e}")
+
+
+@contextmanager
+def activate_usage(tracker: UsageTracker):
+    """この区間（およびそこから起動したスレッド・タスク）のLLM呼び出しを tracker に記録する"""
+    token = _current_usage.set(tracker)
+    try:
+        yield tracker
+    finally:
+        with suppress(ValueError):
+            _current_usage.reset(token)
+
+
+class UsageCallbackHandler:
+    """
+    エージェント自身のLLM呼び出しのトークン数を記録し、実行中のツール名を
+    ツール内部のLLM呼び出し（execLlmApi 等）の呼び出し元として設定するコールバックハンドラ。
+    全リクエストで共有する（get_usage_callback() で取得する）。
+    """
+
+    # ツール名をツールの実行と同じコンテキストに設定するため、その場で実行する
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _start_llm(self, run_id, metadata, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model_name = (metadata or {}).get("ls_model_name") or params.get("model") or params.get("model_name")
+        with self._lock:
+            self._models[run_id] = model_name
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start_llm(run_id, metadata, kwargs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start_llm(run_id, metadata, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            model_name = self._models.pop(run_id, None)
+        prompt_tokens, completion_tokens = token_usage_from_llm_result(response)
+        if prompt_tokens is None and completion_tokens is None:
+            return
+        model_name = model_name or (response.llm_output or {}).get("model_name")
+        record_usage(model_name, prompt_tokens, completion_tokens, source="agent",
+                     cached_tokens=cached_tokens_from_llm_result(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._models.pop(run_id, None)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        _current_tool.set((serialized or {}).get("name") or kwargs.get("name"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        _current_tool.set(None)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        _current_tool.set(None)
+
+
+@functools.cache
+def get_usage_callback():
+    """アプリケーション全体で共有するハンドラを返す"""
+    return langchain_callback_handler(UsageCallbackHandler)()
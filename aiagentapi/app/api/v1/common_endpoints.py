@@ -1,10 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from aiagent.aiagent.StandardAiAgent import StandardAiAgent
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from aiagent.aiagent.executor_pool import executor_pool
+from aiagent.aiagent.answer_cache import answer_cache
+from aiagent.utils.usage import usage_aggregator, UsageTracker, activate_usage
+from aiagent.utils.deadline import Deadline, DeadlineExceeded, activate_deadline
+from aiagent.utils.lazy_import import import_object
+from aiagent.utils.llm_cache import llm_cache
+from aiagent.utils.rate_limit import llm_rate_limiter
+from aiagent.utils.hedging import hedger
 from app.schemas.standardAiAgent import AtandardAiAgentRequest, AtandardAiAgentResponse
-from datetime import datetime
+from app.schemas.script import ScriptGenerateRequest
+from app.utils.sse import format_sse
+from app.utils.agent_input import build_agent_input
+from app.utils.disconnect import ClientDisconnected, run_until_disconnected
+from app.services.session_store import session_store
+from app.services.agent_modes import get_agent_class, resolve_agent_model, select_agent_tools
+from app.core.logger import getlogger
 
 router = APIRouter()
 
+# 台本の種類と、ストリーミングで生成する関数（ツールのモジュールは初めて使う時点で読み込む）
+SCRIPT_STREAM_GENERATORS = {
+    "podcast": "aiagent.tool.generate_podcast_script:agenerate_podcast_script_stream",
+    "melmaga": "aiagent.tool.generate_melmaga_script:agenerate_melmaga_script_stream",
+}
+
 
 @router.get("/",
             summary="Hello World",
@@ -16,22 +37,50 @@ def home_hello_world():
 @router.post("/aiagent",
              summary="AIエージェントを実行します",
              description="AIエージェントを実行します")
-def aiagent(request: AtandardAiAgentRequest):
+async def aiagent(request: AtandardAiAgentRequest, background_tasks: BackgroundTasks, http_request: Request):
     try:
-        agent_executor = StandardAiAgent(
-            model_name=request.model_name,
-            max_iterations=request.max_iterations)
-        _input = f"""
-        ### メタ情報:
-        - 現在の時刻は「{datetime.now()}」です。
-
-        ### 入力情報
-        {request.user_input}
-        """
-        result = agent_executor.invoke(_input, request.thought_process_Flg)
-        _response = {"result": result}
+        session = session_store.get_or_create(request.session_id) if request.session_id else None
+        _context = session.build_context() if session else None
+        _input = build_agent_input(request.user_input, _context)
+        # プールから AgentExecutor を借り受けて実行する（リクエスト毎の再構築を避ける）
+        agent_cls = get_agent_class(request.agent_mode)
+        async with executor_pool.alease(
+                agent_cls,
+                model_name=resolve_agent_model(request.model_name, _input, request.model_overrides),
+                max_iterations=request.max_iterations,
+                # プロンプトに載せるツールを入力に関連するものに絞る
+                tools=select_agent_tools(agent_cls, request.user_input, request.tool_top_k)) as agent_executor:
+            agent_executor.set_model_overrides(request.model_overrides)
+            agent_executor.set_token_budget(request.max_tokens)
+            agent_executor.set_deadline(request.timeout_seconds)
+            if request.use_cache and not _context:
+                # 会話の文脈に依存しない質問のみ回答キャッシュを利用する
+                agent_executor.use_answer_cache(request.user_input)
+            # クライアントが切断した場合はエージェントの実行を中断する
+            result = await run_until_disconnected(
+                http_request,
+                agent_executor.ainvoke(_input, request.thought_process_Flg),
+                on_disconnect=agent_executor.cancel
+            )
+        _response = {
+            "result": result,
+            "usage": agent_executor.usage_summary(),
+            "stopped_reason": agent_executor.stopped_reason,
+            "cached": agent_executor.cache_hit
+        }
+        if request.timing_Flg:
+            _response["timing"] = agent_executor.timing_summary()
+        if session:
+            session_store.append_turn(session.session_id, request.user_input, str(agent_executor.final_answer))
+            # 古い発話の要約はレスポンス返却後に行う
+            background_tasks.add_task(session_store.compact, session.session_id)
+            _response["session_id"] = session.session_id
         return AtandardAiAgentResponse(**_response)
 
+    except ClientDisconnected:
+        # クライアント切断時は応答を返す相手がいないため、そのまま終了する
+        # （キャンセル時は run_until_disconnected がエージェントを中断した上で CancelledError をそのまま伝播させる）
+        raise HTTPException(status_code=499, detail="Client closed request.")
     # StandardAiAgent.invoke が投げる可能性のあるカスタム例外をキャッチ
     # except AgentExecutionError as e: # 例：カスタム例外
     #     raise HTTPException(status_code=500, detail=f"AI Agent execution failed: {e}")
@@ -39,4 +88,157 @@ def aiagent(request: AtandardAiAgentRequest):
         # 予期せぬエラー全般をキャッチ
         # 本番環境では、より詳細なログ記録やエラー報告を行うべき
         print(f"An unexpected error occurred: {e}") # ログ出力
-        raise HTTPException(status_code=500, detail="An internal server error occurred in the agent.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An internal server error occurred in the agent.")
+
+
+@router.post("/aiagent/stream",
+             summary="AIエージェントを実行し、進捗をSSEで返します",
+             description="AIエージェントを実行し、中間ステップ(action/step)と最終回答のトークン(token)、"
+                         "最終結果(final)を Server-Sent Events で逐次返します。")
+async def aiagent_stream(request: AtandardAiAgentRequest):
+    session = session_store.get_or_create(request.session_id) if request.session_id else None
+    _input = build_agent_input(request.user_input, session.build_context() if session else None)
+
+    async def event_generator():
+        try:
+            agent_cls = get_agent_class(request.agent_mode)
+            async with executor_pool.alease(
+                    agent_cls,
+                    model_name=resolve_agent_model(request.model_name, _input, request.model_overrides),
+                    max_iterations=request.max_iterations,
+                    # プロンプトに載せるツールを入力に関連するものに絞る
+                    tools=select_agent_tools(agent_cls, request.user_input, request.tool_top_k)) as agent_executor:
+                agent_executor.set_model_overrides(request.model_overrides)
+                agent_executor.set_token_budget(request.max_tokens)
+                agent_executor.set_deadline(request.timeout_seconds)
+                # 接続直後に開始イベントを送り、クライアントが即座に応答を受け取れるようにする
+                yield format_sse("start", {
+                    "exeid": str(agent_executor.exeid),
+                    "session_id": session.session_id if session else None
+                })
+                async for event in agent_executor.astream(_input, request.thought_process_Flg):
+                    if event["event"] == "final":
+                        if session:
+                            session_store.append_turn(session.session_id, request.user_input, str(agent_executor.final_answer))
+                        event["data"]["usage"] = agent_executor.usage_summary()
+                        event["data"]["stopped_reason"] = agent_executor.stopped_reason
+                        if request.timing_Flg:
+                            event["data"]["timing"] = agent_executor.timing_summary()
+                    yield format_sse(event["event"], event["data"])
+        except Exception as e:
+            getlogger().exception("An unexpected error occurred during agent streaming")
+            yield format_sse("error", {"message": "An internal server error occurred in the agent."})
+
+    # クライアントが切断すると StreamingResponse が event_generator を閉じ、エージェントの実行も停止する
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        # プロキシ(nginx)でのバッファリングを無効化して即時に送出する
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # 古い発話の要約はストリーム終了後に行う
+        background=BackgroundTask(session_store.compact, session.session_id) if session else None
+    )
+
+
+@router.post("/scripts/stream",
+             summary="台本を生成し、SSEで逐次返します",
+             description="ポッドキャストの台本またはメルマガの本文を生成し、LLMが出力したテキストの差分(delta)を"
+                         "Server-Sent Events で逐次返します。生成完了時に文字数とトークン使用量(end)を返します。")
+async def scripts_stream(request: ScriptGenerateRequest):
+
+    async def event_generator():
+        tracker = UsageTracker()
+        length = 0
+        deadline = Deadline(request.timeout_seconds) if request.timeout_seconds else None
+        try:
+            with activate_usage(tracker), activate_deadline(deadline):
+                generate_stream = import_object(SCRIPT_STREAM_GENERATORS[request.kind])
+                yield format_sse("start", {"kind": request.kind})
+                async for delta in generate_stream(request.input_info, request.model_name):
+                    length += len(delta)
+                    yield format_sse("delta", {"text": delta})
+            yield format_sse("end", {"length": length, "usage": tracker.summary()})
+        except DeadlineExceeded as e:
+            yield format_sse("error", {"message": f"Script generation stopped: {e.reason}", "length": length})
+        except Exception as e:
+            getlogger().exception("An unexpected error occurred during script streaming")
+            yield format_sse("error", {"message": "An internal server error occurred while generating the script."})
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        # プロキシ(nginx)でのバッファリングを無効化して即時に送出する
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/sessions/{session_id}",
+               summary="会話セッションを削除します",
+               description="サーバー側で保持している会話履歴を削除します。")
+def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.")
+    return {"session_id": session_id, "deleted": True}
+
+
+@router.get("/usage",
+            summary="トークン使用量と推定コストの日別集計を返します",
+            description="指定日（YYYY-MM-DD、省略時は当日）のトークン使用量と推定コストを、モデル別・ツール別に返します。"
+                        "集計はプロセス内に保持しているため、再起動するとリセットされます。")
+def usage(date: str | None = None):
+    return {**usage_aggregator.snapshot(date), "available_dates": usage_aggregator.days()}
+
+
+@router.get("/aiagent/pool/stats",
+            summary="AgentExecutorプールの統計を返します",
+            description="AgentExecutorプールのヒット/ミス数と構築時間の統計を返します。")
+def aiagent_pool_stats():
+    return executor_pool.stats()
+
+
+@router.get("/aiagent/cache/stats",
+            summary="回答キャッシュの統計を返します",
+            description="回答キャッシュのヒット/ミス数と保持件数を返します。")
+def aiagent_cache_stats():
+    return answer_cache.stats()
+
+
+@router.delete("/aiagent/cache",
+               summary="回答キャッシュを削除します",
+               description="保存している回答キャッシュをすべて削除します。")
+def clear_aiagent_cache():
+    answer_cache.clear()
+    return {"cleared": True}
+
+
+@router.get("/llm/cache/stats",
+            summary="LLM応答キャッシュの統計を返します",
+            description="LLM応答キャッシュのヒット/ミス数（このワーカー分）と保存件数・サイズを返します。"
+                        "LLM_CACHE_DB_PATH を設定した場合のみ有効です。")
+def llm_cache_stats():
+    return llm_cache.stats()
+
+
+@router.delete("/llm/cache",
+               summary="LLM応答キャッシュを削除します",
+               description="保存しているLLM応答キャッシュをすべて削除します。")
+def clear_llm_cache():
+    llm_cache.clear()
+    return {"cleared": True}
+
+
+@router.get("/llm/rate_limits",
+            summary="LLM呼び出しのレート制限の状態を返します",
+            description="LLM_RATE_LIMITS で設定した上限ごとに、残りの枠と優先度別の待ち数・実行数を返します。"
+                        "状態はワーカープロセスごとに管理しています。")
+def llm_rate_limits():
+    return llm_rate_limiter.stats()
+
+
+@router.get("/llm/hedging/stats",
+            summary="LLM呼び出しのヘッジの統計を返します",
+            description="モデルごとに、予備のリクエストを送った割合(hedge_rate)と予備のモデルが先に応答した割合"
+                        "(backup_win_rate)、フェイルオーバー数、予備のリクエストを送るまでの現在の待ち時間を返します。"
+                        "LLM_HEDGE_ENABLED=true の場合のみ有効です。")
+def llm_hedging_stats():
+    return hedger.stats()
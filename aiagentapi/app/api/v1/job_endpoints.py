@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException
+from app.schemas.standardAiAgent import AtandardAiAgentRequest
+from app.schemas.job import JobSubmitResponse, JobStatusResponse, JobResultResponse
+from app.services.job_service import job_manager
+from app.db.job_store import FINISHED_STATUSES
+
+router = APIRouter()
+
+
+def _get_job_or_404(job_id: str) -> dict:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job
+
+
+@router.post("/jobs",
+             status_code=202,
+             response_model=JobSubmitResponse,
+             summary="AIエージェントの実行ジョブを登録します",
+             description="AIエージェントの実行をバックグラウンドジョブとして登録し、ジョブIDを即座に返します。")
+def submit_job(request: AtandardAiAgentRequest):
+    job_id = job_manager.submit(request.model_dump())
+    return JobSubmitResponse(job_id=job_id, status=job_manager.get(job_id)["status"])
+
+
+@router.get("/jobs/{job_id}",
+            response_model=JobStatusResponse,
+            summary="ジョブの状態を返します",
+            description="ジョブの状態と途中経過（中間ステップ）を返します。")
+def get_job(job_id: str):
+    job = _get_job_or_404(job_id)
+    return JobStatusResponse(**job)
+
+
+@router.get("/jobs/{job_id}/result",
+            response_model=JobResultResponse,
+            summary="ジョブの結果を返します",
+            description="終了したジョブの結果を返します。未終了の場合は409を返します。")
+def get_job_result(job_id: str):
+    job = _get_job_or_404(job_id)
+    if job["status"] not in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is still {job['status']}.")
+    return JobResultResponse(job_id=job["job_id"], status=job["status"], result=job["result"], error=job["error"])
+
+
+@router.post("/jobs/{job_id}/cancel",
+             response_model=JobStatusResponse,
+             summary="ジョブをキャンセルします",
+             description="待機中のジョブは即座に、実行中のジョブは次のLLM・ツール呼び出しの前でキャンセルします。")
+def cancel_job(job_id: str):
+    _get_job_or_404(job_id)
+    return JobStatusResponse(**job_manager.cancel(job_id))
@@ -9,6 +9,92 @@ class Settings(BaseSettings):
     CONFIG_TEST: str = Field(default="sss", env="CONFIG_TEST")
     LOG_DIR: str = Field(default="./", env="LOG_DIR")
     LOG_LEVEL: str = Field(default="INFO", env="LOG_LEVEL")
+    JOB_DB_PATH: str = Field(default="./db/jobs.sqlite3", env="JOB_DB_PATH")
+    JOB_MAX_WORKERS: int = Field(default=2, env="JOB_MAX_WORKERS")
+    WARMUP_ENABLED: bool = Field(default=True, env="WARMUP_ENABLED")
+    WARMUP_RETRY_INTERVAL_SECONDS: float = Field(default=30.0, env="WARMUP_RETRY_INTERVAL_SECONDS")
+    # プロンプト（aiagent.prompts.registry）
+    PROMPT_CACHE_DIR: str = Field(default="./prompt_cache", env="PROMPT_CACHE_DIR")
+    REACT_PROMPT_NAME: str = Field(default="react", env="REACT_PROMPT_NAME")
+    REACT_PROMPT_VERSION: str = Field(default="latest", env="REACT_PROMPT_VERSION")
+    # エージェントのストリーミング（aiagent.aiagent.base）
+    STREAM_OBSERVATION_MAX_CHARS: int = Field(default=500, env="STREAM_OBSERVATION_MAX_CHARS")
+    # 会話セッション（app.services.session_store）
+    SESSION_MAX_SESSIONS: int = Field(default=1000, env="SESSION_MAX_SESSIONS")
+    SESSION_TOKEN_BUDGET: int = Field(default=2000, env="SESSION_TOKEN_BUDGET")
+    SESSION_KEEP_RECENT_TURNS: int = Field(default=4, env="SESSION_KEEP_RECENT_TURNS")
+    SESSION_SUMMARY_MODEL: str = Field(default="", env="SESSION_SUMMARY_MODEL")
+    # ツール呼び出しエージェント（aiagent.aiagent.ParallelToolAiAgent）
+    TOOL_CALLING_PROMPT_NAME: str = Field(default="tool_calling_ja", env="TOOL_CALLING_PROMPT_NAME")
+    TOOL_CALLING_PROMPT_VERSION: str = Field(default="latest", env="TOOL_CALLING_PROMPT_VERSION")
+    TOOL_DEFAULT_CONCURRENCY: int = Field(default=4, env="TOOL_DEFAULT_CONCURRENCY")
+    TOOL_CONCURRENCY_LIMITS: str = Field(default="", env="TOOL_CONCURRENCY_LIMITS")
+    # トークン使用量・コスト（aiagent.utils.usage）
+    LLM_PRICE_OVERRIDES: dict[str, list[float]] = Field(default={}, env="LLM_PRICE_OVERRIDES")
+    AGENT_DEFAULT_TOKEN_BUDGET: int = Field(default=0, env="AGENT_DEFAULT_TOKEN_BUDGET")
+    # 期限・タイムアウト（aiagent.utils.deadline）
+    AGENT_DEFAULT_TIMEOUT_SECONDS: float = Field(default=0.0, env="AGENT_DEFAULT_TIMEOUT_SECONDS")
+    LLM_API_TIMEOUT_SECONDS: float = Field(default=120.0, env="LLM_API_TIMEOUT_SECONDS")
+    # 回答キャッシュ（aiagent.aiagent.answer_cache）
+    ANSWER_CACHE_TTL_SECONDS: int = Field(default=600, env="ANSWER_CACHE_TTL_SECONDS")
+    ANSWER_CACHE_MAX_ENTRIES: int = Field(default=256, env="ANSWER_CACHE_MAX_ENTRIES")
+    ANSWER_CACHE_TIME_BUCKET_SECONDS: int = Field(default=3600, env="ANSWER_CACHE_TIME_BUCKET_SECONDS")
+    ANSWER_CACHE_DB_PATH: str = Field(default="", env="ANSWER_CACHE_DB_PATH")
+    # モデルの選択（aiagent.aiagent.model_registry）
+    MODEL_ROUTER_CANDIDATES: str = Field(default="", env="MODEL_ROUTER_CANDIDATES")
+    MODEL_ROUTER_ENABLED: bool = Field(default=False, env="MODEL_ROUTER_ENABLED")
+    MODEL_ROUTE_GENERAL: str = Field(default="", env="MODEL_ROUTE_GENERAL")
+    MODEL_ROUTE_AGENT: str = Field(default="", env="MODEL_ROUTE_AGENT")
+    MODEL_ROUTE_SUBJECT: str = Field(default="", env="MODEL_ROUTE_SUBJECT")
+    MODEL_ROUTE_SCRIPT: str = Field(default="", env="MODEL_ROUTE_SCRIPT")
+    MODEL_ROUTE_SEARCH: str = Field(default="", env="MODEL_ROUTE_SEARCH")
+    MODEL_ROUTE_SUMMARY: str = Field(default="", env="MODEL_ROUTE_SUMMARY")
+    # ツールの絞り込み（aiagent.aiagent.tool_selector）
+    TOOL_SELECTION_TOP_K: int = Field(default=0, env="TOOL_SELECTION_TOP_K")
+    TOOL_SELECTION_ALWAYS: str = Field(default="google_search_tool", env="TOOL_SELECTION_ALWAYS")
+    # エージェントの途中経過（aiagent.aiagent.scratchpad）
+    SCRATCHPAD_OBSERVATION_MAX_TOKENS: int = Field(default=2000, env="SCRATCHPAD_OBSERVATION_MAX_TOKENS")
+    SCRATCHPAD_WINDOW: int = Field(default=3, env="SCRATCHPAD_WINDOW")
+    SCRATCHPAD_SUMMARY_MAX_TOKENS: int = Field(default=200, env="SCRATCHPAD_SUMMARY_MAX_TOKENS")
+    # LLM API の呼び出し（aiagent.utils.llm_client）
+    LLM_MAX_RETRIES: int = Field(default=3, env="LLM_MAX_RETRIES")
+    LLM_RETRY_BASE_SECONDS: float = Field(default=1.0, env="LLM_RETRY_BASE_SECONDS")
+    LLM_RETRY_MAX_SECONDS: float = Field(default=30.0, env="LLM_RETRY_MAX_SECONDS")
+    LLM_HTTP_MAX_CONNECTIONS: int = Field(default=100, env="LLM_HTTP_MAX_CONNECTIONS")
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=20, env="LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = Field(default=60.0, env="LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS")
+    GEMINI_MODEL_CACHE_SIZE: int = Field(default=32, env="GEMINI_MODEL_CACHE_SIZE")
+    # LLM 応答キャッシュ（aiagent.utils.llm_cache）
+    LLM_CACHE_DB_PATH: str = Field(default="", env="LLM_CACHE_DB_PATH")
+    LLM_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600, env="LLM_CACHE_TTL_SECONDS")
+    LLM_CACHE_MAX_BYTES: int = Field(default=256 * 1024 * 1024, env="LLM_CACHE_MAX_BYTES")
+    LLM_CACHE_TOUCH_INTERVAL_SECONDS: float = Field(default=60.0, env="LLM_CACHE_TOUCH_INTERVAL_SECONDS")
+    # LLM 呼び出しのレート制限（aiagent.utils.rate_limit）
+    LLM_RATE_LIMITS: dict[str, dict[str, float]] = Field(default={}, env="LLM_RATE_LIMITS")
+    LLM_RATE_LIMIT_BURST_SECONDS: float = Field(default=10.0, env="LLM_RATE_LIMIT_BURST_SECONDS")
+    LLM_RATE_LIMIT_BACKGROUND_RESERVE: float = Field(default=0.2, env="LLM_RATE_LIMIT_BACKGROUND_RESERVE")
+    # LLM 呼び出しのヘッジ（aiagent.utils.hedging）
+    LLM_HEDGE_ENABLED: bool = Field(default=False, env="LLM_HEDGE_ENABLED")
+    LLM_HEDGE_PERCENTILE: float = Field(default=95.0, env="LLM_HEDGE_PERCENTILE")
+    LLM_HEDGE_MIN_SAMPLES: int = Field(default=20, env="LLM_HEDGE_MIN_SAMPLES")
+    LLM_HEDGE_WINDOW: int = Field(default=200, env="LLM_HEDGE_WINDOW")
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = Field(default=1.0, env="LLM_HEDGE_MIN_DELAY_SECONDS")
+    LLM_HEDGE_BACKUP_MODELS: dict[str, str] = Field(default={}, env="LLM_HEDGE_BACKUP_MODELS")
+    LLM_HEDGE_MAX_WORKERS: int = Field(default=32, env="LLM_HEDGE_MAX_WORKERS")
+    # 入力のトークン数の上限（aiagent.utils.token_budget。未設定の場合は処理の種類ごとの既定値）
+    INPUT_TOKEN_BUDGET_GENERAL: int | None = Field(default=None, env="INPUT_TOKEN_BUDGET_GENERAL")
+    INPUT_TOKEN_BUDGET_AGENT: int | None = Field(default=None, env="INPUT_TOKEN_BUDGET_AGENT")
+    INPUT_TOKEN_BUDGET_SUBJECT: int | None = Field(default=None, env="INPUT_TOKEN_BUDGET_SUBJECT")
+    INPUT_TOKEN_BUDGET_SCRIPT: int | None = Field(default=None, env="INPUT_TOKEN_BUDGET_SCRIPT")
+    INPUT_TOKEN_BUDGET_SEARCH: int | None = Field(default=None, env="INPUT_TOKEN_BUDGET_SEARCH")
+    INPUT_TOKEN_BUDGET_SUMMARY: int | None = Field(default=None, env="INPUT_TOKEN_BUDGET_SUMMARY")
+    # プロンプトキャッシュ（aiagent.utils.usage / aiagent.utils.llm_client）
+    LLM_CACHED_INPUT_PRICE_RATIO: float = Field(default=0.5, env="LLM_CACHED_INPUT_PRICE_RATIO")
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: int = Field(default=0, env="GEMINI_CONTEXT_CACHE_TTL_SECONDS")
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS: int = Field(default=4096, env="GEMINI_CONTEXT_CACHE_MIN_TOKENS")
+    GEMINI_CONTEXT_CACHE_MAX_ENTRIES: int = Field(default=8, env="GEMINI_CONTEXT_CACHE_MAX_ENTRIES")
+    # 件名の生成（aiagent.utils.generate_subject_from_text）
+    SUBJECT_GENERATOR: str = Field(default="local", env="SUBJECT_GENERATOR")
 
 
 # インスタンス生成
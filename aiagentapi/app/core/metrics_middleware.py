@@ -0,0 +1,52 @@
+import time
+from aiagent.utils.metrics import HTTP_REQUESTS_TOTAL, HTTP_REQUESTS_IN_PROGRESS, HTTP_REQUEST_DURATION
+
+
+class PrometheusMiddleware:
+    """
+    HTTPリクエストの件数・処理中の数・処理時間を Prometheus に記録する ASGI ミドルウェア。
+
+    @app.middleware("http")（BaseHTTPMiddleware）はレスポンス本文を別タスクで中継するため、
+    SSE のストリーミングや request.is_disconnected() の検知を妨げる。ここでは送信メッセージを覗くだけで
+    中継はせず、最後の本文（more_body が False の http.response.body）を送った時点で計測を終える。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        start = time.perf_counter()
+        status = 500
+        finished = False
+        HTTP_REQUESTS_IN_PROGRESS.labels(method=method).inc()
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            HTTP_REQUESTS_IN_PROGRESS.labels(method=method).dec()
+            # ラベルの種類が増えすぎないよう、実際のパスではなくルートのパス（/v1/jobs/{job_id} 等）を使う
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            HTTP_REQUESTS_TOTAL.labels(method=method, path=path, status=str(status)).inc()
+            HTTP_REQUEST_DURATION.labels(method=method, path=path).observe(time.perf_counter() - start)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 例外・クライアントの切断で本文を送り終えなかった場合
+            finish()
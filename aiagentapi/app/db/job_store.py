@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+# ジョブの状態
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobStore:
+    """
+    エージェント実行ジョブの状態を SQLite に永続化するクラス。
+
+    サーバーを再起動してもジョブの状態・途中経過・結果を参照できるようにする。
+    接続は操作ごとに開き、書き込みはロックで直列化する（複数スレッドから利用可能）。
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path (str): SQLite ファイルのパス。親ディレクトリが無ければ作成する。
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_steps (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        """接続を開き、正常終了時にコミットして閉じる"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat(timespec="seconds")
+
+    @staticmethod
+    def _to_dict(row, steps: list) -> dict:
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "request": json.loads(row[2]),
+            "steps": steps,
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "cancel_requested": bool(row[5]),
+            "created_at": row[6],
+            "started_at": row[7],
+            "finished_at": row[8],
+        }
+
+    def create(self, request: dict) -> str:
+        """ジョブを queued 状態で登録し、ジョブIDを返す。"""
+        job_id = str(uuid.uuid4())
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps(request, ensure_ascii=False), self._now())
+            )
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        """ジョブを取得する。存在しない場合は None。"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, request, result, error, cancel_requested, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            steps = conn.execute("SELECT payload FROM job_steps WHERE job_id = ? ORDER BY seq", (job_id,)).fetchall()
+        return self._to_dict(row, [json.loads(step[0]) for step in steps])
+
+    def list_ids_by_status(self, status: str) -> list[str]:
+        """指定した状態のジョブIDを作成順に返す。"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (status,)).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_running(self, job_id: str) -> bool:
+        """queued のジョブを running にする。キャンセル済み等で遷移できない場合は False。"""
+        with self._lock, self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ? AND cancel_requested = 0",
+                (JOB_RUNNING, self._now(), job_id, JOB_QUEUED)
+            )
+            return cur.rowcount == 1
+
+    def append_step(self, job_id: str, step: dict):
+        """途中経過（中間ステップ）を追記する（既存のステップは読み書きしない）。"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_steps (job_id, seq, payload) "
+                "SELECT ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_steps WHERE job_id = ?), ? "
+                "WHERE EXISTS (SELECT 1 FROM jobs WHERE id = ?)",
+                (job_id, job_id, json.dumps(step, ensure_ascii=False, default=str), job_id)
+            )
+
+    def finish(self, job_id: str, status: str, result=None, error: str | None = None):
+        """ジョブを終了状態にする。"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                 error, self._now(), job_id)
+            )
+
+    def request_cancel(self, job_id: str) -> dict | None:
+        """
+        キャンセルを要求する。queued のジョブは即座に cancelled にし、
+        running のジョブには要求フラグを立てて次のステップの区切りで停止させる。
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] == JOB_QUEUED:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ?",
+                    (JOB_CANCELLED, self._now(), job_id)
+                )
+            elif row[0] == JOB_RUNNING:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        return self.get(job_id)
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
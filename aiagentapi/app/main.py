@@ -1,14 +1,34 @@
-from fastapi import FastAPI
-from app.api.v1 import common_endpoints
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.api.v1 import common_endpoints, job_endpoints
 from app.core.logger import setup_logging
+from app.core.metrics_middleware import PrometheusMiddleware
+from app.services.job_service import job_manager
+from app.services.warmup import warmup
 
 setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 起動時: ジョブワーカーを起動し、再起動前のジョブを復旧する
+    job_manager.start()
+    # 最初のリクエストで発生する初期化をバックグラウンドで済ませる（完了までは /ready が 503 を返す）
+    warmup.start()
+    yield
+    # 終了時: ウォームアップとジョブワーカーを停止する
+    warmup.shutdown()
+    job_manager.shutdown()
+
+
 app = FastAPI(
     title="My API",
     description="APIドキュメント",
     version="1.0.0",
     root_path="/aiagent-api",
+    lifespan=lifespan,
     swagger_ui_parameters={
         "docExpansion": "list",  # サイドバーにAPIリンクを表示
         "defaultModelsExpandDepth": -1  # モデルはサイドバーに表示しない
@@ -16,3 +36,20 @@ app = FastAPI(
 )
 
 app.include_router(common_endpoints.router, prefix="/v1")
+app.include_router(job_endpoints.router, prefix="/v1")
+app.add_middleware(PrometheusMiddleware)
+
+
+@app.get("/metrics",
+         include_in_schema=False,
+         summary="Prometheus形式のメトリクスを返します")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/ready",
+         include_in_schema=False,
+         summary="ウォームアップが完了していれば200、未完了なら503を返します（readinessProbe用）")
+def ready():
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import List, Dict, Any
+from app.schemas.standardAiAgent import ChatMessage
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    # 途中経過（中間ステップ）。Observation は切り詰めたもの
+    steps: List[Dict[str, Any]]
+    error: str | None = None
+    cancel_requested: bool = False
+    created_at: str
+    started_at: str | None = None
+    finished_at: str | None = None
+
+
+class JobResultResponse(BaseModel):
+    job_id: str
+    status: str
+    result: List[ChatMessage] | None = None
+    error: str | None = None
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Literal
+
+
+class ScriptGenerateRequest(BaseModel):
+    # podcast: ポッドキャストの台本 / melmaga: メルマガの本文
+    kind: Literal["podcast", "melmaga"]
+    # 台本の元になる情報（記事の本文等）
+    input_info: str
+    # 省略時は既定のモデル（MODEL_ROUTER_ENABLED=true の場合は処理の種類と入力の長さに応じて自動で選択する）
+    model_name: str | None = None
+    # 1リクエストの制限時間（秒）。超えた場合は error イベントを送って終了する
+    timeout_seconds: float | None = None
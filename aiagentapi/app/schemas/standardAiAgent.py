@@ -1,12 +1,30 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any # List, Dict, Any をインポート
+from typing import List, Dict, Any, Literal # List, Dict, Any をインポート
 
 
 class AtandardAiAgentRequest(BaseModel):
     user_input: str
+    # 省略時は既定のモデル（MODEL_ROUTER_ENABLED=true の場合は入力の長さに応じて自動で選択する）
     model_name: str | None = None
+    # 処理の種類ごとのモデル指定 (例: {"script": "gpt-4o", "subject": "gemini-1.5-flash"})
+    # 指定できる種類: agent / script / subject / search / summary / general
+    model_overrides: Dict[str, str] | None = None
     max_iterations: int | None = None
     thought_process_Flg: bool = True
+    # 指定するとサーバー側で会話履歴を保持し、続けての質問で以前の文脈を利用する
+    session_id: str | None = None
+    # react: 1ステップ1ツール（ReAct） / parallel: 1ステップで複数ツールを並行実行
+    agent_mode: Literal["react", "parallel"] = "react"
+    # True の場合、LLM・ツール呼び出しごとの処理時間とトークン数の内訳をレスポンスに含める
+    timing_Flg: bool = False
+    # 1リクエストで使用できるトークン数の上限。超えた時点でステップの区切りで実行を打ち切る
+    max_tokens: int | None = None
+    # 1リクエストの制限時間（秒）。超えた場合は途中までの中間ステップを結果として返す
+    timeout_seconds: float | None = None
+    # False の場合は回答キャッシュを使わずに必ずエージェントを実行する
+    use_cache: bool = True
+    # エージェントに渡すツールの最大数（入力との関連度が高い順に選ぶ）。省略時は TOOL_SELECTION_TOP_K（既定では全ツール）、0 の場合は全ツール
+    tool_top_k: int | None = None
 
 
 # チャットメッセージの形式を表すモデル
@@ -19,3 +37,12 @@ class ChatMessage(BaseModel):
 class AtandardAiAgentResponse(BaseModel):
     # result フィールドを ChatMessage モデルのリストとして定義
     result: List[ChatMessage]
+    session_id: str | None = None
+    # 処理時間の内訳（timing_Flg が True の場合のみ）
+    timing: Dict[str, Any] | None = None
+    # トークン使用量と推定コスト（モデル別・ツール別の内訳を含む）
+    usage: Dict[str, Any] | None = None
+    # 実行を途中で打ち切った場合の理由 (例: "token_budget", "timeout", "cancelled")
+    stopped_reason: str | None = None
+    # 回答キャッシュから返した場合は True
+    cached: bool = False
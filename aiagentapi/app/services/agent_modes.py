@@ -0,0 +1,38 @@
+from aiagent.utils.lazy_import import import_object
+from aiagent.aiagent.model_registry import route_model, activate_model_overrides, TASK_AGENT
+from aiagent.aiagent.tool_selector import select_tools
+
+
+# agent_mode とエージェントクラス（'モジュール:クラス'）の対応。
+# エージェントのモジュールは LangChain を読み込むため、初めて使う時点でインポートする
+#   react    : ReAct形式。1回のLLM呼び出しで1つのツールを実行する
+#   parallel : ツール呼び出し形式。1回のLLM呼び出しで返された複数のツールを並行実行する
+AGENT_MODES = {
+    "react": "aiagent.aiagent.StandardAiAgent:StandardAiAgent",
+    "parallel": "aiagent.aiagent.ParallelToolAiAgent:ParallelToolAiAgent",
+}
+DEFAULT_AGENT_MODE = "react"
+
+
+def get_agent_class(agent_mode: str | None):
+    """agent_mode に対応するエージェントクラスを返す。未指定の場合は react。"""
+    agent_mode = agent_mode or DEFAULT_AGENT_MODE
+    if agent_mode not in AGENT_MODES:
+        raise ValueError(f"Unknown agent_mode '{agent_mode}'. Available: {', '.join(AGENT_MODES)}")
+    return import_object(AGENT_MODES[agent_mode])
+
+
+def resolve_agent_model(model_name: str | None, user_input: str, model_overrides: dict | None = None) -> str:
+    """
+    エージェントが使用するモデルを決める。
+
+    model_overrides の "agent"、model_name の順に優先し、どちらも無い場合は model_registry.route_model で
+    決める（既定は gemini-1.5-pro。MODEL_ROUTER_ENABLED=true の場合は入力の長さに応じて最も速いモデル）。
+    """
+    with activate_model_overrides(model_overrides):
+        return route_model(TASK_AGENT, user_input, model_name)
+
+
+def select_agent_tools(agent_cls, user_input: str, top_k: int | None = None) -> list:
+    """エージェントクラスの既定のツールから、ユーザー入力に関連するものを最大 top_k 個選ぶ"""
+    return select_tools(user_input, agent_cls.DEFAULT_MAX_TOOLS, top_k)
@@ -0,0 +1,140 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from aiagent.aiagent.executor_pool import executor_pool
+from aiagent.utils.rate_limit import activate_priority, PRIORITY_BACKGROUND
+from app.core.config import settings
+from app.core.logger import getlogger
+from app.db.job_store import JobStore, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED
+from app.utils.agent_input import build_agent_input
+from app.services.agent_modes import get_agent_class, resolve_agent_model, select_agent_tools
+from app.services.session_store import session_store
+
+
+class JobManager:
+    """
+    長時間かかるエージェント実行をバックグラウンドで処理するジョブ管理クラス。
+
+    ジョブは JobStore（SQLite）に登録され、上限付きのワーカースレッドで順に実行される。
+    実行中は中間ステップを逐次保存し、ステップの区切りごとにキャンセル要求を確認する。
+    実行中のジョブへのキャンセル要求は、エージェントにも中断要求として伝え、
+    次のLLM・ツール呼び出しの前で停止させる。
+    リクエストの session_id・use_cache は同期の API（/aiagent）と同じく扱う。
+    """
+
+    def __init__(self, store: JobStore, max_workers: int):
+        """
+        Args:
+            store (JobStore): ジョブの永続化ストア。
+            max_workers (int): 同時に実行するジョブ数の上限。
+        """
+        self.store = store
+        self.max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        # 実行中のジョブID -> エージェント
+        self._running_agents = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """ワーカーを起動し、再起動前のジョブを復旧する。"""
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="aiagent-job")
+        # 実行途中で停止したジョブは副作用（メール送信等）の重複を避けるため再実行しない
+        for job_id in self.store.list_ids_by_status(JOB_RUNNING):
+            self.store.finish(job_id, JOB_FAILED, error="サーバーの再起動により中断されました。")
+        # 待機中だったジョブは改めてキューに積む
+        for job_id in self.store.list_ids_by_status(JOB_QUEUED):
+            self._executor.submit(self._run, job_id)
+
+    def shutdown(self):
+        """ワーカーを停止する。待機中のジョブは queued のまま残り、次回起動時に再開される。"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, request: dict) -> str:
+        """ジョブを登録してキューに積み、ジョブIDを返す。"""
+        if self._executor is None:
+            self.start()
+        job_id = self.store.create(request)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def cancel(self, job_id: str) -> dict | None:
+        """ジョブのキャンセルを要求する。"""
+        job = self.store.request_cancel(job_id)
+        with self._lock:
+            agent = self._running_agents.get(job_id)
+        if agent is not None:
+            agent.cancel()
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        return self.store.get(job_id)
+
+    def _run(self, job_id: str):
+        # ジョブはバックグラウンド処理として、対話的なリクエストより後にLLMの枠を割り当てる
+        with activate_priority(PRIORITY_BACKGROUND):
+            self._execute(job_id)
+
+    def _execute(self, job_id: str):
+        # キャンセル済み・実行済みのジョブは処理しない
+        if not self.store.mark_running(job_id):
+            return
+        request = self.store.get(job_id)["request"]
+        try:
+            session = session_store.get_or_create(request["session_id"]) if request.get("session_id") else None
+            _context = session.build_context() if session else None
+            _input = build_agent_input(request["user_input"], _context)
+            agent_cls = get_agent_class(request.get("agent_mode"))
+            with executor_pool.lease(
+                    agent_cls,
+                    model_name=resolve_agent_model(request.get("model_name"), _input, request.get("model_overrides")),
+                    max_iterations=request.get("max_iterations"),
+                    tools=select_agent_tools(agent_cls, request["user_input"], request.get("tool_top_k"))) as agent:
+                agent.set_model_overrides(request.get("model_overrides"))
+                agent.set_token_budget(request.get("max_tokens"))
+                agent.set_deadline(request.get("timeout_seconds"))
+                if request.get("use_cache", True) and not _context:
+                    # 会話の文脈に依存しない質問のみ回答キャッシュを利用する
+                    agent.use_answer_cache(request["user_input"])
+                with self._lock:
+                    self._running_agents[job_id] = agent
+                events = agent.cached_stream(
+                    _input,
+                    request.get("thought_process_Flg", True)
+                )
+                try:
+                    for event in events:
+                        if event["event"] == "step":
+                            self.store.append_step(job_id, event["data"])
+                        elif event["event"] == "final":
+                            if self.store.is_cancel_requested(job_id):
+                                # 中断要求で打ち切った場合も途中までの結果は保存する
+                                self.store.finish(job_id, JOB_CANCELLED, result=event["data"]["result"], error="キャンセルされました。")
+                            else:
+                                self.store.finish(job_id, JOB_SUCCEEDED, result=event["data"]["result"])
+                                if session:
+                                    session_store.append_turn(session.session_id, request["user_input"], str(agent.final_answer))
+                                    session_store.compact(session.session_id)
+                            return
+                        elif event["event"] == "error":
+                            self.store.finish(job_id, JOB_FAILED, error=event["data"]["message"])
+                            return
+                        # ツール実行前（action）と実行後（step）の区切りでキャンセルを確認する
+                        if self.store.is_cancel_requested(job_id):
+                            self.store.finish(job_id, JOB_CANCELLED, error="キャンセルされました。")
+                            return
+                finally:
+                    # ジェネレータを閉じてエージェントの実行を止める
+                    events.close()
+                    with self._lock:
+                        self._running_agents.pop(job_id, None)
+            self.store.finish(job_id, JOB_FAILED, error="エージェントが結果を返さずに終了しました。")
+        except Exception as e:
+            getlogger().exception("Job %s failed", job_id)
+            self.store.finish(job_id, JOB_FAILED, error=str(e))
+
+
+# アプリケーション全体で共有するジョブマネージャ
+job_manager = JobManager(JobStore(settings.JOB_DB_PATH), settings.JOB_MAX_WORKERS)
@@ -0,0 +1,160 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from aiagent.utils.execllm import execLlmApi
+from aiagent.aiagent.model_registry import estimate_tokens, TASK_SUMMARY
+from app.core.config import settings
+from app.core.logger import getlogger
+
+
+SESSION_MAX_SESSIONS = settings.SESSION_MAX_SESSIONS
+# セッションごとに保持する会話（要約＋直近のやり取り）のトークン上限（目安）
+SESSION_TOKEN_BUDGET = settings.SESSION_TOKEN_BUDGET
+# 要約せずにそのまま残す直近の発話数
+SESSION_KEEP_RECENT_TURNS = settings.SESSION_KEEP_RECENT_TURNS
+# 要約に使用するモデル（空の場合は model_registry.route_model で決める）
+SESSION_SUMMARY_MODEL = settings.SESSION_SUMMARY_MODEL or None
+
+
+def summarize_turns(previous_summary: str, turns: list[dict]) -> str:
+    """
+    これまでの要約と古い発話をまとめて、新しい要約を生成する。
+
+    Args:
+        previous_summary (str): これまでの要約（無ければ空文字）。
+        turns (list[dict]): 要約に取り込む発話 (role/content)。
+
+    Returns:
+        str: 新しい要約。LLM呼び出しに失敗した場合は発話を切り詰めて連結したもの。
+    """
+    conversation = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    _messages = [
+        {"role": "system", "content": "あなたは会話の要約を作成するアシスタントです。"},
+        {"role": "user", "content": (
+            "以下の「これまでの要約」と「追加の会話」をまとめ、後続の質問に答えるために必要な事実・固有名詞・"
+            "ユーザーの意図を残した簡潔な日本語の要約を作成してください。要約のみを出力してください。\n\n"
+            f"# これまでの要約\n{previous_summary or '(なし)'}\n\n# 追加の会話\n{conversation}"
+        )}
+    ]
+    try:
+        summary = execLlmApi(SESSION_SUMMARY_MODEL, _messages, task=TASK_SUMMARY)
+        if isinstance(summary, str) and summary.strip():
+            return summary.strip()
+    except Exception:
+        getlogger().exception("会話の要約に失敗しました")
+    # 要約に失敗した場合は各発話を短く切り詰めて残す
+    fallback = "\n".join(f"{t['role']}: {t['content'][:100]}" for t in turns)
+    return f"{previous_summary}\n{fallback}".strip()
+
+
+class ConversationSession:
+    """1つの会話セッション。古い発話は要約（summary）に畳み込まれる。"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.summary = ""
+        self.turns: list[dict] = []
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+        self.compacting = False
+
+    def token_count(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(t["content"]) for t in self.turns)
+
+    def build_context(self) -> str:
+        """エージェントの入力に埋め込む会話コンテキストを組み立てる"""
+        with self.lock:
+            parts = []
+            if self.summary:
+                parts.append(f"#### これまでの会話の要約\n{self.summary}")
+            if self.turns:
+                recent = "\n".join(f"- {t['role']}: {t['content']}" for t in self.turns)
+                parts.append(f"#### 直近の会話\n{recent}")
+            return "\n\n".join(parts)
+
+
+class SessionStore:
+    """
+    セッションIDをキーに会話履歴をサーバー側で保持するストア。
+
+    セッション数は LRU で上限を設け、各セッションはトークン上限を超えると
+    古い発話から要約に畳み込むため、プロンプトのサイズは会話が続いても一定に収まる。
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, token_budget: int = SESSION_TOKEN_BUDGET,
+                 keep_recent_turns: int = SESSION_KEEP_RECENT_TURNS, summarizer=summarize_turns):
+        """
+        Args:
+            max_sessions (int): 保持するセッション数の上限。超えた分は最も古いものから破棄する。
+            token_budget (int): セッションごとのトークン上限（目安）。
+            keep_recent_turns (int): 要約せずに残す直近の発話数。
+            summarizer: (これまでの要約, 発話リスト) -> 新しい要約 を返す関数。
+        """
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summarizer = summarizer
+        self._sessions: OrderedDict[str, ConversationSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, session_id: str | None = None) -> ConversationSession:
+        """セッションを取得する。無ければ作成する（session_id が None の場合は新規ID）。"""
+        session_id = session_id or str(uuid.uuid4())
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = ConversationSession(session_id)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def append_turn(self, session_id: str, user_input: str, assistant_output: str):
+        """ユーザー入力とエージェントの回答を追加する。"""
+        session = self.get_or_create(session_id)
+        with session.lock:
+            session.turns.append({"role": "user", "content": user_input})
+            session.turns.append({"role": "assistant", "content": assistant_output})
+            session.updated_at = time.time()
+
+    def compact(self, session_id: str):
+        """
+        トークン上限を超えている場合、直近の発話を残して古い発話を要約に畳み込む。
+        LLM を呼ぶため、レスポンス返却後のバックグラウンドで実行する想定。
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            return
+        with session.lock:
+            if session.compacting:
+                return
+            if session.token_count() <= self.token_budget or len(session.turns) <= self.keep_recent_turns:
+                return
+            session.compacting = True
+            old_turns = session.turns[:-self.keep_recent_turns] if self.keep_recent_turns else list(session.turns)
+            previous_summary = session.summary
+        try:
+            # 要約の生成中もセッションを利用できるようロックの外で実行する
+            new_summary = self.summarizer(previous_summary, old_turns)
+            with session.lock:
+                # 要約中に追加された発話は残したまま、要約済みの発話だけを取り除く
+                session.turns = session.turns[len(old_turns):]
+                session.summary = new_summary
+        finally:
+            session.compacting = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+
+# アプリケーション全体で共有するセッションストア
+session_store = SessionStore()
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import threading
+import time
+from app.core.config import settings
+from app.core.logger import getlogger
+
+
+# コンポーネントの状態
+WARMUP_PENDING = "pending"
+WARMUP_OK = "ok"
+WARMUP_SKIPPED = "skipped"
+WARMUP_FAILED = "failed"
+
+
+class WarmupSkipped(Exception):
+    """設定されていない（使われない）コンポーネントのため、ウォームアップを省略したことを示す例外"""
+
+
+def _warm_modules():
+    """エージェント・ツール・プロバイダSDKのモジュールを読み込む"""
+    from app.services.agent_modes import AGENT_MODES, get_agent_class
+    from aiagent.tool.registry import get_tools
+    for agent_mode in AGENT_MODES:
+        get_agent_class(agent_mode)
+    get_tools()
+    if os.getenv("OPENAI_API_KEY"):
+        import langchain_openai  # noqa: F401
+    if os.getenv("GEMINI_API_KEY"):
+        import langchain_google_genai  # noqa: F401
+
+
+def _warm_google_credentials():
+    """Google API の認証情報を読み込む（期限切れの場合はリフレッシュする）"""
+    # トークンが無い場合の認証フローはブラウザ操作を待つため、起動時には行わない
+    token_path = os.getenv("GOOGLE_APIS_TOKEN_PATH")
+    if not token_path or not os.path.exists(token_path):
+        raise WarmupSkipped("Google API token file is not configured.")
+    from aiagent.googleapis.googleapi_services import get_credentials
+    if get_credentials() is None:
+        raise RuntimeError("Failed to load Google API credentials.")
+
+
+def _warm_google_service(service_name: str):
+    """認証情報とディスカバリードキュメントを読み込み、サービスをビルドできることを確認する"""
+    from aiagent.googleapis.googleapi_services import get_googleapis_service
+    _warm_google_credentials()
+    if get_googleapis_service(service_name) is None:
+        raise RuntimeError(f"Failed to build Google API service '{service_name}'.")
+
+
+def _warm_llm_clients():
+    """APIキーが設定されているプロバイダのLLMクライアントを生成する"""
+    from aiagent.utils.llm_client import get_openai_client, get_openai_async_client, get_genai
+    warmed = False
+    if os.getenv("OPENAI_API_KEY"):
+        get_openai_client()
+        get_openai_async_client()
+        warmed = True
+    if os.getenv("GEMINI_API_KEY"):
+        get_genai()
+        warmed = True
+    if not warmed:
+        raise WarmupSkipped("No LLM API key is configured.")
+
+
+def _warm_prompts():
+    """エージェントが使うプロンプトを読み込む"""
+    from aiagent.prompts.registry import get_prompt, load_template_text, REACT_PROMPT_NAME, REACT_PROMPT_VERSION
+    from aiagent.aiagent.ParallelToolAiAgent import TOOL_CALLING_PROMPT_NAME, TOOL_CALLING_PROMPT_VERSION
+    get_prompt(REACT_PROMPT_NAME, REACT_PROMPT_VERSION)
+    load_template_text(TOOL_CALLING_PROMPT_NAME, TOOL_CALLING_PROMPT_VERSION)
+
+
+# 最初に読み込むモジュール。読み込みは CPU 処理が中心で並列化の効果が小さく、
+# 複数スレッドから同時に読み込むと循環インポートでデッドロックし得るため、単独で先に行う
+MODULES_COMPONENT = ("modules", _warm_modules)
+
+# モジュールの読み込み後に並行してウォームアップするコンポーネント（主にファイル・ネットワークI/O）
+PARALLEL_COMPONENTS = [
+    ("google_credentials", _warm_google_credentials),
+    ("google_gmail", lambda: _warm_google_service("gmail")),
+    ("google_drive", lambda: _warm_google_service("drive")),
+    ("google_sheets", lambda: _warm_google_service("sheets")),
+    ("llm_clients", _warm_llm_clients),
+    ("prompts", _warm_prompts),
+]
+
+
+class Warmup:
+    """
+    起動直後に、最初のリクエストで発生する初期化（モジュールの読み込み、Google API の認証情報と
+    ディスカバリードキュメント、LLMクライアント、プロンプト）を済ませておくクラス。
+
+    ウォームアップはバックグラウンドで行い、すべてのコンポーネントが完了（または省略）するまで
+    ready を False にする。/ready でこれを返すことで、準備ができていない Pod にトラフィックを流さない。
+    失敗したコンポーネントは retry_interval 秒ごとに再試行する。
+    """
+
+    def __init__(self, enabled: bool, retry_interval: float):
+        """
+        Args:
+            enabled (bool): False の場合はウォームアップを行わず、常に ready とする。
+            retry_interval (float): 失敗したコンポーネントを再試行する間隔（秒）。
+        """
+        self.enabled = enabled
+        self.retry_interval = retry_interval
+        self._components = {
+            name: {"status": WARMUP_PENDING, "elapsed_seconds": None, "detail": None}
+            for name, _ in [MODULES_COMPONENT, *PARALLEL_COMPONENTS]
+        }
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._started_at = None
+        self._ready_at = None
+
+    def start(self):
+        """実行中のイベントループでウォームアップを開始する（lifespan から呼び出す）。"""
+        if not self.enabled or self._task is not None:
+            return
+        self._started_at = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def shutdown(self):
+        """ウォームアップ（再試行の待機を含む）を中止する。"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def ready(self) -> bool:
+        if not self.enabled:
+            return True
+        with self._lock:
+            return all(c["status"] in (WARMUP_OK, WARMUP_SKIPPED) for c in self._components.values())
+
+    def status(self) -> dict:
+        """準備状態とコンポーネントごとの状態を返す。"""
+        with self._lock:
+            components = {name: dict(c) for name, c in self._components.items()}
+            ready_in = None
+            if self._ready_at is not None:
+                ready_in = round(self._ready_at - self._started_at, 3)
+        return {"ready": self.ready, "enabled": self.enabled, "ready_in_seconds": ready_in, "components": components}
+
+    async def _run(self):
+        while True:
+            components = self._unfinished()
+            if MODULES_COMPONENT in components:
+                await self._warm(MODULES_COMPONENT)
+            await asyncio.gather(*(self._warm(c) for c in components if c is not MODULES_COMPONENT))
+
+            components = self._unfinished()
+            if not components:
+                with self._lock:
+                    self._ready_at = time.monotonic()
+                getlogger().info("Warm-up completed in %.2fs", self._ready_at - self._started_at)
+                return
+            getlogger().info("Warm-up incomplete (%s). Retrying in %ss",
+                             ", ".join(name for name, _ in components), self.retry_interval)
+            await asyncio.sleep(self.retry_interval)
+
+    def _unfinished(self) -> list:
+        """未実行・失敗したコンポーネント"""
+        with self._lock:
+            return [c for c in [MODULES_COMPONENT, *PARALLEL_COMPONENTS]
+                    if self._components[c[0]]["status"] in (WARMUP_PENDING, WARMUP_FAILED)]
+
+    async def _warm(self, component):
+        name, func = component
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(func)
+            status, detail = WARMUP_OK, None
+        except WarmupSkipped as e:
+            status, detail = WARMUP_SKIPPED, str(e)
+        except Exception as e:
+            status, detail = WARMUP_FAILED, f"{type(e).__name__}: {e}"
+            getlogger().exception("Warm-up of '%s' failed", name)
+        with self._lock:
+            self._components[name] = {
+                "status": status,
+                "elapsed_seconds": round(time.perf_counter() - start, 3),
+                "detail": detail,
+            }
+
+
+# アプリケーション全体で共有するウォームアップ
+warmup = Warmup(settings.WARMUP_ENABLED, settings.WARMUP_RETRY_INTERVAL_SECONDS)
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+
+def build_agent_input(user_input: str, conversation_context: str | None = None) -> str:
+    """
+    エージェントへの入力（メタ情報付き）を組み立てる
+
+    Args:
+        user_input (str): ユーザーの入力。
+        conversation_context (str | None): セッションの会話コンテキスト（要約と直近の会話）。
+    """
+    context_section = ""
+    if conversation_context:
+        context_section = f"""
+        ### これまでの会話（必要に応じて参照してください）
+        {conversation_context}
+        """
+    # 秒以下を含めると同じ質問でも毎回異なる入力になるため、分単位に丸める
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    return f"""
+        ### メタ情報:
+        - 現在の時刻は「{now}」です。
+        {context_section}
+        ### 入力情報
+        {user_input}
+        """
@@ -0,0 +1,39 @@
+import asyncio
+from fastapi import Request
+
+
+class ClientDisconnected(Exception):
+    """run_until_disconnected の実行中にクライアントの切断を検知したことを表す例外"""
+
+
+async def run_until_disconnected(http_request: Request, coro, on_disconnect=None, poll_interval: float = 0.5):
+    """
+    クライアントが切断するまで coro を実行し、その結果を返す。
+
+    実行中に切断を検知した場合は ClientDisconnected を送出する。切断の検知に加えて、呼び出し元のタスクが
+    キャンセルされた場合（asyncio.CancelledError はそのまま伝播する）も、on_disconnect（エージェントへの中断要求等）を
+    呼び出した上で実行中のタスクをキャンセルする。
+
+    Args:
+        http_request (Request): 切断を監視するリクエスト。
+        coro: 実行するコルーチン。
+        on_disconnect: 実行を中断するときに呼び出す関数（引数なし）。
+        poll_interval (float): 切断を確認する間隔（秒）。
+
+    Raises:
+        ClientDisconnected: クライアントの切断を検知した場合。
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                print("Client disconnected. Cancelling the agent execution.")
+                raise ClientDisconnected("client disconnected")
+    finally:
+        if not task.done():
+            if on_disconnect is not None:
+                on_disconnect()
+            task.cancel()
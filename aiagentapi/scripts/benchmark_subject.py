@@ -0,0 +1,68 @@
+"""
+件名生成（本文からの抽出 / Gemini による生成）の所要時間と出力を、保存済みのサンプルで比較するスクリプト。
+
+aiagentapi ディレクトリで実行する:
+    python scripts/benchmark_subject.py [--samples scripts/subject_samples] [--max-length 20] [--repeat 50] [--llm]
+
+--llm を指定した場合のみ Gemini API を呼び出す（環境変数 GEMINI_API_KEY が必要。トークンを消費する）。
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_ROOT))
+
+from aiagent.utils.generate_subject_from_text import generate_subject_from_text  # noqa: E402
+
+
+def measure(text: str, max_length: int, use_llm: bool, repeat: int) -> tuple[str, list[float]]:
+    """件名を repeat 回生成し、(件名, 各回の所要時間[ms]) を返す"""
+    subject, elapsed = "", []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subject = generate_subject_from_text(text, max_length, use_llm=use_llm)
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return subject, elapsed
+
+
+def _summary(elapsed: list[float]) -> str:
+    p95 = sorted(elapsed)[max(0, int(len(elapsed) * 0.95) - 1)]
+    return f"median {statistics.median(elapsed):8.2f} ms  p95 {p95:8.2f} ms"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", default=str(API_ROOT / "scripts" / "subject_samples"), help="サンプル（*.md, *.txt）のディレクトリ")
+    parser.add_argument("--max-length", type=int, default=20, help="件名の最大文字数")
+    parser.add_argument("--repeat", type=int, default=50, help="抽出の計測回数（Gemini は1回のみ）")
+    parser.add_argument("--llm", action="store_true", help="Gemini による生成も計測する")
+    args = parser.parse_args()
+
+    samples = sorted(p for p in Path(args.samples).iterdir() if p.suffix in (".md", ".txt"))
+    if not samples:
+        print(f"No samples found in '{args.samples}'.")
+        return 1
+
+    local_all, llm_all = [], []
+    for path in samples:
+        text = path.read_text(encoding="utf-8")
+        subject, elapsed = measure(text, args.max_length, use_llm=False, repeat=args.repeat)
+        local_all.extend(elapsed)
+        print(f"{path.name} ({len(text)} chars)")
+        print(f"  local: {_summary(elapsed)}  {subject}")
+        if args.llm:
+            subject, elapsed = measure(text, args.max_length, use_llm=True, repeat=1)
+            llm_all.extend(elapsed)
+            print(f"  llm  : {_summary(elapsed)}  {subject}")
+
+    print(f"Total local: {_summary(local_all)}")
+    if llm_all:
+        print(f"Total llm  : {_summary(llm_all)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+API の起動時インポートにかかる時間を `python -X importtime` で計測し、予算内か確認するスクリプト。
+
+aiagentapi ディレクトリで実行する:
+    python scripts/check_import_time.py [--budget-ms 1500] [--module app.main] [--top 15]
+
+次のいずれかに該当する場合は終了コード 1 で終了する。同じ確認は tests/test_import_time.py として pytest でも実行される。
+  - 対象モジュールの累積インポート時間が予算を超えた
+  - 起動時に読み込むべきでない重い依存（LLM SDK・Google API クライアント・pandas 等）が読み込まれた
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+# 予算（ミリ秒）の既定値
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+# 起動時には読み込まず、初めて使う時点で読み込むモジュール
+LAZY_MODULES = [
+    "langchain_core",
+    "langchain.agents",
+    "langchain_openai",
+    "langchain_google_genai",
+    "openai",
+    "google.generativeai",
+    "googleapiclient",
+    "pandas",
+    "bs4",
+    "html2text",
+]
+
+API_ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(module: str) -> list[tuple[str, int, int]]:
+    """
+    別プロセスで module をインポートし、(モジュール名, 自身の時間[us], 累積時間[us]) のリストを返す。
+
+    Raises:
+        RuntimeError: インポートに失敗した場合。
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Failed to import '{module}':\n{proc.stderr[-2000:]}")
+
+    records = []
+    for line in proc.stderr.splitlines():
+        # 形式: "import time:       123 |        456 |   package.module"
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # ヘッダー行
+        records.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return records
+
+
+def check(records: list[tuple[str, int, int]], module: str, budget_ms: float) -> list[str]:
+    """measure() の結果を確認し、予算超過・重い依存の読み込みを表すメッセージのリストを返す（問題が無ければ空）"""
+    problems = []
+    total_ms = next((cum for name, _, cum in records if name == module), 0) / 1000
+    if total_ms > budget_ms:
+        problems.append(f"import of '{module}' takes {total_ms:.1f} ms, exceeding the budget of {budget_ms:.1f} ms.")
+    imported = {name for name, _, _ in records}
+    eager = [m for m in LAZY_MODULES if m in imported]
+    if eager:
+        problems.append(f"modules that should be imported lazily were loaded at startup: {', '.join(eager)}")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app.main", help="計測するモジュール")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS, help="累積インポート時間の予算（ミリ秒）")
+    parser.add_argument("--top", type=int, default=15, help="表示する、自身の時間が長いモジュールの数")
+    args = parser.parse_args()
+
+    records = measure(args.module)
+    total_ms = next((cum for name, _, cum in records if name == args.module), 0) / 1000
+
+    print(f"Slowest imports (self time) for '{args.module}':")
+    for name, self_us, cum_us in sorted(records, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  (cumulative {cum_us / 1000:8.1f} ms)  {name}")
+
+    print(f"Total: {total_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    problems = check(records, args.module, args.budget_ms)
+    for problem in problems:
+        print(f"NG: {problem}")
+    if not problems:
+        print("OK")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
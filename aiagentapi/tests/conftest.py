@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_ROOT))
+
+# テストでは起動時のウォームアップ（LLM API・Google API への接続）を行わない
+os.environ.setdefault("WARMUP_ENABLED", "false")
@@ -0,0 +1,47 @@
+from datetime import datetime
+from aiagent.aiagent import answer_cache as answer_cache_module
+from aiagent.aiagent.answer_cache import AnswerCache, normalize_input, time_bucket
+
+
+def test_key_ignores_width_case_and_spacing():
+    assert normalize_input("  ＧＰＴ　とは？ ") == "gpt とは?"
+    assert AnswerCache.make_key("ＧＰＴとは", agent="react") == AnswerCache.make_key("gptとは", agent="react")
+    assert AnswerCache.make_key("gptとは", agent="react") != AnswerCache.make_key("gptとは", agent="tool")
+
+
+def test_time_bucket_changes_with_the_date():
+    assert time_bucket(datetime(2025, 5, 1, 13, 59), 3600) == "2025-05-01#13"
+    assert time_bucket(datetime(2025, 5, 2, 13, 0), 3600) == "2025-05-02#13"
+
+
+def test_expired_entries_are_not_returned(monkeypatch):
+    cache = AnswerCache(ttl_seconds=10, max_entries=10)
+    now = 1_000.0
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: now)
+    cache.set("k", {"output": "answer"})
+    assert cache.get("k") == {"output": "answer"}
+    now += 10
+    assert cache.get("k") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(ttl_seconds=60, max_entries=2)
+    cache.set("a", {"output": "a"})
+    cache.set("b", {"output": "b"})
+    cache.get("a")
+    cache.set("c", {"output": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"output": "a"}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnswerCache(ttl_seconds=0, max_entries=10)
+    cache.set("k", {"output": "answer"})
+    assert cache.get("k") is None
+
+
+def test_sqlite_entries_survive_a_new_instance(tmp_path):
+    db_path = str(tmp_path / "answers.sqlite3")
+    AnswerCache(ttl_seconds=60, max_entries=10, db_path=db_path).set("k", {"output": "回答"})
+    assert AnswerCache(ttl_seconds=60, max_entries=10, db_path=db_path).get("k") == {"output": "回答"}
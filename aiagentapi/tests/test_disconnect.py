@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from app.utils.disconnect import ClientDisconnected, run_until_disconnected
+
+
+class _Request:
+    def __init__(self, disconnected: bool):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+async def _slow(events: list):
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        events.append("cancelled")
+        raise
+
+
+def test_returns_result_while_connected():
+    async def work():
+        return 42
+    assert asyncio.run(run_until_disconnected(_Request(False), work(), poll_interval=0.01)) == 42
+
+
+def test_disconnect_cancels_work_and_raises_client_disconnected():
+    events = []
+
+    async def main():
+        with pytest.raises(ClientDisconnected):
+            await run_until_disconnected(_Request(True), _slow(events), lambda: events.append("on_disconnect"),
+                                         poll_interval=0.01)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert events == ["on_disconnect", "cancelled"]
+
+
+def test_cancellation_cancels_work_and_propagates():
+    events = []
+
+    async def main():
+        task = asyncio.ensure_future(run_until_disconnected(
+            _Request(False), _slow(events), lambda: events.append("on_disconnect"), poll_interval=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert events == ["on_disconnect", "cancelled"]
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from aiagent.aiagent.base import AiAgentBase
+from aiagent.aiagent.executor_pool import AgentExecutorPool
+
+SEARCH = SimpleNamespace(name="search")
+SCRIPT = SimpleNamespace(name="script")
+
+
+class FakeAgent(AiAgentBase):
+    DEFAULT_MODEL = "gemini-1.5-flash"
+    DEFAULT_MAX_ITERATIONS = 3
+    DEFAULT_MAX_TOOLS = [SEARCH]
+    builds = 0
+
+    def __init__(self, model_name=DEFAULT_MODEL, max_iterations=DEFAULT_MAX_ITERATIONS, verbose=False,
+                 tools=None, agent_executor=None):
+        self.model_name = model_name
+        self.tools = tools
+        super().__init__(agent_executor=agent_executor)
+
+    def createAgentExecutor(self):
+        FakeAgent.builds += 1
+        return SimpleNamespace(tools=self.tools)
+
+
+@pytest.fixture
+def pool():
+    FakeAgent.builds = 0
+    return AgentExecutorPool()
+
+
+def test_released_executor_is_reused_for_the_same_key(pool):
+    with pool.lease(FakeAgent, tools=[SEARCH, SCRIPT]) as agent:
+        first = agent.myaiagent
+    # ツールの並び順が違っても同じキーになる
+    with pool.lease(FakeAgent, tools=[SCRIPT, SEARCH]) as agent:
+        assert agent.myaiagent is first
+    assert FakeAgent.builds == 1
+
+
+def test_different_tools_do_not_share_an_executor(pool):
+    with pool.lease(FakeAgent, tools=[SEARCH]) as search_agent, pool.lease(FakeAgent, tools=[SCRIPT]) as script_agent:
+        assert search_agent.myaiagent is not script_agent.myaiagent
+    with pool.lease(FakeAgent, tools=[SEARCH]) as agent:
+        assert agent.myaiagent is search_agent.myaiagent
+    assert FakeAgent.builds == 2
+
+
+def test_per_run_state_is_not_carried_over(pool):
+    with pool.lease(FakeAgent) as agent:
+        default_deadline = agent.deadline
+        agent.set_model_overrides({"script": "gpt-4o"})
+        agent.set_deadline(5)
+        agent.use_answer_cache("質問")
+        agent.cache_hit = True
+        agent.chat_history.append({"role": "user", "content": "質問"})
+        executor = agent.myaiagent
+
+    with pool.lease(FakeAgent) as agent:
+        assert agent.myaiagent is executor
+        assert agent.model_overrides is None
+        assert agent.cache_input is None and agent.cache_hit is False
+        assert agent.chat_history == [] and agent.stopped_reason is None
+        assert (agent.deadline is None) == (default_deadline is None)
+        if agent.deadline is not None:
+            assert agent.deadline.timeout_seconds == default_deadline.timeout_seconds
+
+
+def test_stats_count_hits_and_misses(pool):
+    for _ in range(3):
+        with pool.lease(FakeAgent):
+            pass
+    with pool.lease(FakeAgent, model_name="gpt-4o-mini"):
+        stats = pool.stats()
+        assert stats["in_use"] == 1
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"], stats["builds"]) == (2, 2, 2)
+    assert stats["hit_rate"] == 0.5
+    assert (stats["in_use"], stats["idle"], stats["keys"]) == (0, 2, 2)
+
+
+def test_async_lease_is_released_when_the_body_raises(pool):
+    async def run():
+        with pytest.raises(RuntimeError):
+            async with pool.alease(FakeAgent):
+                raise RuntimeError("failed")
+        async with pool.alease(FakeAgent):
+            pass
+
+    asyncio.run(run())
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"], stats["in_use"], stats["idle"]) == (1, 1, 0, 1)
@@ -0,0 +1,40 @@
+import pytest
+from aiagent.utils.extractive_subject import extract_keyphrases, extract_subject
+from aiagent.utils.generate_subject_from_text import generate_subject_from_text
+
+
+def test_top_level_heading_becomes_the_subject():
+    text = "# はじめに\n本文\n# 生成AIの最新動向\n本文\n## 詳細\n本文"
+    assert extract_subject(text) == "生成AIの最新動向"
+
+
+def test_other_headings_at_the_same_level_add_a_suffix():
+    assert extract_subject("## 半導体市場\n本文\n## 為替の動き\n本文") == "半導体市場 ほか"
+
+
+def test_generic_and_url_headings_are_skipped():
+    text = "# まとめ\n# テーマ_1\n# URL: https://example.com\n量子コンピュータの量子ビットと量子コンピュータの応用"
+    assert extract_subject(text).startswith("量子コンピュータ")
+
+
+def test_keyphrases_without_headings_are_joined():
+    text = "生成AIの活用事例。企業の生成AI導入が進み、クラウド各社の生成AIサービスが増えている。"
+    subject = extract_subject(text)
+    assert "・" in subject and subject.split("・")[0] == extract_keyphrases(text, top=1)[0][0]
+    assert "生成AI" in subject
+
+
+@pytest.mark.parametrize("text", ["# 記事/タイトル:比較?", "「長い見出しの後半まで含めた件名を作る」" * 3])
+def test_subject_is_safe_for_file_names_and_within_max_length(text):
+    subject = extract_subject(text, max_length=10)
+    assert len(subject) <= 10
+    assert not set('\\/:*?"<>|') & set(subject)
+
+
+def test_empty_text_gets_a_placeholder():
+    assert extract_subject("") == "無題"
+
+
+def test_generator_extracts_locally_without_an_api_key(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    assert generate_subject_from_text("# 生成AIの最新動向\n本文", use_llm=False) == "生成AIの最新動向"
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+import pytest
+from aiagent.utils import llm_client
+from aiagent.utils.llm_client import GeminiProvider
+
+
+class _CachedContent:
+    def __init__(self, name: str, fail_update: bool = False):
+        self.name = name
+        self.fail_update = fail_update
+        self.ttls = []
+        self.deleted = False
+
+    def update(self, *, ttl):
+        if self.fail_update:
+            raise RuntimeError("not found")
+        self.ttls.append(ttl.total_seconds())
+
+    def delete(self):
+        self.deleted = True
+
+
+class _GenerativeModel:
+    def __init__(self, model_name=None, system_instruction=None, cached_content=None):
+        self.model_name = model_name
+        self.cached_content = cached_content
+
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        return cls(cached_content=cached_content)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(llm_client, "get_genai", lambda: SimpleNamespace(GenerativeModel=_GenerativeModel))
+    provider = GeminiProvider(cache_size=4, context_cache_ttl=600, context_cache_min_tokens=0,
+                              context_cache_max_entries=2)
+    provider.created = []
+
+    def create(model_name, system_instruction):
+        content = _CachedContent(f"cachedContents/{len(provider.created)}")
+        provider.created.append(content)
+        return content
+    monkeypatch.setattr(provider, "_create_context_cache", create)
+    return provider
+
+
+def _expire(provider, key):
+    model, _, content = provider._models[key]
+    provider._models[key] = (model, 0.0, content)
+
+
+def test_reuses_model_until_refresh(provider):
+    first = provider.model("gemini-2.0-flash", "system")
+    assert provider.model("gemini-2.0-flash", "system") is first
+    assert len(provider.created) == 1
+
+
+def test_expiring_cache_is_extended_instead_of_recreated(provider):
+    first = provider.model("gemini-2.0-flash", "system")
+    _expire(provider, ("gemini-2.0-flash", "system"))
+
+    assert provider.model("gemini-2.0-flash", "system") is first
+    assert len(provider.created) == 1
+    assert provider.created[0].ttls == [600]
+
+
+def test_cache_that_cannot_be_extended_is_replaced(provider):
+    provider.model("gemini-2.0-flash", "system")
+    old = provider.created[0]
+    old.fail_update = True
+    _expire(provider, ("gemini-2.0-flash", "system"))
+
+    second = provider.model("gemini-2.0-flash", "system")
+    assert second.cached_content is provider.created[1]
+    assert old.deleted
+
+
+def test_context_caches_are_capped_and_released(provider):
+    for i in range(3):
+        provider.model("gemini-2.0-flash", f"system {i}")
+
+    live = [entry[2] for entry in provider._models.values() if entry[2] is not None]
+    assert live == provider.created[1:]
+    # 破棄したキャッシュは実行中の呼び出しが終わる頃に期限切れになる
+    assert provider.created[0].ttls == [min(llm_client.LLM_API_TIMEOUT_SECONDS, 600)]
@@ -0,0 +1,106 @@
+import asyncio
+import time
+import pytest
+from aiagent.utils.hedging import HEDGE_BACKUP, HEDGE_FAILOVER, HEDGE_NOT_HEDGED, Hedger
+
+
+def _hedger(enabled: bool = True, **kwargs) -> Hedger:
+    params = {"percentile": 50, "min_samples": 3, "window": 10, "min_delay": 0.0, **kwargs}
+    return Hedger(enabled, **params)
+
+
+def _warm_up(hedger: Hedger, seconds: float = 0.01):
+    for _ in range(hedger.min_samples):
+        hedger.observe("primary", "general", seconds)
+
+
+def test_delay_is_the_percentile_of_recent_latencies():
+    hedger = _hedger(window=4)
+    for seconds in (9.0, 1.0, 2.0, 3.0, 4.0):
+        hedger.observe("primary", "general", seconds)
+    assert hedger.delay("primary", "general") == 2.0
+    assert hedger.delay("primary", "agent") is None
+
+
+def test_explicit_backup_model_needs_the_other_providers_key(monkeypatch):
+    hedger = _hedger(backup_models={"gemini-1.5-pro": "gpt-4o"})
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    assert hedger.backup_model("gemini-1.5-pro") is None
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    assert hedger.backup_model("gemini-1.5-pro-002") == "gpt-4o"
+    assert _hedger(enabled=False).backup_model("gemini-1.5-pro") is None
+
+
+def test_disabled_hedger_only_calls_the_primary_model():
+    calls = []
+    assert _hedger(enabled=False).call("primary", "backup", "general", lambda m: calls.append(m) or m) == "primary"
+    assert calls == ["primary"]
+
+
+def test_slow_primary_is_hedged_and_the_backup_wins():
+    hedger = _hedger()
+    _warm_up(hedger)
+
+    def call(model_name):
+        time.sleep(0.5 if model_name == "primary" else 0.0)
+        return model_name
+
+    assert hedger.call("primary", "backup", "general", call) == "backup"
+    assert hedger.stats()["models"]["primary"][HEDGE_BACKUP] == 1
+
+
+def test_primary_error_fails_over_to_the_backup():
+    hedger = _hedger()
+
+    def call(model_name):
+        if model_name == "primary":
+            raise ConnectionError("unavailable")
+        return model_name
+
+    assert hedger.call("primary", "backup", "general", call) == "backup"
+    assert hedger.stats()["models"]["primary"][HEDGE_FAILOVER] == 1
+
+
+def test_async_hedge_cancels_the_losing_request():
+    hedger = _hedger()
+    _warm_up(hedger)
+    cancelled = []
+
+    async def call(model_name):
+        try:
+            await asyncio.sleep(1.0 if model_name == "primary" else 0.0)
+        except asyncio.CancelledError:
+            cancelled.append(model_name)
+            raise
+        return model_name
+
+    async def run():
+        result = await hedger.acall("primary", "backup", "general", call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "backup"
+    assert cancelled == ["primary"]
+
+
+def test_stream_uses_the_first_stream_to_yield():
+    hedger = _hedger()
+    for _ in range(hedger.min_samples):
+        hedger.observe("primary", "general:first_chunk", 0.01)
+
+    async def open_stream(model_name):
+        await asyncio.sleep(1.0 if model_name == "primary" else 0.0)
+        for chunk in ("a", "b"):
+            yield f"{model_name}:{chunk}"
+
+    async def run():
+        return [chunk async for chunk in hedger.astream("primary", "backup", "general", open_stream)]
+
+    assert asyncio.run(run()) == ["backup:a", "backup:b"]
+
+
+@pytest.mark.parametrize("enabled, backup", [(True, None), (False, "backup")])
+def test_unhedged_calls_are_not_counted(enabled, backup):
+    hedger = _hedger(enabled=enabled)
+    assert hedger.call("primary", backup, "general", lambda m: m) == "primary"
+    assert HEDGE_NOT_HEDGED not in hedger.stats()["models"].get("primary", {})
@@ -0,0 +1,16 @@
+import pytest
+from scripts.check_import_time import IMPORT_TIME_BUDGET_MS, LAZY_MODULES, check, measure
+
+
+@pytest.fixture(scope="module")
+def startup_imports():
+    return measure("app.main")
+
+
+def test_startup_does_not_import_heavy_dependencies(startup_imports):
+    imported = {name for name, _, _ in startup_imports}
+    assert [m for m in LAZY_MODULES if m in imported] == []
+
+
+def test_startup_import_time_within_budget(startup_imports):
+    assert check(startup_imports, "app.main", IMPORT_TIME_BUDGET_MS) == []
@@ -0,0 +1,26 @@
+import sqlite3
+from app.db.job_store import JobStore, JOB_QUEUED
+
+
+def test_steps_are_appended_in_order(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.create({"user_input": "hello"})
+    for i in range(3):
+        store.append_step(job_id, {"step": i + 1, "tool": f"tool{i}"})
+
+    job = store.get(job_id)
+    assert job["status"] == JOB_QUEUED
+    assert [step["step"] for step in job["steps"]] == [1, 2, 3]
+
+
+def test_steps_of_other_and_unknown_jobs_are_independent(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    first, second = store.create({}), store.create({})
+    store.append_step(first, {"step": 1})
+    store.append_step("unknown", {"step": 1})
+
+    assert store.get(first)["steps"] == [{"step": 1}]
+    assert store.get(second)["steps"] == []
+    with sqlite3.connect(store.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM job_steps").fetchone()[0] == 1
+
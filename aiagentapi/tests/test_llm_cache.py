@@ -0,0 +1,51 @@
+import pytest
+from aiagent.utils import llm_cache as llm_cache_module
+from aiagent.utils.llm_cache import LlmResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def _cache(tmp_path, ttl_seconds: int = 60, max_bytes: int = 1024) -> LlmResponseCache:
+    return LlmResponseCache(str(tmp_path / "llm.sqlite3"), ttl_seconds, max_bytes, touch_interval=0)
+
+
+def test_key_depends_on_model_messages_file_and_params():
+    messages = [{"role": "user", "content": "要約して"}]
+    key = LlmResponseCache.make_key("gpt-4o-mini", messages, temperature=0)
+    assert key == LlmResponseCache.make_key("gpt-4o-mini", list(messages), temperature=0)
+    assert key != LlmResponseCache.make_key("gpt-4o", messages, temperature=0)
+    assert key != LlmResponseCache.make_key("gpt-4o-mini", messages, "aW1hZ2U=", temperature=0)
+    assert key != LlmResponseCache.make_key("gpt-4o-mini", messages, temperature=1)
+
+
+def test_expired_responses_are_not_returned(tmp_path, clock):
+    cache = _cache(tmp_path, ttl_seconds=10)
+    cache.set("k", "gpt-4o-mini", "応答")
+    assert cache.get("k") == "応答"
+    clock[0] += 10
+    assert cache.get("k") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_responses_are_evicted_over_max_bytes(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=10)
+    cache.set("a", "m", "aaaaa")
+    clock[0] += 1
+    cache.set("b", "m", "bbbbb")
+    clock[0] += 1
+    assert cache.get("a") == "aaaaa"
+    clock[0] += 1
+    cache.set("c", "m", "ccccc")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("aaaaa", "ccccc")
+    assert cache.stats()["evicted"] == 1
+
+
+def test_cache_is_disabled_without_db_path_or_ttl(tmp_path):
+    assert not LlmResponseCache("", ttl_seconds=60, max_bytes=1024).enabled
+    assert not _cache(tmp_path, ttl_seconds=0).enabled
@@ -0,0 +1,128 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from aiagent.utils import llm_client
+from aiagent.utils.deadline import DeadlineExceeded
+from aiagent.utils.llm_client import (GeminiProvider, awith_retry, backoff_delay, get_provider, gemini_provider,
+                                      is_retryable, openai_provider, with_retry)
+
+
+class ApiError(Exception):
+    def __init__(self, status_code: int | None = None, retry_after: str | None = None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+class APIConnectionError(Exception):
+    """openai の通信エラーと同じ名前の例外（SDK を読み込まずにクラス名で判定される）"""
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """再試行の待ち時間を記録し、実際には待たない"""
+    delays = []
+    monkeypatch.setattr(llm_client.time, "sleep", delays.append)
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BASE_SECONDS", 0.0)
+    return delays
+
+
+def _failing(errors: list, result="ok"):
+    """errors を順に送出し、尽きたら result を返す呼び出し"""
+    calls = []
+
+    def call():
+        calls.append(len(calls))
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call, calls
+
+
+@pytest.mark.parametrize("exc, expected", [
+    (ApiError(429), True),
+    (ApiError(503), True),
+    (ApiError(400), False),
+    (ApiError(401), False),
+    (ConnectionError(), True),
+    (TimeoutError(), True),
+    (APIConnectionError(), True),
+    (ValueError(), False),
+    (DeadlineExceeded("timeout"), False),
+])
+def test_is_retryable(exc, expected):
+    assert is_retryable(exc) is expected
+
+
+def test_transient_errors_are_retried(sleeps):
+    call, calls = _failing([ApiError(503), ConnectionError()])
+    assert with_retry("openai", call) == "ok"
+    assert len(calls) == 3 and len(sleeps) == 2
+
+
+def test_gives_up_after_max_retries(sleeps, monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 2)
+    call, calls = _failing([ApiError(500) for _ in range(5)])
+    with pytest.raises(ApiError):
+        with_retry("openai", call)
+    assert len(calls) == 3
+
+
+def test_non_retryable_errors_are_raised_immediately(sleeps):
+    call, calls = _failing([ApiError(400)])
+    with pytest.raises(ApiError):
+        with_retry("openai", call)
+    assert len(calls) == 1 and sleeps == []
+
+
+def test_retry_after_sets_the_minimum_delay(sleeps, monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RETRY_MAX_SECONDS", 30.0)
+    call, _ = _failing([ApiError(429, retry_after="7")])
+    assert with_retry("openai", call) == "ok"
+    assert sleeps == [7.0]
+    # 上限を超える Retry-After は上限で打ち切る
+    assert backoff_delay(0, ApiError(429, retry_after="120")) == 30.0
+    assert backoff_delay(0, ApiError(429, retry_after="invalid")) <= 30.0
+
+
+def test_async_retry(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BASE_SECONDS", 0.0)
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 1)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ApiError(502)
+
+    with pytest.raises(ApiError):
+        asyncio.run(awith_retry("gemini", call))
+    assert len(attempts) == 2
+
+
+def test_providers_are_selected_by_model_name():
+    assert get_provider("gpt-4o-mini") is openai_provider
+    assert get_provider("o3-mini") is openai_provider
+    assert get_provider("gemini-1.5-flash") is gemini_provider
+    with pytest.raises(ValueError, match="is not supported"):
+        get_provider("unknown-model")
+
+
+def test_gemini_messages_are_split_into_contents_and_system_prompt():
+    messages = [{"role": "system", "content": "役割"}, {"role": "user", "content": "質問"},
+                {"role": "assistant", "content": "回答"}, {"role": "user", "content": ""}]
+    contents, system = GeminiProvider.split_messages(messages, system="共通の指示")
+    assert contents == [{"role": "user", "parts": [{"text": "質問"}]}, {"role": "model", "parts": [{"text": "回答"}]}]
+    assert system == "共通の指示\n\n役割"
+    assert GeminiProvider.split_messages([{"role": "user", "content": "質問"}])[1] is None
+
+
+def test_complete_passes_the_system_prompt_to_openai(monkeypatch):
+    sent = []
+
+    def chat(model_name, messages, **kwargs):
+        sent.append(messages)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="回答"))])
+
+    monkeypatch.setattr(openai_provider, "chat", chat)
+    assert openai_provider.complete("gpt-4o-mini", [{"role": "user", "content": "質問"}], system="役割") == "回答"
+    assert sent == [[{"role": "system", "content": "役割"}, {"role": "user", "content": "質問"}]]
@@ -0,0 +1,58 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.core.metrics_middleware import PrometheusMiddleware
+from aiagent.utils.metrics import HTTP_REQUESTS_TOTAL, HTTP_REQUESTS_IN_PROGRESS, HTTP_REQUEST_DURATION
+
+
+def _value(metric, **labels) -> float:
+    return metric.labels(**labels)._value.get()
+
+
+def _count(histogram, **labels) -> float:
+    return next(s.value for s in histogram.collect()[0].samples
+                if s.name.endswith("_count") and all(s.labels.get(k) == v for k, v in labels.items()))
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(PrometheusMiddleware)
+
+    @app.get("/stream/{name}")
+    def stream(name: str):
+        def events():
+            # 本文の送信中は処理中として数えられている
+            yield f"data: {_value(HTTP_REQUESTS_IN_PROGRESS, method='GET')}\n\n"
+            yield f"data: {name}\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/error")
+    def error():
+        raise RuntimeError("boom")
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_streaming_response_is_measured_until_last_chunk():
+    before = _value(HTTP_REQUESTS_TOTAL, method="GET", path="/stream/{name}", status="200")
+    in_progress = _value(HTTP_REQUESTS_IN_PROGRESS, method="GET")
+
+    response = _client().get("/stream/abc")
+
+    assert response.text == f"data: {in_progress + 1}\n\ndata: abc\n\n"
+    assert _value(HTTP_REQUESTS_TOTAL, method="GET", path="/stream/{name}", status="200") == before + 1
+    assert _value(HTTP_REQUESTS_IN_PROGRESS, method="GET") == in_progress
+    assert _count(HTTP_REQUEST_DURATION, method="GET", path="/stream/{name}") >= 1
+
+
+def test_unhandled_error_is_counted_as_500():
+    before = _value(HTTP_REQUESTS_TOTAL, method="GET", path="/error", status="500")
+    response = _client().get("/error")
+    assert response.status_code == 500
+    assert _value(HTTP_REQUESTS_TOTAL, method="GET", path="/error", status="500") == before + 1
+
+
+def test_unmatched_path_uses_fixed_label():
+    before = _value(HTTP_REQUESTS_TOTAL, method="GET", path="unmatched", status="404")
+    assert _client().get("/no/such/path").status_code == 404
+    assert _value(HTTP_REQUESTS_TOTAL, method="GET", path="unmatched", status="404") == before + 1
@@ -0,0 +1,22 @@
+from aiagent.aiagent import model_registry
+from aiagent.aiagent.model_registry import (TASK_AGENT, TASK_SCRIPT, TASK_SUBJECT, TASK_DEFAULT_MODELS,
+                                            activate_model_overrides, route_model)
+
+
+def test_previous_defaults_are_kept_without_router():
+    assert route_model(TASK_AGENT, "質問") == "gemini-1.5-pro"
+    assert route_model(TASK_SCRIPT, "台本の材料") == "gpt-4o-mini"
+    assert route_model(TASK_SUBJECT, "本文") == TASK_DEFAULT_MODELS[TASK_SUBJECT]
+
+
+def test_explicit_choices_take_precedence(monkeypatch):
+    monkeypatch.setitem(model_registry.MODEL_ROUTES, TASK_SCRIPT, "gpt-4o")
+    assert route_model(TASK_SCRIPT, "") == "gpt-4o"
+    assert route_model(TASK_SCRIPT, "", "gemini-2.0-flash") == "gemini-2.0-flash"
+    with activate_model_overrides({TASK_SCRIPT: "o3-mini"}):
+        assert route_model(TASK_SCRIPT, "", "gemini-2.0-flash") == "o3-mini"
+
+
+def test_router_is_opt_in(monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_ROUTER_ENABLED", True)
+    assert route_model(TASK_AGENT, "質問") == model_registry.select_model(TASK_AGENT, model_registry.estimate_tokens("質問"))
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import pytest
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
+from aiagent.aiagent import ParallelToolAiAgent as parallel_module
+from aiagent.aiagent.ParallelToolAiAgent import ParallelAgentExecutor, ToolConcurrencyLimiter, _parse_limits
+
+
+class ConcurrencyProbe:
+    """ツールごとの同時実行数の最大値を記録する"""
+
+    def __init__(self):
+        self.running = {}
+        self.peak = {}
+        self._lock = threading.Lock()
+
+    def tool(self, name: str, seconds: float) -> StructuredTool:
+        async def run(value: str) -> str:
+            with self._lock:
+                self.running[name] = self.running.get(name, 0) + 1
+                self.peak[name] = max(self.peak.get(name, 0), self.running[name])
+            await asyncio.sleep(seconds)
+            with self._lock:
+                self.running[name] -= 1
+            return f"{name}:{value}"
+
+        return StructuredTool.from_function(coroutine=run, name=name, description=name)
+
+
+def _executor(tools, actions) -> ParallelAgentExecutor:
+    """1ステップ目で actions をまとめて返し、2ステップ目で終了するエージェント"""
+    def plan(inputs):
+        if inputs["intermediate_steps"]:
+            return AgentFinish({"output": "done"}, "done")
+        return [AgentAction(tool, {"value": value}, "") for tool, value in actions]
+
+    return ParallelAgentExecutor(agent=RunnableLambda(plan), tools=tools, return_intermediate_steps=True)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = ToolConcurrencyLimiter({"slow": 1}, default_limit=2, poll_interval=0.001)
+    monkeypatch.setattr(parallel_module, "tool_limiter", limiter)
+    return limiter
+
+
+def test_per_tool_limits_are_enforced(limiter):
+    probe = ConcurrencyProbe()
+    tools = [probe.tool("slow", 0.02), probe.tool("fast", 0.02), probe.tool("other", 0.02)]
+    actions = [("slow", str(i)) for i in range(3)] + [("fast", str(i)) for i in range(4)] + [("other", "0")]
+    asyncio.run(_executor(tools, actions).ainvoke({"input": "test"}))
+    assert probe.peak == {"slow": 1, "fast": 2, "other": 1}
+
+
+def test_results_are_returned_in_action_order(limiter):
+    probe = ConcurrencyProbe()
+    # 先に呼び出したツールほど遅く終わるようにする
+    tools = [probe.tool("slow", 0.05), probe.tool("fast", 0.0)]
+    actions = [("slow", "1"), ("fast", "2"), ("slow", "3"), ("fast", "4")]
+    result = asyncio.run(_executor(tools, actions).ainvoke({"input": "test"}))
+    assert result["output"] == "done"
+    assert [observation for _, observation in result["intermediate_steps"]] == [
+        "slow:1", "fast:2", "slow:3", "fast:4"]
+
+
+def test_limits_are_parsed_from_settings():
+    assert _parse_limits("search=2, send_email_tool=1,invalid,bad=x,") == {"search": 2, "send_email_tool": 1}
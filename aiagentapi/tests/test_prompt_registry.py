@@ -0,0 +1,39 @@
+import pytest
+from aiagent.prompts import registry
+
+
+@pytest.fixture(autouse=True)
+def _empty_hub_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(registry, "PROMPT_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(registry, "_prompt_cache", {})
+
+
+def test_bundled_prompts_are_listed_in_version_order():
+    prompts = registry.list_prompts()
+    assert {"react", "react_ja", "tool_calling_ja"} <= prompts.keys()
+    assert sorted(["v10", "v2", "v1"], key=registry._version_key) == ["v1", "v2", "v10"]
+
+
+def test_latest_loads_the_newest_bundled_version():
+    latest = registry.list_prompts()["react"][-1]
+    assert registry.load_template_text("react") == registry.load_template_text("react", latest)
+
+
+def test_react_prompt_has_agent_variables():
+    prompt = registry.get_prompt("react")
+    assert {"tools", "tool_names", "input", "agent_scratchpad"} <= set(prompt.input_variables)
+    assert registry.get_prompt("react") is prompt
+
+
+def test_hub_falls_back_to_bundled_latest_until_synced(tmp_path):
+    assert registry.load_template_text("react", registry.HUB_VERSION) == registry.load_template_text("react")
+    synced = tmp_path / "react" / f"{registry.HUB_VERSION}.txt"
+    synced.parent.mkdir()
+    synced.write_text("{input} {agent_scratchpad}", encoding="utf-8")
+    assert registry.load_template_text("react", registry.HUB_VERSION) == "{input} {agent_scratchpad}"
+
+
+@pytest.mark.parametrize("name, version", [("missing", registry.LATEST_VERSION), ("react", "v999")])
+def test_unknown_prompt_raises_key_error(name, version):
+    with pytest.raises(KeyError):
+        registry.load_template_text(name, version)
@@ -0,0 +1,63 @@
+import threading
+import time
+from aiagent.utils.rate_limit import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LlmRateLimiter, ModelRateLimiter,
+                                      activate_priority)
+
+
+def _wait_until(condition, timeout: float = 2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.005)
+
+
+def test_longest_matching_limit_is_used():
+    limiter = LlmRateLimiter({"openai": {"rpm": 500}, "gpt-4o": {"rpm": 100}, "gpt-4o-mini": {"rpm": 50}})
+    assert limiter.limiter_for("gpt-4o-mini-2024-07-18").name == "gpt-4o-mini"
+    assert limiter.limiter_for("gpt-4o").name == "gpt-4o"
+    assert limiter.limiter_for("o3-mini").name == "openai"
+    assert limiter.limiter_for("models/gemini-1.5-pro") is None
+
+
+def test_interactive_calls_are_granted_before_earlier_background_calls():
+    limiter = ModelRateLimiter("test", rpm=600, burst_seconds=0.1)
+    limiter.pause(0.5)
+    granted = []
+
+    def call(priority):
+        limiter.acquire(priority)
+        granted.append(priority)
+
+    background = threading.Thread(target=call, args=(PRIORITY_BACKGROUND,))
+    background.start()
+    _wait_until(lambda: len(limiter._waiters) == 1)
+    interactive = threading.Thread(target=call, args=(PRIORITY_INTERACTIVE,))
+    interactive.start()
+    _wait_until(lambda: len(limiter._waiters) == 2 or granted)
+    background.join(5)
+    interactive.join(5)
+    assert granted == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
+    assert limiter.stats()["granted"] == {"interactive": 1, "background": 1}
+
+
+def test_priority_defaults_to_the_active_priority():
+    limiter = ModelRateLimiter("test", rpm=600)
+    with activate_priority(PRIORITY_BACKGROUND):
+        assert limiter.acquire()
+    assert limiter.stats()["granted"]["background"] == 1
+
+
+def test_pause_after_429_holds_new_calls():
+    limiter = ModelRateLimiter("test", rpm=6000)
+    limiter.pause(0.2)
+    assert not limiter.acquire(blocking=False)
+    started = time.monotonic()
+    assert limiter.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_overdrawn_tokens_hold_new_calls():
+    limiter = ModelRateLimiter("test", tpm=60_000, burst_seconds=1)
+    limiter.debit(5_000)
+    assert not limiter.acquire(blocking=False)
+    assert limiter.stats()["available_tokens"] < 0
@@ -0,0 +1,70 @@
+import pytest
+from app.services import session_store as session_store_module
+from app.services.session_store import SessionStore, summarize_turns
+
+
+def _summarizer(previous_summary, turns):
+    return "|".join([previous_summary, *(t["content"] for t in turns)]).strip("|")
+
+
+def _store(**kwargs) -> SessionStore:
+    params = {"max_sessions": 10, "token_budget": 1, "keep_recent_turns": 2, "summarizer": _summarizer, **kwargs}
+    return SessionStore(**params)
+
+
+def test_least_recently_used_session_is_evicted_at_the_limit():
+    store = _store(max_sessions=2)
+    store.get_or_create("a")
+    store.get_or_create("b")
+    store.get_or_create("a")
+    store.get_or_create("c")
+    assert list(store._sessions) == ["a", "c"]
+    assert store.stats() == {"sessions": 2, "max_sessions": 2}
+
+
+def test_compact_folds_old_turns_into_the_summary():
+    store = _store()
+    store.append_turn("s", "質問1", "回答1")
+    store.append_turn("s", "質問2", "回答2")
+    store.compact("s")
+    session = store.get_or_create("s")
+    assert session.summary == "質問1|回答1"
+    assert [t["content"] for t in session.turns] == ["質問2", "回答2"]
+    assert "これまでの会話の要約" in session.build_context()
+
+
+def test_compact_within_budget_keeps_all_turns():
+    store = _store(token_budget=10_000)
+    store.append_turn("s", "質問", "回答")
+    store.compact("s")
+    assert store.get_or_create("s").summary == ""
+
+
+def test_failed_summarizer_keeps_the_turns():
+    def summarizer(previous_summary, turns):
+        raise RuntimeError("unavailable")
+
+    store = _store(summarizer=summarizer)
+    store.append_turn("s", "質問1", "回答1")
+    store.append_turn("s", "質問2", "回答2")
+    with pytest.raises(RuntimeError):
+        store.compact("s")
+    session = store.get_or_create("s")
+    assert len(session.turns) == 4 and not session.compacting
+
+
+def test_summary_falls_back_to_truncated_turns_when_the_llm_fails(monkeypatch):
+    def exec_llm_api(*args, **kwargs):
+        raise ConnectionError("unavailable")
+
+    monkeypatch.setattr(session_store_module, "execLlmApi", exec_llm_api)
+    summary = summarize_turns("前回の要約", [{"role": "user", "content": "あ" * 150}])
+    assert summary == f"前回の要約\nuser: {'あ' * 100}"
+
+
+def test_delete_unknown_session_returns_false():
+    store = _store()
+    store.get_or_create("s")
+    assert store.delete("s") is True
+    assert store.delete("s") is False
+    assert store.delete("unknown") is False
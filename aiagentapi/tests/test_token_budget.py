@@ -0,0 +1,47 @@
+from aiagent.aiagent.model_registry import TASK_PROFILES, TASK_SUBJECT
+from aiagent.utils import token_budget
+from aiagent.utils.token_budget import OMISSION_MARKER, count_tokens, fit_to_budget, input_budget, truncate_tokens
+
+# Gemini のモデルは tiktoken を使わずに概算で数える（オフラインでも結果が変わらない）
+MODEL = "gemini-1.5-flash"
+
+ARTICLE = "\n\n".join([
+    "# 記事A",
+    "記事Aの冒頭の段落です。" * 5,
+    "記事Aの二つ目の段落です。" * 20,
+    "[ログイン](https://example.com/login) | [会員登録](https://example.com/signup)",
+    "# 記事B",
+    "記事Bの冒頭の段落です。" * 5,
+    "記事Bの二つ目の段落です。" * 20,
+])
+
+
+def test_truncate_tokens_matches_the_estimate():
+    text = "日本語とEnglish"
+    for max_tokens in range(count_tokens(text, MODEL) + 1):
+        assert count_tokens(truncate_tokens(text, max_tokens, MODEL), MODEL) <= max_tokens
+    assert truncate_tokens(text, 100, MODEL) == text
+
+
+def test_text_within_budget_is_unchanged():
+    text, report = fit_to_budget(ARTICLE, MODEL, 10_000)
+    assert text == ARTICLE
+    assert report["dropped"] == []
+
+
+def test_headings_and_leading_paragraphs_are_kept_first():
+    text, report = fit_to_budget(ARTICLE, MODEL, 150)
+    assert report["tokens"] <= 150
+    assert "# 記事A" in text and "# 記事B" in text
+    assert "記事Aの冒頭の段落です。" in text and "記事Bの冒頭の段落です。" in text
+    assert "ログイン" not in text
+    assert OMISSION_MARKER in text
+    assert sorted((d["section"], d["kind"]) for d in report["dropped"]) == [
+        ("記事A", "body"), ("記事A", "boilerplate"), ("記事B", "body")]
+
+
+def test_input_budget_uses_the_task_profile_unless_overridden(monkeypatch):
+    assert input_budget(MODEL, TASK_SUBJECT) == TASK_PROFILES[TASK_SUBJECT]["max_input_tokens"]
+    assert input_budget(MODEL, TASK_SUBJECT, reserved_tokens=1_048_576) == 0
+    monkeypatch.setitem(token_budget.INPUT_TOKEN_BUDGETS, TASK_SUBJECT, 50)
+    assert input_budget(MODEL, TASK_SUBJECT) == 50
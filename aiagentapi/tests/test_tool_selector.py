@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+import pytest
+from aiagent.aiagent import tool_selector
+from aiagent.aiagent.tool_selector import ToolIndex, select_tools, tokenize
+
+
+def _tool(name: str, description: str = ""):
+    return SimpleNamespace(name=name, description=description)
+
+
+TOOLS = [
+    _tool("google_search_tool", "Web を検索して最新の情報を調べる"),
+    _tool("send_email_tool", "メールを送信する"),
+    _tool("getMarkdown_tool", "URL のページを取得してマークダウンにする"),
+    _tool("generate_podcast_script_tool", "ポッドキャストの台本を生成する"),
+    _tool("generate_melmaga_script_tool", "メルマガを生成する"),
+]
+
+
+def _names(tools) -> list[str]:
+    return [tool.name for tool in tools]
+
+
+def test_tokenize_uses_words_and_japanese_bigrams():
+    assert tokenize("Send メール") == ["send", "メー", "ール"]
+
+
+def test_selects_relevant_tools_in_original_order():
+    selected = ToolIndex(TOOLS).select("ポッドキャストの台本を作ってメールで送って", 3, always=["google_search_tool"])
+    assert _names(selected) == ["google_search_tool", "send_email_tool", "generate_podcast_script_tool"]
+
+
+def test_falls_back_to_all_tools_when_nothing_matches():
+    assert _names(ToolIndex(TOOLS).select("xyz", 2, always=["google_search_tool"])) == _names(TOOLS)
+
+
+def test_no_selection_by_default(monkeypatch):
+    monkeypatch.setattr(tool_selector, "TOOL_SELECTION_TOP_K", 0)
+    assert _names(select_tools("メールを送って", TOOLS)) == _names(TOOLS)
+
+
+@pytest.mark.parametrize("top_k", [0, len(TOOLS)])
+def test_top_k_zero_or_all_returns_every_tool(top_k):
+    assert _names(select_tools("メールを送って", TOOLS, top_k)) == _names(TOOLS)
+
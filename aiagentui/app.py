@@ -35,6 +35,8 @@ st.title("AIエージェント")
 modelname = st.selectbox("モデルを選択してください", MODEL_LIST)
 max_iterations = st.selectbox("最大イテレーション数を選択してください", range(6, 15))
 thought_process_Flg = st.selectbox("思考プロセスを出力しますか？", [False, True])
+# parallel: 独立したツール呼び出しを1ステップでまとめて並行実行する
+agent_mode = st.selectbox("エージェントの実行方式を選択してください", ["react", "parallel"])
 
 # プロンプトテンプレート選択
 selected_template_name = st.selectbox("処理モードを選択してください", list(PROMPT_TEMPLATES.keys()))
@@ -68,6 +70,7 @@ if st.button("送信"):
                 "user_input": _user_input,
                 "model_name": modelname,
                 "max_iterations": max_iterations,
+                "agent_mode": agent_mode,
                 "thought_process_Flg": thought_process_Flg
             }
             response = requests.post(api_url, json=parameters)
@@ -1,4 +1,6 @@
 import gradio as gr
+import json
+import uuid
 import requests
 import os
 from dotenv import load_dotenv
@@ -13,64 +15,96 @@ API_ENDPOINT_PATH = os.getenv("API_ENDPOINT_PATH", "/my_root/v1/aiagent")
 URL = f"{PROTOCOL}://{FASTAPI_SERVICE_NAME}:{FASTAPI_PORT}{API_ENDPOINT_PATH}"
 
 
-# --- チャット処理関数 (エラーハンドリング、履歴更新ロジック改善) ---
-def chat(user_input, chat_history):
+STREAM_URL = f"{URL}/stream"
+
+
+def parse_sse(lines):
+    """SSEの行イテレータから (イベント名, データ) を順に返す"""
+    event, data = None, []
+    for line in lines:
+        if line is None:
+            continue
+        if line == "":
+            # 空行でひとつのイベントが確定する
+            if data:
+                yield event or "message", json.loads("\n".join(data))
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+# --- チャット処理関数 (SSEで進捗と回答を逐次表示する) ---
+def chat(user_input, chat_history, session_id):
     chat_history = chat_history or []
+    # 会話履歴はサーバー側のセッションで保持する（ブラウザごとにIDを払い出す）
+    session_id = session_id or str(uuid.uuid4())
     user_input_stripped = user_input.strip()  # 前後の空白を除去
 
     # 空のメッセージは送信しない
     if not user_input_stripped:
-        return "", chat_history, chat_history  # 入力欄はクリア、履歴はそのまま
+        yield "", chat_history, chat_history, session_id  # 入力欄はクリア、履歴はそのまま
+        return
 
     # ユーザーメッセージを履歴に追加 (role/content形式)
     chat_history.append({"role": "user", "content": user_input_stripped})
+    assistant_msg = {"role": "assistant", "content": "考え中..."}
+    chat_history.append(assistant_msg)
+    yield "", chat_history, chat_history, session_id
 
     parameters = {
         "model_name": "chatgpt-4o-latest",
-        "user_input": user_input_stripped
+        "user_input": user_input_stripped,
+        "session_id": session_id
     }
 
+    progress = []  # ツール実行の進捗
+    answer = ""    # 最終回答（トークン単位で受信）
     try:
-        # API呼び出し (タイムアウトとエラーチェック追加)
-        response = requests.post(URL, json=parameters, timeout=300)
-        response.raise_for_status()  # 4xx, 5xxエラーで例外を発生させる
-        result = response.json()
-
-        # --- アシスタントの応答を抽出 ---
-        # バックエンドの応答形式に合わせて調整が必要
-        # 例1: {"result": [{"role":"user", ...}, {"role":"assistant", "content": "..."}]}
-        if "result" in result and isinstance(result.get("result"), list) and len(result["result"]) > 1 and isinstance(result["result"][1], dict):
-            assistant_msg = result["result"][1] # 2番目の要素をアシスタント応答と仮定
-            if assistant_msg.get("role") == "assistant" and "content" in assistant_msg:
-                chat_history.append(assistant_msg)
-            else:
-                # 想定形式だが中身が違う場合
-                chat_history.append({"role": "assistant", "content": f"Error: Unexpected assistant message format in result list."})
-
-        # 例2: シンプルに {"assistant_reply": "..."} のような形式の場合
-        elif "assistant_reply" in result and isinstance(result["assistant_reply"], str):
-            chat_history.append({"role": "assistant", "content": result["assistant_reply"]})
-
-        # ★★★ もし上記以外、元のコードのように result["result"] が応答テキストリストなど、
-        # 特殊な形式の場合は、ここの抽出ロジックをそれに合わせてください ★★★
-
-        else:
-            # 予期しない応答形式の場合
-            chat_history.append({"role": "assistant", "content": f"Error: Could not parse assistant response from backend. Received: {str(result)[:200]}"}) # 応答の一部を表示
+        # 接続は10秒、イベント間の待ち時間は300秒でタイムアウト
+        with requests.post(STREAM_URL, json=parameters, stream=True, timeout=(10, 300)) as response:
+            response.raise_for_status()  # 4xx, 5xxエラーで例外を発生させる
+            response.encoding = "utf-8"
+            for event, data in parse_sse(response.iter_lines(decode_unicode=True)):
+                if event == "action":
+                    progress.append(f"🔧 {data.get('tool')} を実行中: {data.get('tool_input')}")
+                elif event == "step":
+                    progress.append(f"✅ {data.get('tool')}: {data.get('observation')}")
+                elif event == "token":
+                    answer += data.get("text", "")
+                elif event == "final":
+                    # 最終結果の最後の要素をアシスタント応答とする
+                    result = data.get("result") or []
+                    if result and isinstance(result[-1], dict) and result[-1].get("role") == "assistant":
+                        assistant_msg["content"] = result[-1].get("content", "")
+                    else:
+                        assistant_msg["content"] = f"Error: Could not parse assistant response from backend. Received: {str(data)[:200]}"
+                    yield "", chat_history, chat_history, session_id
+                    continue
+                elif event == "error":
+                    assistant_msg["content"] = f"Error: {data.get('message')}"
+                    yield "", chat_history, chat_history, session_id
+                    continue
+                else:
+                    continue
+
+                assistant_msg["content"] = "\n".join(progress) + (f"\n\n{answer}" if answer else "")
+                yield "", chat_history, chat_history, session_id
 
     except requests.exceptions.Timeout:
         print("API Request Timed Out")
-        chat_history.append({"role": "assistant", "content": "Error: The request to the backend timed out."})
+        assistant_msg["content"] = "Error: The request to the backend timed out."
     except requests.exceptions.RequestException as e:
         print(f"API Request Error: {e}")
-        chat_history.append({"role": "assistant", "content": f"Error communicating with backend: {e}"})
+        assistant_msg["content"] = f"Error communicating with backend: {e}"
     except Exception as e:
         # JSONデコードエラーなどもここで捕捉
         print(f"Chat Processing Error: {e}")
-        chat_history.append({"role": "assistant", "content": f"An internal error occurred: {e}"})
+        assistant_msg["content"] = f"An internal error occurred: {e}"
 
     # 入力欄をクリアし、更新された履歴を返す
-    return "", chat_history, chat_history
+    yield "", chat_history, chat_history, session_id
 
 
 # --- Gradio UI の構築 (スマホ対応) ---
@@ -86,6 +120,7 @@ with gr.Blocks() as demo:
         # bubble_full_width=False # 吹き出しの幅を調整
         )
     state = gr.State([])  # チャット履歴を保持
+    session_state = gr.State(None)  # サーバー側の会話セッションID
 
     # 入力要素を縦に配置 (Columnを使用)
     with gr.Column():
@@ -104,14 +139,14 @@ with gr.Blocks() as demo:
     # Enterキーでの送信を有効化
     user_input.submit(
         chat,
-        inputs=[user_input, state],
-        outputs=[user_input, chatbot, state]  # 出力をchatbotとstateに反映
+        inputs=[user_input, state, session_state],
+        outputs=[user_input, chatbot, state, session_state]  # 出力をchatbotとstateに反映
     )
     # ボタンクリックでの送信
     submit.click(
         chat,
-        inputs=[user_input, state],
-        outputs=[user_input, chatbot, state]  # 出力をchatbotとstateに反映
+        inputs=[user_input, state, session_state],
+        outputs=[user_input, chatbot, state, session_state]  # 出力をchatbotとstateに反映
     )
 
 # サーバー起動設定 (変更なし)